@@ -5,7 +5,7 @@ from pydantic import BaseModel
 import ichatbio
 from ichatbio.agent import IChatBioAgent
 from ichatbio.types import AgentCard
-from entrypoints import get_occurrence, facet, dataset, institute, dataset_lookup, institute_lookup, taxon, checklist, statistics, dataset_search#, get_single_occurrence, statistics_year, facet, institute, species_by_country
+from entrypoints import get_occurrence, get_occurrence_multiple_ins, facet, dataset, institute, dataset_lookup, institute_lookup, taxon, checklist, statistics, dataset_search#, get_single_occurrence, statistics_year, facet, institute, species_by_country
 
 from ichatbio.agent_response import ResponseContext, IChatBioAgentProcess
 
@@ -26,6 +26,7 @@ class OBISAgent(IChatBioAgent):
             icon_url="https://obis.org/images/logo_simple.png",
             entrypoints=[
                 get_occurrence.entrypoint,
+                get_occurrence_multiple_ins.entrypoint,
                 checklist.entrypoint,
                 statistics.entrypoint,
                 facet.entrypoint,
@@ -42,6 +43,8 @@ class OBISAgent(IChatBioAgent):
         match entrypoint:
             case get_occurrence.entrypoint.id:
                 await get_occurrence.run(request, context)
+            case get_occurrence_multiple_ins.entrypoint.id:
+                await get_occurrence_multiple_ins.run(request, context)
             case checklist.entrypoint.id:
                 await checklist.run(request, context)
             case statistics.entrypoint.id:
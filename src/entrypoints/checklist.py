@@ -9,7 +9,7 @@ from instructor.core import InstructorRetryException
 from schema import checklistApi
 from tenacity import AsyncRetrying
 
-import requests
+import httpx
 import http
 
 from ichatbio.agent import IChatBioAgent
@@ -17,7 +17,9 @@ from ichatbio.agent_response import ResponseContext, IChatBioAgentProcess
 from ichatbio.types import AgentCard, AgentEntrypoint
 
 from utils import search_helper as search
+from utils import prompt_helper as prompt
 from utils import utils
+from utils import obis_client
 
 description = """
 checklist - Species Inventory (Presence List)
@@ -47,6 +49,9 @@ entrypoint= AgentEntrypoint(
     parameters=None
 )
 
+search.register_response_model(entrypoint.id, checklistApi)
+prompt.register_prompt(entrypoint.id)
+
 async def run(request: str, context: ResponseContext):
 
     # Start a process to log the agent's actions
@@ -56,7 +61,7 @@ async def run(request: str, context: ResponseContext):
         await process.log("Generating search parameters for species checklist")
         
         try:
-            llmResponse = await search._generate_search_parameters(request, entrypoint, checklistApi)
+            llmResponse = await search._generate_search_parameters(request, entrypoint, checklistApi, on_field=utils.prefetchParam, process=process)
             
             if not llmResponse or "params" not in llmResponse:
                 exception = "Search parameters could not be generated from request."
@@ -140,17 +145,8 @@ async def run(request: str, context: ResponseContext):
         #         params['scientificname'] = scientificNames[0][1]
         #         del params['commonname']
 
-        if "institute" in params:
-            if not await utils.resolveParams(params, "institute", "instituteid", process):
-                return
-
-        if "area" in params:
-            if not await utils.resolveParams(params, "area", "areaid", process):
-                return
-
-        if "commonname" in params:
-            if not await utils.resolveParams(params, "commonname", "taxonid", process):
-                return 
+        if not await utils.resolveAllParams(params, process, ["institute", "area", "commonname"]):
+            return
 
 
         await process.log("Generated search parameters", data=params)
@@ -161,10 +157,15 @@ async def run(request: str, context: ResponseContext):
             url = utils.generate_obis_url("checklist", params)
             await process.log(f"Sending a GET request to the OBIS occurrence API at {url}")
 
-            response = requests.get(url)
+            try:
+                response = await obis_client.get(url)
+            except httpx.HTTPError as e:
+                await process.log(f"Failed to connect to OBIS API: {e}")
+                await utils.exceptionHandler(process, e, "Failed to Connect to OBIS")
+                return
             code = f"{response.status_code} {http.client.responses.get(response.status_code, '')}"
 
-            if response.ok:
+            if response.is_success:
                 await process.log(f"Response code: {code}")
             else:
                 await process.log(f"Response code: {code} - something went wrong!")
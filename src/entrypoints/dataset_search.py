@@ -5,14 +5,16 @@ from instructor.core import InstructorRetryException
 
 from schema import datasetSearchApi
 
-import requests
+import httpx
 import http
 
 from ichatbio.agent_response import ResponseContext, IChatBioAgentProcess
 from ichatbio.types import AgentEntrypoint
 
 from utils import search_helper as search
+from utils import prompt_helper as prompt
 from utils import utils
+from utils import obis_client
 
 entrypoint= AgentEntrypoint(
     id="dataset_search",
@@ -20,6 +22,9 @@ entrypoint= AgentEntrypoint(
     parameters=None
 )
 
+search.register_response_model(entrypoint.id, datasetSearchApi)
+prompt.register_prompt(entrypoint.id)
+
 async def run(request: str, context: ResponseContext):
 
     # Start a process to log the agent's actions
@@ -31,7 +36,7 @@ async def run(request: str, context: ResponseContext):
         await process.log("Generating search parameters for dataset search with common terms")
         
         try:
-            llmResponse = await search._generate_search_parameters(request, entrypoint, datasetSearchApi)
+            llmResponse = await search._generate_search_parameters(request, entrypoint, datasetSearchApi, process=process)
             if 'clarification_needed' in llmResponse.keys() and llmResponse['clarification_needed']:
                 raise Exception(llmResponse['reason'])
             params = llmResponse['params']
@@ -64,10 +69,15 @@ async def run(request: str, context: ResponseContext):
             url = utils.generate_obis_url("dataset/search2", params)
             await process.log(f"Sending a GET request to the OBIS dataset API at {url}")
 
-            response = requests.get(url)
+            try:
+                response = await obis_client.get(url)
+            except httpx.HTTPError as e:
+                await process.log(f"Failed to connect to OBIS API: {e}")
+                await utils.exceptionHandler(process, e, "Failed to Connect to OBIS")
+                return
             code = f"{response.status_code} {http.client.responses.get(response.status_code, '')}"
 
-            if response.ok:
+            if response.is_success:
                 await process.log(f"Response code: {code}")
             else:
                 await process.log(f"Response code: {code} - something went wrong!")
@@ -8,7 +8,7 @@ from instructor.core import InstructorRetryException
 from schema import facetsAPIParams
 from tenacity import AsyncRetrying
 
-import requests
+import httpx
 import http
 
 from ichatbio.agent import IChatBioAgent
@@ -16,7 +16,9 @@ from ichatbio.agent_response import ResponseContext, IChatBioAgentProcess
 from ichatbio.types import AgentCard, AgentEntrypoint
 
 from utils import search_helper as search
+from utils import prompt_helper as prompt
 from utils import utils
+from utils import obis_client
 
 description = """
 facet - Exploratory Categorical Counts
@@ -50,6 +52,9 @@ entrypoint= AgentEntrypoint(
     parameters=None
 )
 
+search.register_response_model(entrypoint.id, facetsAPIParams)
+prompt.register_prompt(entrypoint.id)
+
 
 async def run(request: str, context: ResponseContext):
 
@@ -60,7 +65,7 @@ async def run(request: str, context: ResponseContext):
         await process.log("Generating search parameters for species facet")
         
         try:
-            llmResponse = await search._generate_search_parameters(request, entrypoint, facetsAPIParams)
+            llmResponse = await search._generate_search_parameters(request, entrypoint, facetsAPIParams, on_field=utils.prefetchParam, process=process)
             
             if not llmResponse or "params" not in llmResponse:
                 exception = "Search parameters could not be generated from request."
@@ -79,21 +84,8 @@ async def run(request: str, context: ResponseContext):
             await utils.exceptionHandler(process, e, "Error generating obis parameters.")
             return
                 
-        if "institute" in params:
-            if not await utils.resolveParams(params, "institute", "instituteid", process):
-                return
-
-        if "area" in params:
-            if not await utils.resolveParams(params, "area", "areaid", process):
-                return
-
-        if "datasetname" in params:
-            if not await utils.resolveParams(params, "datasetname", 'datasetid', process):
-                return
-            
-        if "commonname" in params:
-            if not await utils.resolveParams(params, "commonname", "taxonid", process):
-                return 
+        if not await utils.resolveAllParams(params, process):
+            return
 
         # if "institute" in params:
         #     institutes = await utils.getInstituteId(params)
@@ -192,10 +184,15 @@ async def run(request: str, context: ResponseContext):
             url = utils.generate_obis_url("facet", params)
             await process.log(f"Sending a GET request to the OBIS occurrence API at {url}")
 
-            response = requests.get(url)
+            try:
+                response = await obis_client.get(url)
+            except httpx.HTTPError as e:
+                await process.log(f"Failed to connect to OBIS API: {e}")
+                await utils.exceptionHandler(process, e, "Failed to Connect to OBIS")
+                return
             code = f"{response.status_code} {http.client.responses.get(response.status_code, '')}"
 
-            if response.ok:
+            if response.is_success:
                 await process.log(f"Response code: {code}")
             else:
                 await process.log(f"Response code: {code} - something went wrong!")
@@ -1,45 +1,87 @@
 from ichatbio.types import AgentEntrypoint
 # from ichatbio.types import Message, TextMessage, ProcessMessage, ArtifactMessage
 import utils
-from openai import OpenAI, AsyncOpenAI
 
-import instructor
 from instructor.core import InstructorRetryException
 
 from schema import occurrenceApi
-from tenacity import AsyncRetrying
 
-import requests
+import httpx
 import http
+import asyncio
+import json
 
-from ichatbio.agent import IChatBioAgent
 from ichatbio.agent_response import ResponseContext, IChatBioAgentProcess
-from ichatbio.types import AgentCard, AgentEntrypoint
+from ichatbio.types import AgentEntrypoint
 
 from utils import search_helper as search
 from utils import utils
+from utils import obis_client
 
-from langchain.agents import tool
-from artifact_registry import ArtifactRegistry
-
-import json
+from entrypoints import get_occurrence
 
 description = """
-Retrieve occurrence records of species from OBIS matching query criteria. 
-When query asks for species records and not just summary or total number of records direct them here.
+get_occurrence_multiple_institutes - Occurrence Records Across Matching Institutes
+
+Purpose:
+Retrieve occurrence records for every OBIS institute that matches an ambiguous institute name.
 
-Here are some examples:
-- Get n records of a species from a area or place or region.
-- Get records of a species from an institute or dataset.
-- Records found in a geographic location during a period.
+Use ONLY when:
+User names an institute that may match several OBIS institutes.
+User wants records from all of them side by side.
+
+Examples:
+“Get records of brachyura from every Smithsonian institute.”
+“Show kelp records held by any Institute of Oceanology.”
+
+Do NOT use when:
+No institute is named.
+User wants aggregated counts or trends.
 """
 
 entrypoint= AgentEntrypoint(
-    id="get_occurrence_2",
+    id="get_occurrence_multiple_institutes",
     description=description,
     parameters=None
 )
 
+# how many institutes are queried at the same time, and how long one of them may take
+INSTITUTE_CONCURRENCY = int(utils.getValue("OBIS_INSTITUTE_CONCURRENCY", 4))
+INSTITUTE_TIMEOUT = float(utils.getValue("OBIS_INSTITUTE_TIMEOUT", 15))
+
+
+async def fetch_institute(institute: dict, params: dict, semaphore: asyncio.Semaphore):
+    """
+    Queries OBIS occurrences for a single institute. Returns (institute, url, response_json),
+    with an exception in place of response_json if the request failed or timed out.
+    """
+    institute_params = dict(params)
+    institute_params["instituteid"] = institute.get("id")
+    url = utils.generate_obis_url("occurrence", institute_params)
+
+    async with semaphore:
+        try:
+            async with asyncio.timeout(INSTITUTE_TIMEOUT):
+                response = await obis_client.get(url, timeout=INSTITUTE_TIMEOUT)
+        except (TimeoutError, httpx.HTTPError) as e:
+            return institute, url, e
+
+    if not response.is_success:
+        code = f"{response.status_code} {http.client.responses.get(response.status_code, '')}"
+        return institute, url, Exception(f"Response code: {code}")
+
+    try:
+        return institute, url, response.json()
+    except ValueError as e:
+        return institute, url, e
+
+
+def prefetch(parameter: str, value):
+    # the area only narrows the institute match here, it is never resolved on its own
+    if parameter != "area":
+        utils.prefetchParam(parameter, value)
+
+
 async def run(request: str, context: ResponseContext):
 
     # Start a process to log the agent's actions
@@ -49,120 +91,99 @@ async def run(request: str, context: ResponseContext):
         await process.log("Original request: " + request)
 
         await process.log("Generating search parameters for species occurrences")
-        
+
         try:
-            llmResponse = await search._generate_search_parameters(request, entrypoint, occurrenceApi)
-            if 'clarification_needed' in llmResponse.keys() and llmResponse['clarification_needed']:
-                raise Exception(llmResponse['reason'])
+            # the params are the same as get_occurrence, so are the prompt examples. the rule
+            # based parser cannot tell an institute from an area, so always ask the LLM
+            llmResponse = await search._generate_search_parameters(request, get_occurrence.entrypoint, occurrenceApi, fast_path=False, on_field=prefetch, process=process)
+
+            if not llmResponse or "params" not in llmResponse:
+                exception = "Search parameters could not be generated from request."
+                if 'reason' in llmResponse:
+                    exception += llmResponse['reason']
+                raise Exception(exception)
             params = llmResponse['params']
+            if 'clarification_needed' in llmResponse.keys() and llmResponse['clarification_needed']:
+                exception = 1
+                if unresolved := llmResponse.get('unresolved_params', ''):
+                    if 'institute' in params and 'instituteid' in unresolved:
+                        exception = 0
+                if exception:
+                    raise Exception(llmResponse['reason'])
         except Exception as e:
             await utils.exceptionHandler(process, e, "Error generating obis parameters.")
             return
 
         await process.log("Initial params generated", data=params)
 
-        if "area" in params:
-            matches = await utils.getAreaId(params.get("area"))
-            print("area matches")
-            print(matches)
-            if len(matches) == 0:
-                await utils.exceptionHandler(process, None, "The area specified doesn't match any OBIS list of areas")
-                return
-            if len(matches) > 1:
-                await process.log("Multiple area matches found")
-            areas = ""+matches[0].get("areaid")
-            for match in matches[1:]:
-                areas+=","
-                areas+=match.get("areaid")
-            params["areaid"] = areas
-            del params["area"]
-
-        institutes = []
-
-        if "institute" in params:
-            institutes = await utils.getInstituteId(params)
-            # print(institutes)
-            # if matches and len(matches) > 1:
-            #     await process.log("Multiple institute matches found")
-            # params["instituteid"] = match.get("id")
-            del params["institute"]
-
-        
-        await process.log("Generated search parameters", data=params)
-
-        await process.log("Querying OBIS")
-        try:
-
-            urls = []
-            matching_count = 0
-            record_count = 0
-            institutes_list = ""
+        if "institute" not in params:
+            await utils.exceptionHandler(process, None, "No institute name found in the request")
+            return
 
-            if len(institutes) > 0:
-                records = {"total":0, "records": {}}
+        # institute gets higher priority than area, the area only narrows the institute match
+        institute_query = {key: params.pop(key) for key in ("institute", "area") if key in params}
 
-                for institute in institutes:
-                    params["instituteid"] = institute.get("id")
-                    institutes_list += institute["name"] + ","
-                
-                    url = utils.generate_obis_url("occurrence", params)
-                    urls.append(url)
-                    await process.log(f"Sending a GET request to the OBIS occurrence API at {url}")
+        institutes, resolved = await asyncio.gather(
+            utils.getInstituteId(institute_query),
+            utils.resolveAllParams(params, process, ["datasetname", "commonname"]),
+        )
 
-                    response = requests.get(url)
-                    code = f"{response.status_code} {http.client.responses.get(response.status_code, '')}"
+        if not resolved:
+            return
 
-                    if response.ok:
-                        await process.log(f"Response code: {code}")
-                    else:
-                        await process.log(f"Response code: {code} - something went wrong!")
-                        return
-                    
-                    response_json = response.json()
+        if not institutes or len(institutes) == 0:
+            await process.log("OBIS doesn't have any institutes named " + institute_query["institute"])
+            return
 
-                    records["records"][institute.get("name")] = response_json.get("results", [])
-                
-                    matching_count += response_json.get("total", 0)
-                    record_count += len(response_json.get("results", []))
+        await process.log("Generated search parameters", data=params)
 
-                records["total"] = matching_count
+        await process.log(
+            f"Querying OBIS for {len(institutes)} matching institutes: " + ", ".join(i.get("name", "") for i in institutes)
+        )
+        try:
+            semaphore = asyncio.Semaphore(INSTITUTE_CONCURRENCY)
+            tasks = [fetch_institute(institute, params, semaphore) for institute in institutes]
 
-                await process.log(
-                    text=f"The API query returned {record_count} out of {matching_count} matching records in OBIS"
-                )
+            urls = []
+            chunks = []
+            failed = []
+            matching_count = 0
+            record_count = 0
 
-                # print(records)
+            # merge each institute's records into the artifact content as soon as it arrives
+            for task in asyncio.as_completed(tasks):
+                institute, url, result = await task
+                name = institute.get("name", "")
 
-                content = json.dumps(records).encode("utf-8")
-                artifact_description = "OBIS has " + str(len(institutes)) + " matching with the query input of institute name. " + \
-                                        "They are " + institutes_list + "Retrieve 10 records for each of them."
+                if isinstance(result, Exception):
+                    await process.log(f"Failed to fetch records for {name} at {url}: {result}")
+                    failed.append(name)
+                    continue
 
-            else:
-                url = utils.generate_obis_url("occurrence", params)
+                results = result.get("results", [])
                 urls.append(url)
+                # keyed by id, two institutes may share a name
+                value = {"name": name, "records": results}
+                chunks.append(json.dumps(str(institute.get("id", ""))).encode("utf-8") + b": " + json.dumps(value).encode("utf-8"))
+                matching_count += result.get("total", 0)
+                record_count += len(results)
 
-                await process.log(f"Sending a GET request to the OBIS occurrence API at {url}")
+                await process.log(f"Retrieved {len(results)} records for {name}")
 
-                response = requests.get(url)
-                code = f"{response.status_code} {http.client.responses.get(response.status_code, '')}"
+            if len(chunks) == 0:
+                await process.log("OBIS returned no records for any of the matching institutes - something went wrong!")
+                return
 
-                if response.ok:
-                    await process.log(f"Response code: {code}")
-                else:
-                    await process.log(f"Response code: {code} - something went wrong!")
-                    return
-                
-                response_json = response.json()
-            
-                matching_count = response_json.get("total", 0)
-                record_count = len(response_json.get("results", []))
+            await process.log(
+                text=f"The API query returned {record_count} out of {matching_count} matching records in OBIS"
+            )
 
-                await process.log(
-                    text=f"The API query returned {record_count} out of {matching_count} matching records in OBIS"
-                )
+            content = b'{"records": {' + b", ".join(chunks) + b'}, "total": ' + str(matching_count).encode("utf-8") + b"}"
 
-                content = None
-                artifact_description = "OBIS returned the following data for the query: " + request
+            artifact_description = "OBIS has " + str(len(institutes)) + " institutes matching the institute name in the query. " + \
+                                    "Records for " + str(len(chunks)) + " of them are included."
+            if len(failed) > 0:
+                artifact_description += " Records could not be fetched for " + ", ".join(failed) + "."
 
             await process.create_artifact(
                 mimetype="application/json",
@@ -173,7 +194,7 @@ async def run(request: str, context: ResponseContext):
                     "portal_url": "portal_url",
                     "retrieved_record_count": record_count,
                     "total_matching_count": matching_count
-                }, 
+                },
                 content=content,
             )
 
@@ -5,14 +5,16 @@ from instructor.core import InstructorRetryException
 
 from schema import instituteApi
 
-import requests
+import httpx
 import http
 
 from ichatbio.agent_response import ResponseContext, IChatBioAgentProcess
 from ichatbio.types import AgentEntrypoint
 
 from utils import search_helper as search
+from utils import prompt_helper as prompt
 from utils import utils
+from utils import obis_client
 
 description = """
 institute — Institute Discovery Endpoint
@@ -38,6 +40,9 @@ entrypoint= AgentEntrypoint(
     parameters=None
 )
 
+search.register_response_model(entrypoint.id, instituteApi)
+prompt.register_prompt(entrypoint.id)
+
 async def run(request: str, context: ResponseContext):
 
     # Start a process to log the agent's actions
@@ -49,7 +54,7 @@ async def run(request: str, context: ResponseContext):
         await process.log("Generating search parameters for institute records")
         
         try:
-            llmResponse = await search._generate_search_parameters(request, entrypoint, instituteApi)
+            llmResponse = await search._generate_search_parameters(request, entrypoint, instituteApi, on_field=utils.prefetchParam, process=process)
             if 'clarification_needed' in llmResponse.keys() and llmResponse['clarification_needed']:
                 raise Exception(llmResponse['reason'])
             params = llmResponse['params']
@@ -59,17 +64,8 @@ async def run(request: str, context: ResponseContext):
 
         await process.log("Initial params generated", data=params)
 
-        if "institute" in params:
-            if not await utils.resolveParams(params, "institute", "instituteid", process):
-                return
-
-        if "area" in params:
-            if not await utils.resolveParams(params, "area", "areaid", process):
-                return
-            
-        if "commonname" in params:
-            if not await utils.resolveParams(params, "commonname", "taxonid", process):
-                return 
+        if not await utils.resolveAllParams(params, process, ["institute", "area", "commonname"]):
+            return
 
         # if "institute" in params:
         #     institutes = await utils.getInstituteId(params)
@@ -116,10 +112,15 @@ async def run(request: str, context: ResponseContext):
             url = utils.generate_obis_url("institute", params)
             await process.log(f"Sending a GET request to the OBIS institute API at {url}")
 
-            response = requests.get(url)
+            try:
+                response = await obis_client.get(url)
+            except httpx.HTTPError as e:
+                await process.log(f"Failed to connect to OBIS API: {e}")
+                await utils.exceptionHandler(process, e, "Failed to Connect to OBIS")
+                return
             code = f"{response.status_code} {http.client.responses.get(response.status_code, '')}"
 
-            if response.ok:
+            if response.is_success:
                 await process.log(f"Response code: {code}")
             else:
                 await process.log(f"Response code: {code} - something went wrong!")
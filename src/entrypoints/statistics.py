@@ -9,15 +9,18 @@ from instructor.core import InstructorRetryException
 from schema import statisticsApi
 from tenacity import AsyncRetrying
 
-import requests
+import httpx
 import http
+import asyncio
 
 from ichatbio.agent import IChatBioAgent
 from ichatbio.agent_response import ResponseContext, IChatBioAgentProcess
 from ichatbio.types import AgentCard, AgentEntrypoint
 
 from utils import search_helper as search
+from utils import prompt_helper as prompt
 from utils import utils
+from utils import obis_client
 
 description = """
 statistics - Analytical Aggregations
@@ -47,6 +50,30 @@ entrypoint= AgentEntrypoint(
     parameters=None
 )
 
+search.register_response_model(entrypoint.id, statisticsApi)
+prompt.register_prompt(entrypoint.id, examples=False)
+
+# how many statistics/<extension> urls are fetched at the same time
+STATISTICS_CONCURRENCY = int(utils.getValue("OBIS_STATISTICS_CONCURRENCY", 4))
+
+
+async def fetch_statistics(urls: list[str], limit: int) -> list:
+    """
+    Fetches all urls concurrently, at most `limit` at a time. Results are returned in the
+    order of `urls`; a url that could not be reached yields its httpx error instead of a
+    response so one failure does not discard the others.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def fetch(url):
+        async with semaphore:
+            try:
+                return await obis_client.get(url)
+            except httpx.HTTPError as e:
+                return e
+
+    return await asyncio.gather(*[fetch(url) for url in urls])
+
 
 async def run(request: str, context: ResponseContext):
 
@@ -57,7 +84,7 @@ async def run(request: str, context: ResponseContext):
         await process.log("Generating search parameters for statistics of species")
         
         try:
-            llmResponse = await search._generate_search_parameters(request, entrypoint, statisticsApi)
+            llmResponse = await search._generate_search_parameters(request, entrypoint, statisticsApi, on_field=utils.prefetchParam, process=process)
             
             if not llmResponse or "params" not in llmResponse:
                 exception = "Search parameters could not be generated from request."
@@ -78,21 +105,8 @@ async def run(request: str, context: ResponseContext):
 
         await process.log("Initial params generated", data=params)
 
-        if "institute" in params:
-            if not await utils.resolveParams(params, "institute", "instituteid", process):
-                return
-
-        if "area" in params:
-            if not await utils.resolveParams(params, "area", "areaid", process):
-                return
-
-        if "datasetname" in params:
-            if not await utils.resolveParams(params, "datasetname", 'datasetid', process):
-                return
-            
-        if "commonname" in params:
-            if not await utils.resolveParams(params, "commonname", "taxonid", process):
-                return 
+        if not await utils.resolveAllParams(params, process):
+            return
         
         await process.log("Generated search parameters", data=params)
 
@@ -110,21 +124,31 @@ async def run(request: str, context: ResponseContext):
             for url in urls:
                 await process.log(f"Sending a GET request to the OBIS statistics API at {url}")
 
-                response = requests.get(url)
+            responses = await fetch_statistics(urls, STATISTICS_CONCURRENCY)
+
+            failed = []
+            for url, response in zip(urls, responses):
+                if isinstance(response, httpx.HTTPError):
+                    await process.log(f"Failed to connect to OBIS API at {url}: {response}")
+                    failed.append(url)
+                    continue
+
                 code = f"{response.status_code} {http.client.responses.get(response.status_code, '')}"
 
-                if response.ok:
+                if response.is_success:
                     await process.log(f"Response code: {code}")
                 else:
                     await process.log(f"Response code: {code} - something went wrong!")
-                    return
+                    failed.append(url)
+                    continue
                 
                 try:
                     response_json = response.json()
                 except ValueError as e:
                     await process.log("Failed to decode OBIS response as JSON.")
                     await utils.exceptionHandler(process, e, "Failed to decode OBIS response as JSON.")
-                    return
+                    failed.append(url)
+                    continue
 
                 await process.log(
                     text=f"The API query using URL {url} returned statistics for species from OBIS"
@@ -132,8 +156,6 @@ async def run(request: str, context: ResponseContext):
 
                 record_count = len(response_json)
 
-                print("hrer")
-
                 await process.create_artifact(
                     mimetype="application/json",
                     description="OBIS data for the prompt: " + request,
@@ -146,6 +168,9 @@ async def run(request: str, context: ResponseContext):
                 )
 
                 await process.log("artifact created")
+
+            if len(failed) > 0 and len(failed) < len(urls):
+                await process.log(f"{len(failed)} of {len(urls)} statistics requests failed: " + ", ".join(failed))
         except InstructorRetryException as e:
             print(e)
             await process.log("Sorry, I couldn't find any species statistics.")
@@ -9,7 +9,7 @@ from instructor.core import InstructorRetryException
 from schema import taxonApi
 from tenacity import AsyncRetrying
 
-import requests
+import httpx
 import http
 
 from ichatbio.agent import IChatBioAgent
@@ -17,7 +17,9 @@ from ichatbio.agent_response import ResponseContext, IChatBioAgentProcess
 from ichatbio.types import AgentCard, AgentEntrypoint
 
 from utils import search_helper as search
+from utils import prompt_helper as prompt
 from utils import utils
+from utils import obis_client
 
 # from langchain.agents import tool
 # from artifact_registry import ArtifactRegistry
@@ -47,6 +49,9 @@ entrypoint= AgentEntrypoint(
     parameters=None
 )
 
+search.register_response_model(entrypoint.id, taxonApi)
+prompt.register_prompt(entrypoint.id)
+
 async def run(request: str, context: ResponseContext):
 
     # Start a process to log the agent's actions
@@ -58,7 +63,7 @@ async def run(request: str, context: ResponseContext):
         await process.log("Generating search parameters for taxon api")
         
         try:
-            llmResponse = await search._generate_search_parameters(request, entrypoint, taxonApi)
+            llmResponse = await search._generate_search_parameters(request, entrypoint, taxonApi, process=process)
             
             if not llmResponse or "params" not in llmResponse:
                 exception = "Search parameters could not be generated from request."
@@ -134,15 +139,15 @@ async def run(request: str, context: ResponseContext):
             await process.log(f"Sending a GET request to the OBIS occurrence API at {url}")
 
             try:
-                response = requests.get(url, timeout=10)
-            except requests.exceptions.RequestException as e:
+                response = await obis_client.get(url)
+            except httpx.HTTPError as e:
                 await process.log(f"Failed to connect to OBIS API: {e}")
                 await utils.exceptionHandler(process, e, "Failed to Connect to OBIS")
                 return
             
             code = f"{response.status_code} {http.client.responses.get(response.status_code, '')}"
 
-            if response.ok:
+            if response.is_success:
                 await process.log(f"OBIS data retrived successfully: {code}")
             else:
                 await process.log(f"OBIS returned error {response.status_code} - something went wrong!")
@@ -258,8 +258,8 @@ class facetsAPIParams(BaseModel):
         raise ValueError("Incorrect date format. Allowed: YYYY-MM-DD, YYYY/MM/DD, DD-MM-YYYY, DD/MM/YYYY")
 
     @field_validator('enddepth')
-    def validate_depth_range(cls, value, values):
-        start_depth = values.get('startdepth')
+    def validate_depth_range(cls, value, info):
+        start_depth = info.data.get('startdepth')
         if start_depth is not None and value is not None and value < start_depth:
             raise ValueError("enddepth must be greater than or equal to startdepth")
         return value
@@ -0,0 +1,199 @@
+"""
+Precomputed embeddings of the area, institute and dataset names, for semantic matching.
+
+Encoding every catalogue name on each request was too slow, which is why the embedding
+versions of `hybrid_match` are commented out. Here the names are embedded once by an
+offline build step with a CPU sentence-transformers model. The unit vectors are stored
+as an int8 (or float16) matrix in `<kind>.npy`, next to a `<kind>.json` sidecar with the
+ids, names, model and dtype. At query time the matrix is memory-mapped, only the query is
+encoded, and the cosine top-k is one matrix-vector product.
+
+    pip install -e .[embeddings]
+    PYTHONPATH=src python -m utils.embedding_index          # all kinds
+    PYTHONPATH=src python -m utils.embedding_index area     # one kind
+
+Without the index files or the sentence-transformers package `search` returns None and
+the callers keep their fuzzy and network paths.
+
+Tunables (environment or src/env.yaml):
+    OBIS_EMBEDDING_INDEX_PATH   directory of the index files (default "embeddings")
+    OBIS_EMBEDDING_MODEL        model used by the build (default "sentence-transformers/all-MiniLM-L6-v2")
+    OBIS_EMBEDDING_DTYPE        "int8" or "float16" (default "int8")
+    OBIS_EMBEDDING_MIN_SCORE    cosine similarity below which nothing is returned (default 0.5)
+"""
+import asyncio
+import functools
+import importlib.util
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from utils import utils
+from utils import fuzzy
+
+DEFAULT_PATH = "embeddings"
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_DTYPE = "int8"
+DEFAULT_MIN_SCORE = 0.5
+
+# rows converted to float32 at a time, so the product never needs a float copy of the matrix
+CHUNK_ROWS = 8192
+
+# kind -> (catalogue file, queryType of utils.getData, field with the name)
+CATALOGUES = {
+    "area": ("areas.json", "areaid", "name"),
+    "institute": ("institutes.json", "institute", "name"),
+    "dataset": ("datasets.json", "dataset", "title"),
+}
+
+Encoder = Callable[[list[str]], np.ndarray]
+
+
+def available() -> bool:
+    return importlib.util.find_spec("sentence_transformers") is not None
+
+
+# one load of a model at a time, so concurrent first queries do not download it twice
+_model_lock = threading.Lock()
+
+
+@functools.cache
+def sentence_encoder(model_name: str) -> Encoder:
+    """Encoder of a sentence-transformers model on the CPU, loaded once per model."""
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    return lambda texts: model.encode(texts, batch_size=256, normalize_embeddings=True, convert_to_numpy=True)
+
+
+def encode_with(model_name: str, texts: list[str]) -> np.ndarray:
+    """Encodes `texts` with the model, loading (maybe downloading) it on first use."""
+    with _model_lock:
+        encoder = sentence_encoder(model_name)
+    return encoder(texts)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> np.ndarray:
+    if dtype == "int8":
+        return np.round(vectors * 127).astype(np.int8)
+    if dtype == "float16":
+        return vectors.astype(np.float16)
+    raise ValueError(f"Unsupported embedding dtype {dtype}, use int8 or float16")
+
+
+def build(kind: str, entries: list[dict], directory: str | Path, encoder: Encoder, model_name: str, dtype: str = DEFAULT_DTYPE):
+    """Embeds the names of `entries` and writes `<kind>.npy` and `<kind>.json` into `directory`."""
+    _, _, field = CATALOGUES[kind]
+    entries = [entry for entry in entries if entry.get("id") is not None and entry.get(field)]
+    names = [entry[field] for entry in entries]
+
+    vectors = quantize(normalize(encoder(names)), dtype)
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    np.save(directory / f"{kind}.npy", vectors)
+    with open(directory / f"{kind}.json", "w", encoding="utf-8") as f:
+        json.dump({"model": model_name, "dtype": dtype, "ids": [entry["id"] for entry in entries], "names": names}, f, ensure_ascii=False)
+
+
+class EmbeddingIndex:
+
+    def __init__(self, matrix: np.ndarray, ids: list, names: list[str], model: str, dtype: str):
+        self.matrix = matrix
+        self.ids = ids
+        self.names = names
+        self.model = model
+        self.scale = 127.0 if dtype == "int8" else 1.0
+
+    @classmethod
+    def load(cls, directory: str | Path, kind: str) -> "EmbeddingIndex":
+        directory = Path(directory)
+        with open(directory / f"{kind}.json", "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        matrix = np.load(directory / f"{kind}.npy", mmap_mode="r")
+        return cls(matrix, sidecar["ids"], sidecar["names"], sidecar["model"], sidecar["dtype"])
+
+    def scores(self, query_vector: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the query with every name."""
+        query_vector = normalize(query_vector).reshape(-1)
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), CHUNK_ROWS):
+            chunk = np.asarray(self.matrix[start:start + CHUNK_ROWS], dtype=np.float32)
+            scores[start:start + CHUNK_ROWS] = chunk @ query_vector
+        return scores / self.scale
+
+    def search(self, query_vector: np.ndarray, best_n: int = 5, min_score: float = DEFAULT_MIN_SCORE) -> list[dict]:
+        """Up to `best_n` of {"id", "name", "score"}, best first; [] if none reaches `min_score`."""
+        scores = self.scores(query_vector)
+        return [
+            {"id": self.ids[i], "name": self.names[i], "score": float(scores[i])}
+            for i in fuzzy.top_k(scores, best_n)
+            if scores[i] >= min_score
+        ]
+
+
+def index_path() -> Path:
+    return Path(utils.getValue("OBIS_EMBEDDING_INDEX_PATH", DEFAULT_PATH))
+
+
+@functools.lru_cache(maxsize=8)
+def _load(directory: str, kind: str, mtime: float) -> EmbeddingIndex:
+    return EmbeddingIndex.load(directory, kind)
+
+
+def get_index(kind: str) -> EmbeddingIndex | None:
+    """The index of `kind`, reloaded when it is rebuilt, or None if it was not built."""
+    directory = index_path()
+    matrix = directory / f"{kind}.npy"
+    if not matrix.exists() or not (directory / f"{kind}.json").exists():
+        return None
+    return _load(str(directory), kind, os.path.getmtime(matrix))
+
+
+async def search(kind: str, query: str, best_n: int = 5, encoder: Encoder | None = None) -> list[dict] | None:
+    """
+    Names of `kind` most similar in meaning to `query`, in the same form as hybrid_match's
+    results, or None if there is no index or no way to encode the query.
+    """
+    index = get_index(kind)
+    if index is None or not query:
+        return None
+    if encoder is None:
+        if not available():
+            return None
+        encoder = functools.partial(encode_with, index.model)
+
+    # loading the model and encoding are slow; keep the event loop free for the other resolutions
+    query_vector = await asyncio.to_thread(encoder, [query])
+    min_score = float(utils.getValue("OBIS_EMBEDDING_MIN_SCORE", DEFAULT_MIN_SCORE))
+    return index.search(query_vector[0], best_n, min_score)
+
+
+async def build_all(kinds: list[str]):
+    if not available():
+        raise SystemExit("sentence-transformers is not installed: pip install -e .[embeddings]")
+
+    model_name = utils.getValue("OBIS_EMBEDDING_MODEL", DEFAULT_MODEL)
+    dtype = utils.getValue("OBIS_EMBEDDING_DTYPE", DEFAULT_DTYPE)
+    encoder = sentence_encoder(model_name)
+
+    for kind in kinds:
+        path, query_type, _ = CATALOGUES[kind]
+        entries = await utils.getData(path, query_type)
+        build(kind, entries, index_path(), encoder, model_name, dtype)
+        print(f"Embedded {len(entries)} {kind} names into {index_path() / kind}.npy")
+
+
+if __name__ == "__main__":
+    asyncio.run(build_all(sys.argv[1:] or list(CATALOGUES)))
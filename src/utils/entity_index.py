@@ -0,0 +1,91 @@
+"""
+In-memory inverted token index over a catalogue of named entities (institutes.json).
+
+Scoring every entry of the catalogue on every request grows with the catalogue. The index
+is built once per version of the catalogue file and only scores the entries that share a
+rare token with the query. The score is the share of query tokens found in the entry's
+name, the same as hybrid_match's (`fuzzy.token_overlap`). Tokens are matched without case
+and punctuation, and the entry's country counts as part of its name. Ties are broken by the idf of the matched
+tokens, so "Marine Institute Ireland" prefers the entry matching the rare "ireland" over
+one matching only the common "institute".
+
+Pruning is exact. An entry reaches the threshold only if it matches at least
+`ceil(threshold * len(query tokens))` of them, so it must contain one of the rarest
+query tokens whose combined count exceeds that of the remaining tokens. Only the
+postings of those rare tokens are read.
+"""
+import functools
+import heapq
+import json
+import math
+import re
+
+
+def tokenize(text: str | None) -> list[str]:
+    return re.findall(r"\w+", text.casefold()) if text else []
+
+
+class TokenIndex:
+
+    def __init__(self, entries: list[dict], fields: tuple[str, ...] = ("name", "country")):
+        self.entries = entries
+        self.tokens: list[frozenset[str]] = []
+        self.postings: dict[str, list[int]] = {}
+
+        for i, entry in enumerate(entries):
+            tokens = frozenset(token for field in fields for token in tokenize(entry.get(field)))
+            self.tokens.append(tokens)
+            for token in tokens:
+                self.postings.setdefault(token, []).append(i)
+
+        self.idf = {token: math.log(1 + len(entries) / len(ids)) for token, ids in self.postings.items()}
+
+    def candidates(self, query_tokens: list[str], needed: int) -> set[int]:
+        """Entries that can match `needed` of the query tokens."""
+        counts = {}
+        for token in query_tokens:
+            counts[token] = counts.get(token, 0) + 1
+
+        # rarest first; stop once the tokens left could not reach `needed` on their own
+        remaining = len(query_tokens)
+        found = set()
+        for token in sorted(counts, key=lambda t: len(self.postings.get(t, ()))):
+            if remaining < needed:
+                break
+            found.update(self.postings.get(token, ()))
+            remaining -= counts[token]
+        return found
+
+    def search(self, query: str, best_n: int = 5, threshold: float = 0.5) -> list[dict]:
+        """
+        Up to `best_n` entries as {"id", "name", "score"}, best first, whose score is at
+        least `threshold`. As with hybrid_match, an empty list means no good match.
+        """
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+
+        needed = max(1, math.ceil(threshold * len(query_tokens) - 1e-9))
+        scored = []
+        for i in self.candidates(query_tokens, needed):
+            matched = [token for token in query_tokens if token in self.tokens[i]]
+            if len(matched) < needed:
+                continue
+            weight = sum(self.idf[token] for token in set(matched))
+            scored.append((-len(matched), -weight, i))
+
+        return [
+            {
+                "id": self.entries[i]["id"],
+                "name": self.entries[i]["name"],
+                "score": -matched / len(query_tokens),
+            }
+            for matched, _, i in heapq.nsmallest(best_n, scored)
+        ]
+
+
+@functools.lru_cache(maxsize=4)
+def load(path: str, mtime: float) -> TokenIndex:
+    """Index of the catalogue file at `path`, rebuilt when its mtime changes."""
+    with open(path, "r") as f:
+        return TokenIndex(json.load(f))
@@ -0,0 +1,165 @@
+"""
+Rule-based parameter generation for simple requests, tried before the LLM.
+
+Requests such as "20 records of Egregia menziesii from California after 2010" or
+"occurrence record with id 0000039c-74cd-4e37-9bf8-848d560bf519" are parsed with regular
+expressions into the same generation dict the LLM returns. The parser only answers when
+it is confident. The whole request has to match one of the patterns, the name has to look
+like a Latin binomial, and the place must not look like an institute. Anything else
+returns None and goes to the LLM.
+
+Tunables (environment or src/env.yaml):
+    OBIS_FAST_PATH      "false" to always ask the LLM (default "true")
+"""
+import re
+
+from pydantic import ValidationError
+
+from schema import occurrenceApi, statisticsApi
+from utils import utils
+
+UUID = r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+
+VERB = r"(?:(?:please\s+)?(?:get|show|find|fetch|list|retrieve|search\s+for|give)\s+(?:me\s+)?)?(?:the\s+|all\s+)?"
+NAME = r"(?P<name>[A-Z][a-z]+\s+[a-z]+)"
+PLACE = r"(?:\s+(?:from|in|off|around)\s+(?:the\s+)?(?P<area>[A-Z][A-Za-z]+(?:\s+[A-Z][A-Za-z]+){0,3}))?"
+TIME = (
+    r"(?:\s+(?:(?P<since>since|from|after)\s+(?P<start>\d{4})"
+    r"|(?P<until>before|until|up\s+to)\s+(?P<end>\d{4})"
+    r"|between\s+(?P<from>\d{4})\s+and\s+(?P<to>\d{4})))?"
+)
+END = r"\s*[.?!]?\s*$"
+
+OCCURRENCE_ID = re.compile(
+    rf"^{VERB}(?:occurrence\s+)?(?:records?|occurrences?)\s+(?:with\s+)?(?:the\s+)?(?:id|uuid)\s+(?P<id>{UUID}){END}", re.I
+)
+OCCURRENCES = re.compile(
+    rf"^{VERB}(?:(?P<size>\d+)\s+)?(?:occurrence\s+)?(?:records?|occurrences?)\s+(?:of|for)\s+{NAME}{PLACE}{TIME}{END}", re.I
+)
+STATISTICS = re.compile(
+    rf"^{VERB}(?P<years>year(?:ly|-wise|\s+wise)\s+)?(?:statistics|stats|counts?|trends?)\s+(?:of|for)\s+(?:records\s+of\s+)?{NAME}{PLACE}{TIME}{END}", re.I
+)
+
+# endings of Latin species epithets; common names ("blue whale", "great white") rarely have them
+EPITHET_ENDINGS = ("us", "um", "a", "ae", "i", "is", "es", "as", "x", "er", "or", "ix", "ys", "oides")
+
+# English words that would otherwise pass for a genus or an epithet
+COMMON_WORDS = {
+    "common", "great", "blue", "white", "green", "red", "black", "grey", "gray", "giant", "sea", "reef",
+    "atlantic", "pacific", "indian", "arctic", "southern", "northern", "all", "any", "some", "many",
+    "octopus", "walrus", "platypus", "nautilus", "hippocampus", "asteroidea", "plankton", "algae", "data",
+}
+
+# words in a place that make it more likely an institute, which needs the institute resolver
+INSTITUTE_WORDS = {
+    "institute", "institution", "university", "museum", "center", "centre", "laboratory", "lab", "agency",
+    "survey", "society", "council", "department", "service", "foundation", "college", "school", "obis",
+}
+
+
+def enabled() -> bool:
+    return str(utils.getValue("OBIS_FAST_PATH", "true")).lower() == "true"
+
+
+def looks_like_binomial(name: str) -> bool:
+    genus, epithet = name.split()
+    if genus.lower() in COMMON_WORDS or epithet.lower() in COMMON_WORDS:
+        return False
+    return genus.istitle() and epithet.islower() and epithet.endswith(EPITHET_ENDINGS)
+
+
+def looks_like_area(area: str) -> bool:
+    words = area.split()
+    # proper nouns only, and acronyms (CSIRO, NOAA) are usually institutes
+    if not all(w.istitle() for w in words):
+        return False
+    return not any(w.lower() in INSTITUTE_WORDS for w in words)
+
+
+def _common_params(match: re.Match) -> dict | None:
+    name = " ".join(match["name"].split())
+    if not looks_like_binomial(name):
+        return None
+
+    params = {"scientificname": name}
+
+    if match["area"]:
+        if not looks_like_area(match["area"]):
+            return None
+        params["area"] = " ".join(match["area"].split())
+
+    if match["start"]:
+        year = int(match["start"])
+        params["startdate"] = f"{year + 1 if match['since'].lower() == 'after' else year}-01-01"
+    if match["end"]:
+        year = int(match["end"])
+        params["enddate"] = f"{year - 1 if match['until'].lower() == 'before' else year}-12-31"
+    if match["from"]:
+        # a reversed range is more likely a slip the LLM should ask about
+        if int(match["from"]) > int(match["to"]):
+            return None
+        params["startdate"] = f"{match['from']}-01-01"
+        params["enddate"] = f"{match['to']}-12-31"
+
+    return params
+
+
+def parse_occurrence(request: str) -> dict | None:
+    if found := OCCURRENCE_ID.match(request.strip()):
+        return {"id": found["id"].lower()}
+
+    match = OCCURRENCES.match(request.strip())
+    if not match:
+        return None
+
+    if match["size"] and int(match["size"]) == 0:
+        return None
+
+    params = _common_params(match)
+    if params is not None and match["size"]:
+        params["size"] = int(match["size"])
+    return params
+
+
+def parse_statistics(request: str) -> dict | None:
+    match = STATISTICS.match(request.strip())
+    if not match:
+        return None
+
+    params = _common_params(match)
+    if params is not None:
+        # required by statisticsApi; an empty list queries plain /statistics
+        params["statistics_extensions"] = ["years"] if match["years"] else []
+    return params
+
+
+PARSERS = {
+    "get_occurrence": (parse_occurrence, occurrenceApi),
+    "statistics": (parse_statistics, statisticsApi),
+}
+
+
+def parse(request: str, entrypoint_id: str) -> dict | None:
+    """
+    Returns a generation dict shaped like the LLM's ({"params": ..., "reason": ...}), or
+    None if the request is not one of the simple patterns of this entrypoint.
+    """
+    if not enabled() or entrypoint_id not in PARSERS:
+        return None
+
+    parser, api_model = PARSERS[entrypoint_id]
+    params = parser(request)
+    if params is None:
+        return None
+
+    try:
+        # same validation (date formats, size cap) the LLM output goes through
+        params = api_model(**params).model_dump(exclude_none=True, by_alias=True)
+    except ValidationError:
+        return None
+
+    return {
+        "params": params,
+        "clarification_needed": False,
+        "reason": "The request matches a simple pattern and was parsed without the language model.",
+    }
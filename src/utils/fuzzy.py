@@ -0,0 +1,93 @@
+"""
+Batched fuzzy scoring of one query against a list of names, used by `utils.hybrid_match`.
+
+Every scorer runs over the whole list at once instead of a Python call per candidate.
+rapidfuzz scorers run in native code with `process.cdist` over the names normalised once
+per list with rapidfuzz's `default_process` (lowercase, punctuation and surrounding spaces
+removed). The default `token_overlap`, the share of the query's words found in a name, is
+counted from per-word posting arrays of the list. The matcher of a list is cached, so a
+catalogue that is matched repeatedly (areas.json, institutes.json) is only prepared once.
+
+Scorers are (scorer, weight) pairs and their 0-1 scores are blended as a weighted
+average. The best `best_n` are picked with `argpartition`, so only they are sorted.
+"""
+import functools
+from typing import Callable, Sequence
+
+import numpy as np
+from rapidfuzz import process, utils as rf_utils
+
+from utils import entity_index
+
+Scorer = tuple[Callable, float]
+
+
+def token_overlap(query: str, choice: str | None, **kwargs) -> float:
+    """
+    Share of the query's words found in `choice`, 0-100. This is the score hybrid_match
+    has always used, and the one `entity_index.TokenIndex` ranks by: words are matched
+    without case and punctuation, and a repeated query word counts each time.
+    """
+    query_tokens = entity_index.tokenize(query)
+    if not query_tokens:
+        return 0.0
+    choice_tokens = set(entity_index.tokenize(choice))
+    return 100 * sum(token in choice_tokens for token in query_tokens) / len(query_tokens)
+
+
+DEFAULT_SCORERS: tuple[Scorer, ...] = ((token_overlap, 1.0),)
+
+
+class FuzzyMatcher:
+
+    def __init__(self, names: Sequence[str], scorers: Sequence[Scorer] = DEFAULT_SCORERS):
+        self.names = list(names)
+        self.processed = [rf_utils.default_process(name or "") for name in self.names]
+        self.scorers = tuple(scorers)
+
+        self.postings: dict[str, np.ndarray] = {}
+        if any(scorer is token_overlap for scorer, _ in self.scorers):
+            postings: dict[str, list[int]] = {}
+            for i, name in enumerate(self.names):
+                for token in set(entity_index.tokenize(name)):
+                    postings.setdefault(token, []).append(i)
+            self.postings = {token: np.array(ids, dtype=np.intp) for token, ids in postings.items()}
+
+    def _overlap_scores(self, query: str) -> np.ndarray:
+        counts = np.zeros(len(self.names), dtype=np.float32)
+        query_tokens = entity_index.tokenize(query)
+        for token in query_tokens:
+            if (ids := self.postings.get(token)) is not None:
+                counts[ids] += 1
+        return counts * (100 / len(query_tokens)) if query_tokens else counts
+
+    def _scores_of(self, scorer: Callable, query: str) -> np.ndarray:
+        if scorer is token_overlap:
+            return self._overlap_scores(query)
+        processed = rf_utils.default_process(query or "")
+        return process.cdist([processed], self.processed, scorer=scorer, dtype=np.float32, workers=-1)[0]
+
+    def scores(self, query: str) -> np.ndarray:
+        """Blended 0-1 score of every name."""
+        if not self.names:
+            return np.zeros(0, dtype=np.float32)
+
+        matrix = np.vstack([self._scores_of(scorer, query) for scorer, _ in self.scorers])
+        return np.average(matrix, axis=0, weights=[weight for _, weight in self.scorers]) / 100
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the `k` highest scores, best first; equal scores keep their list order."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+    if k < len(scores):
+        best = np.argpartition(-scores, k - 1)[:k]
+    else:
+        best = np.arange(len(scores))
+    return best[np.lexsort((best, -scores[best]))]
+
+
+@functools.lru_cache(maxsize=8)
+def matcher_for(names: tuple[str, ...], scorers: tuple[Scorer, ...] = DEFAULT_SCORERS) -> FuzzyMatcher:
+    return FuzzyMatcher(names, scorers)
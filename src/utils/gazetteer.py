@@ -0,0 +1,133 @@
+"""
+Offline gazetteer of OBIS areas, consulted by `utils.getAreaId` before the `area/search`
+endpoint.
+
+The names come from the `area` listing (areas.json), plus the curated aliases in
+resources/area_aliases.json: abbreviations ("GBR"), other spellings ("Arabian Gulf"),
+EEZ names and ocean basins. An alias lists candidate area names and points at the first
+one that exists in the listing, so aliases of areas OBIS does not have are ignored.
+
+Names are normalised (case, punctuation, "&", a leading "the") and stored in a trie. A
+lookup is answered locally when the name is an exact hit, or when it is the start, on a
+word boundary, of exactly one name ("Great Barrier" -> "Great Barrier Reef"). Ambiguous
+prefixes ("Gulf of") and unknown names are misses and go to the network as before.
+
+The gazetteer is rebuilt when areas.json changes.
+
+Tunables (environment or src/env.yaml):
+    OBIS_GAZETTEER      "false" to always search areas over the network (default "true")
+"""
+import functools
+import json
+import re
+from pathlib import Path
+
+from utils import utils
+
+ALIASES = Path(__file__).parent.parent / "resources" / "area_aliases.json"
+
+# marks the end of a name in the trie
+END = "\0"
+
+
+def enabled() -> bool:
+    return str(utils.getValue("OBIS_GAZETTEER", "true")).lower() == "true"
+
+
+def normalize(name: str) -> str:
+    name = name.casefold().replace("&", " and ")
+    name = " ".join(re.findall(r"\w+", name))
+    return name[4:] if name.startswith("the ") else name
+
+
+class Trie:
+
+    def __init__(self):
+        self.root: dict = {}
+
+    def insert(self, key: str, value):
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+        node.setdefault(END, (key, []))[1].append(value)
+
+    def _node(self, key: str) -> dict | None:
+        node = self.root
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return None
+        return node
+
+    def exact(self, key: str) -> list:
+        node = self._node(key)
+        return list(node[END][1]) if node is not None and END in node else []
+
+    def completions(self, prefix: str, limit: int) -> list[tuple[str, list]]:
+        """Up to `limit` (key, values) pairs of the keys that start with `prefix`."""
+        node = self._node(prefix)
+        found = []
+        stack = [node] if node is not None else []
+        while stack and len(found) < limit:
+            node = stack.pop()
+            for char, child in node.items():
+                if char == END:
+                    found.append(child)
+                else:
+                    stack.append(child)
+        return found[:limit]
+
+
+class Gazetteer:
+
+    def __init__(self, areas: list[dict], aliases: dict[str, list[str]] | None = None):
+        self.trie = Trie()
+        by_name: dict[str, list[dict]] = {}
+
+        for area in areas:
+            if not area.get("id") or not area.get("name"):
+                continue
+            entry = {"name": area["name"], "id": area["id"]}
+            key = normalize(area["name"])
+            by_name.setdefault(key, []).append(entry)
+            self.trie.insert(key, entry)
+
+        aliased = set()
+        for alias, targets in (aliases or {}).items():
+            key = normalize(alias)
+            # an area's own name wins over an alias spelled the same
+            if key in by_name or key in aliased:
+                continue
+            for target in targets:
+                if entries := by_name.get(normalize(target)):
+                    for entry in entries:
+                        self.trie.insert(key, entry)
+                    aliased.add(key)
+                    break
+
+    def lookup(self, name: str) -> list[dict] | None:
+        """The areas `name` stands for, or None if the gazetteer cannot tell."""
+        key = normalize(name)
+        if not key:
+            return None
+
+        if exact := self.trie.exact(key):
+            return exact
+
+        # the start of exactly one name, ending on a word boundary
+        completions = self.trie.completions(key + " ", limit=2)
+        if len(completions) == 1:
+            return list(completions[0][1])
+        return None
+
+
+def load_aliases(path: Path = ALIASES) -> dict[str, list[str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return {alias: [targets] if isinstance(targets, str) else targets for alias, targets in json.load(f).items()}
+
+
+@functools.lru_cache(maxsize=2)
+def load(path: str, mtime: float) -> Gazetteer:
+    """Gazetteer of the area listing at `path`, rebuilt when its mtime changes."""
+    with open(path, "r", encoding="utf-8") as f:
+        return Gazetteer(json.load(f), load_aliases())
@@ -0,0 +1,66 @@
+"""
+Cache of LLM search parameter generations.
+
+Parameters are generated with temperature 0, so the same request to the same entrypoint
+with the same prompt and response schema gets the same answer. The key combines the
+normalised request text with the entrypoint id, model, prompt hash and schema hash, so
+editing api_examples.md or a schema simply stops matching the old entries. Entries live
+in a `resolver_cache.ResolverCache` (LRU with a TTL, optional shared sqlite tier).
+
+Tunables (environment or src/env.yaml):
+    OBIS_GENERATION_CACHE       "false" to disable the cache (default "true")
+    OBIS_GENERATION_CACHE_TTL   seconds a generation is reused (default 1 day)
+    OBIS_GENERATION_CACHE_SIZE  generations kept in memory (default 1024)
+    OBIS_GENERATION_CACHE_PATH  sqlite file for the shared tier (unset: memory only)
+"""
+import hashlib
+import json
+
+from utils import utils
+from utils import resolver_cache
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_SIZE = 1024
+
+
+def normalize_request(request: str) -> str:
+    """Ignores case, spacing and trailing punctuation: "Show  kelp records!" -> "show kelp records"."""
+    return " ".join(request.casefold().split()).rstrip(".?! ")
+
+
+def cache_key(request: str, entrypoint_id: str, model: str, prompt_hash: str, schema_hash: str) -> str:
+    parts = [normalize_request(request), entrypoint_id, model, prompt_hash, schema_hash]
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+def schema_hash(schema: dict) -> str:
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+_cache: resolver_cache.ResolverCache | None = None
+
+
+def get_cache() -> resolver_cache.ResolverCache | None:
+    """Returns the process-wide cache, or None if it is disabled."""
+    global _cache
+
+    if str(utils.getValue("OBIS_GENERATION_CACHE", "true")).lower() != "true":
+        return None
+    if _cache is None:
+        _cache = resolver_cache.ResolverCache(
+            "generations",
+            max_entries=int(utils.getValue("OBIS_GENERATION_CACHE_SIZE", DEFAULT_SIZE)),
+            ttl=float(utils.getValue("OBIS_GENERATION_CACHE_TTL", DEFAULT_TTL)),
+            path=utils.getValue("OBIS_GENERATION_CACHE_PATH"),
+        )
+    return _cache
+
+
+def stats() -> dict:
+    """Hit, miss and disk hit counters, or {} before the first generation."""
+    return dict(_cache.stats) if _cache is not None else {}
+
+
+def clear():
+    if _cache is not None:
+        _cache.clear()
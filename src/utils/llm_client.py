@@ -0,0 +1,75 @@
+"""
+Process-wide OpenAI client, wrapped by instructor, used to generate search parameters.
+
+The client is created on first use and shared by every request, so the connection pool
+and TLS sessions to the LLM endpoint are reused instead of being rebuilt per request.
+Like `obis_client`, pooled connections belong to one event loop and the client is rebuilt
+if the running loop changes.
+
+`get_client(base_url, api_key)` returns a separate shared client per endpoint, used by
+the tiers of `model_router` that point at another OpenAI-compatible server.
+
+Tunables (environment or src/env.yaml):
+    OPENAI_API_KEY, OPENAI_BASE_URL
+    OPENAI_TIMEOUT              per-request timeout in seconds (default 60)
+    OPENAI_MAX_CONNECTIONS      total pooled connections (default 20)
+    OPENAI_MAX_KEEPALIVE        idle keep-alive connections kept open (default 10)
+    OPENAI_KEEPALIVE_EXPIRY     seconds an idle connection is kept (default 60)
+"""
+import asyncio
+
+import httpx
+import instructor
+from openai import AsyncOpenAI
+
+from utils import utils
+
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE = 10
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+
+
+def create_client(base_url: str | None = None, api_key: str | None = None) -> AsyncOpenAI:
+    limits = httpx.Limits(
+        max_connections=int(utils.getValue("OPENAI_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)),
+        max_keepalive_connections=int(utils.getValue("OPENAI_MAX_KEEPALIVE", DEFAULT_MAX_KEEPALIVE)),
+        keepalive_expiry=float(utils.getValue("OPENAI_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY)),
+    )
+    timeout = float(utils.getValue("OPENAI_TIMEOUT", DEFAULT_TIMEOUT))
+
+    return AsyncOpenAI(
+        api_key=api_key or utils.getValue("OPENAI_API_KEY"),
+        base_url=base_url or utils.getValue("OPENAI_BASE_URL"),
+        timeout=timeout,
+        http_client=httpx.AsyncClient(limits=limits, timeout=timeout),
+    )
+
+
+# (base_url, api_key) -> instructor client
+_clients: dict[tuple, object] = {}
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_client(base_url: str | None = None, api_key: str | None = None):
+    """Returns the shared instructor client of the endpoint, creating it on first use."""
+    global _client_loop
+
+    loop = asyncio.get_running_loop()
+    if _client_loop is not loop:
+        _clients.clear()
+        _client_loop = loop
+
+    key = (base_url, api_key)
+    if key not in _clients:
+        _clients[key] = instructor.from_openai(create_client(base_url, api_key))
+    return _clients[key]
+
+
+async def close():
+    global _client_loop
+
+    for client in _clients.values():
+        await client.client.close()
+    _clients.clear()
+    _client_loop = None
@@ -0,0 +1,185 @@
+"""
+Accounting of search parameter generations, per entrypoint.
+
+Each call to `search_helper._generate_search_parameters` gets a `CallMetrics`. Its instructor
+hooks count the attempts (an attempt after the first is a re-ask, usually after a
+validation error), add up the prompt and completion tokens of every attempt (a streamed
+attempt reports them in its last chunk) and record which fields failed validation and how. `finish()` adds the call to the per-entrypoint
+totals returned by `stats()`.
+
+Calls answered by the rule based parser or the generation cache are counted too, with
+their source, so the share of requests that reach the LLM is visible.
+
+When `model_router` sends a call through more than one tier, attempts, tokens and time are
+also split by tier, together with how often each tier answered and why calls escalated.
+"""
+import time
+
+from instructor.core.hooks import Hooks
+from pydantic import ValidationError
+
+_totals: dict[str, dict] = {}
+
+
+def _new_totals() -> dict:
+    return {
+        "calls": 0,
+        "llm_calls": 0,
+        "rules": 0,
+        "cache": 0,
+        "failed": 0,
+        "attempts": 0,
+        "retries": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "seconds": 0.0,
+        "validation_errors": {},
+        "escalations": {},
+        "tiers": {},
+    }
+
+
+def _new_tier() -> dict:
+    return {"calls": 0, "answered": 0, "attempts": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0}
+
+
+class CallMetrics:
+
+    def __init__(self, entrypoint_id: str, model: str):
+        self.entrypoint_id = entrypoint_id
+        self.model = model
+        self.source = "llm"
+        self.attempts = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.validation_errors: list[str] = []
+        self.seconds = 0.0
+        self.tier = None
+        self.tiers: dict[str, dict] = {}
+        self.escalations: list[str] = []
+        self._started = time.monotonic()
+        self._tier_started = self._started
+
+    def hooks(self) -> Hooks:
+        hooks = Hooks()
+        hooks.on("completion:kwargs", self.on_attempt)
+        hooks.on("completion:response", self.on_response)
+        hooks.on("parse:error", self.on_parse_error)
+        return hooks
+
+    def use_tier(self, name: str, model: str):
+        """Attributes the attempts from now on to the tier `name` of model_router."""
+        self._stop_tier()
+        self.tier = name
+        self.model = model
+        self.tiers.setdefault(name, {"model": model, **_new_tier()})["calls"] += 1
+
+    def escalate(self, reason: str):
+        self.escalations.append(reason)
+
+    def _stop_tier(self):
+        now = time.monotonic()
+        if self.tier is not None:
+            self.tiers[self.tier]["seconds"] += now - self._tier_started
+        self._tier_started = now
+
+    def _count(self, name: str, amount: int):
+        setattr(self, name, getattr(self, name) + amount)
+        if self.tier is not None:
+            self.tiers[self.tier][name] += amount
+
+    def on_attempt(self, *args, **kwargs):
+        self._count("attempts", 1)
+
+    def on_response(self, response):
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self._add_usage(usage)
+        elif hasattr(response, "_iterator"):
+            # a stream: its usage comes in the last chunk (stream_options include_usage)
+            response._iterator = self._usage_of_chunks(response._iterator)
+
+    async def _usage_of_chunks(self, chunks):
+        async for chunk in chunks:
+            if (usage := getattr(chunk, "usage", None)) is not None:
+                self._add_usage(usage)
+            yield chunk
+
+    def _add_usage(self, usage):
+        self._count("prompt_tokens", usage.prompt_tokens or 0)
+        self._count("completion_tokens", usage.completion_tokens or 0)
+
+    def on_parse_error(self, error: Exception):
+        if isinstance(error, ValidationError):
+            for detail in error.errors():
+                field = ".".join(str(part) for part in detail["loc"])
+                self.validation_errors.append(f"{field}:{detail['type']}")
+        else:
+            self.validation_errors.append(type(error).__name__)
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.attempts - 1)
+
+    def finish(self, source: str = "llm") -> dict:
+        """Stops the clock, adds the call to the entrypoint's totals and returns its metrics."""
+        self.source = source
+        self.seconds = time.monotonic() - self._started
+        self._stop_tier()
+        if source == "llm" and self.tier is not None:
+            self.tiers[self.tier]["answered"] += 1
+
+        totals = _totals.setdefault(self.entrypoint_id, _new_totals())
+        totals["calls"] += 1
+        totals["llm_calls" if source == "llm" else source] += 1
+        totals["attempts"] += self.attempts
+        totals["retries"] += self.retries
+        totals["prompt_tokens"] += self.prompt_tokens
+        totals["completion_tokens"] += self.completion_tokens
+        totals["seconds"] += self.seconds
+        for error in self.validation_errors:
+            totals["validation_errors"][error] = totals["validation_errors"].get(error, 0) + 1
+        for reason in self.escalations:
+            totals["escalations"][reason] = totals["escalations"].get(reason, 0) + 1
+        for name, tier in self.tiers.items():
+            tier_totals = totals["tiers"].setdefault(name, _new_tier())
+            for field in tier_totals:
+                tier_totals[field] += tier[field]
+
+        return self.as_dict()
+
+    def as_dict(self) -> dict:
+        return {
+            "entrypoint": self.entrypoint_id,
+            "source": self.source,
+            "model": self.model,
+            "seconds": round(self.seconds, 3),
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "validation_errors": list(self.validation_errors),
+            "tier": self.tier,
+            "escalations": list(self.escalations),
+            "tiers": {name: {**tier, "seconds": round(tier["seconds"], 3)} for name, tier in self.tiers.items()},
+        }
+
+
+def stats() -> dict:
+    """
+    Totals per entrypoint id, with the validation errors counted by field and error type and
+    the escalations by reason. "tiers" has the same counters per model_router tier.
+    """
+    return {
+        entrypoint: {
+            **totals,
+            "validation_errors": dict(totals["validation_errors"]),
+            "escalations": dict(totals["escalations"]),
+            "tiers": {name: dict(tier) for name, tier in totals["tiers"].items()},
+        }
+        for entrypoint, totals in _totals.items()
+    }
+
+
+def clear():
+    _totals.clear()
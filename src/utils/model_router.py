@@ -0,0 +1,76 @@
+"""
+Which models generate the search parameters of an entrypoint, and when to escalate.
+
+Every entrypoint is answered by the default tier (OBIS_LLM_MODEL), in one attempt, as
+before the tiers existed. When OBIS_LLM_FAST_MODEL
+is set, the simple entrypoints in OBIS_LLM_FAST_ENTRYPOINTS first try that cheaper, faster
+model, which may be served by another OpenAI-compatible endpoint such as a local server.
+The fast tier gets one attempt. Its answer is kept unless the call fails (including a
+validation error), it has no params, or it asks for clarification, which the fast
+model does far more often than the default one. In those cases the default tier answers.
+
+Tunables (environment or src/env.yaml):
+    OBIS_LLM_MODEL                  model of the default tier (default "gpt-4o-mini")
+    OBIS_LLM_FAST_MODEL             model of the fast tier (unset: no fast tier)
+    OBIS_LLM_FAST_BASE_URL          OpenAI-compatible endpoint of the fast tier (default OPENAI_BASE_URL)
+    OBIS_LLM_FAST_API_KEY           key of that endpoint (default OPENAI_API_KEY)
+    OBIS_LLM_FAST_ATTEMPTS          attempts, including re-asks, before escalating (default 1)
+    OBIS_LLM_FAST_ENTRYPOINTS       comma separated entrypoint ids that try the fast tier
+                                    (default "dataset_search,institute_lookup,taxon")
+"""
+from typing import NamedTuple
+
+from utils import utils
+
+DEFAULT_MODEL = "gpt-4o-mini"
+# what instructor.patch gave the baseline call: no re-asks
+DEFAULT_ATTEMPTS = 1
+DEFAULT_FAST_ATTEMPTS = 1
+DEFAULT_FAST_ENTRYPOINTS = "dataset_search,institute_lookup,taxon"
+
+
+class Tier(NamedTuple):
+    name: str
+    model: str
+    base_url: str | None = None
+    api_key: str | None = None
+    max_retries: int = DEFAULT_ATTEMPTS
+
+
+def default_tier() -> Tier:
+    return Tier("default", utils.getValue("OBIS_LLM_MODEL", DEFAULT_MODEL))
+
+
+def fast_tier() -> Tier | None:
+    model = utils.getValue("OBIS_LLM_FAST_MODEL")
+    if not model:
+        return None
+    return Tier(
+        "fast",
+        model,
+        base_url=utils.getValue("OBIS_LLM_FAST_BASE_URL"),
+        api_key=utils.getValue("OBIS_LLM_FAST_API_KEY"),
+        max_retries=int(utils.getValue("OBIS_LLM_FAST_ATTEMPTS", DEFAULT_FAST_ATTEMPTS)),
+    )
+
+
+def fast_entrypoints() -> set[str]:
+    value = utils.getValue("OBIS_LLM_FAST_ENTRYPOINTS", DEFAULT_FAST_ENTRYPOINTS)
+    return {entrypoint.strip() for entrypoint in str(value).split(",") if entrypoint.strip()}
+
+
+def route(entrypoint_id: str) -> list[Tier]:
+    """The tiers to try for `entrypoint_id`, cheapest first. The last one always answers."""
+    fast = fast_tier()
+    if fast is not None and entrypoint_id in fast_entrypoints():
+        return [fast, default_tier()]
+    return [default_tier()]
+
+
+def escalation_reason(generation: dict) -> str | None:
+    """Why the answer of a tier that is not the last one should not be trusted, or None to keep it."""
+    if generation.get("clarification_needed"):
+        return "clarification"
+    if not generation.get("params"):
+        return "no_params"
+    return None
@@ -0,0 +1,283 @@
+"""
+Process-wide async HTTP client for api.obis.org.
+
+Entrypoints and resolvers call `get(url)` instead of `requests.get(url)` so that a slow
+OBIS response only suspends the coroutine waiting on it rather than the whole event loop
+of the agent server. All calls share one pooled, keep-alive `httpx.AsyncClient`.
+
+Concurrent requests for the same url (after canonicalisation) are coalesced: the first
+caller performs the upstream request and every other caller awaits that same response.
+`stats()` reports how many requests were served this way.
+
+GET responses of metadata endpoints are kept in the disk-backed `response_cache`; a fresh
+entry is returned without touching the network and a stale one is revalidated. The cache
+is read and written in a worker thread so sqlite never blocks the event loop. A cache that
+fails (a locked or broken database) is logged and bypassed: the request goes to OBIS.
+
+Requests that do go upstream are admitted by a per-host `rate_limiter.HostLimiter`, which
+caps the request rate and adapts the number of in-flight requests to OBIS' latency and
+429/5xx answers (see that module for its own tunables). Transient failures are retried
+and a per-endpoint circuit breaker stops calling an endpoint that keeps failing, serving
+the stale cached response where there is one (see `resilience`).
+
+Tunables (environment or src/env.yaml):
+    OBIS_TIMEOUT                    per-request timeout in seconds (default 10)
+    OBIS_MAX_CONNECTIONS            total pooled connections (default 100)
+    OBIS_MAX_KEEPALIVE              idle keep-alive connections kept open (default 20)
+    OBIS_KEEPALIVE_EXPIRY           seconds an idle connection is kept (default 30)
+    OBIS_MAX_CONNECTIONS_PER_HOST   upper bound of in-flight requests per upstream host (default 20)
+    OBIS_HTTP2                      "true" to negotiate HTTP/2 (needs the `h2` package)
+"""
+import asyncio
+import importlib.util
+import sqlite3
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import httpx
+
+from utils import utils
+from utils import response_cache
+from utils import rate_limiter
+from utils import resilience
+
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE = 20
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 20
+
+
+def canonical_url(url: str) -> str:
+    """Normalises scheme/host case and query parameter order so equivalent urls compare equal."""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ""))
+
+
+def _http2_enabled() -> bool:
+    requested = str(utils.getValue("OBIS_HTTP2", "false")).lower() == "true"
+    return requested and importlib.util.find_spec("h2") is not None
+
+
+class OBISClient:
+
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None, cache: response_cache.ResponseCache | None = None):
+        self.timeout = float(utils.getValue("OBIS_TIMEOUT", DEFAULT_TIMEOUT))
+        self.max_per_host = int(utils.getValue("OBIS_MAX_CONNECTIONS_PER_HOST", DEFAULT_MAX_CONNECTIONS_PER_HOST))
+
+        limits = httpx.Limits(
+            max_connections=int(utils.getValue("OBIS_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)),
+            max_keepalive_connections=int(utils.getValue("OBIS_MAX_KEEPALIVE", DEFAULT_MAX_KEEPALIVE)),
+            keepalive_expiry=float(utils.getValue("OBIS_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY)),
+        )
+
+        self._client = httpx.AsyncClient(
+            limits=limits,
+            http2=_http2_enabled(),
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={"Accept": "application/json"},
+            transport=transport,
+        )
+        self._limiters: dict[str, rate_limiter.HostLimiter] = {}
+        self._breakers: dict[str, resilience.CircuitBreaker] = {}
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self.cache = cache
+        self.stats = {
+            "requests": 0, "upstream": 0, "coalesced": 0, "cache_hits": 0, "cache_revalidated": 0,
+            "retries": 0, "breaker_rejected": 0, "stale_served": 0,
+        }
+
+    def _limiter(self, url: str) -> rate_limiter.HostLimiter:
+        host = urlsplit(url).netloc
+        if host not in self._limiters:
+            self._limiters[host] = rate_limiter.HostLimiter(
+                self.max_per_host,
+                rate=float(utils.getValue("OBIS_RATE_LIMIT", rate_limiter.DEFAULT_RATE)),
+                burst=int(utils.getValue("OBIS_RATE_BURST", rate_limiter.DEFAULT_BURST)),
+                latency_target=float(utils.getValue("OBIS_LATENCY_TARGET", rate_limiter.DEFAULT_LATENCY_TARGET)),
+                queue_timeout=float(utils.getValue("OBIS_QUEUE_TIMEOUT", rate_limiter.DEFAULT_QUEUE_TIMEOUT)),
+            )
+        return self._limiters[host]
+
+    def _breaker(self, endpoint: str) -> resilience.CircuitBreaker:
+        if endpoint not in self._breakers:
+            self._breakers[endpoint] = resilience.breaker_for(endpoint)
+        return self._breakers[endpoint]
+
+    async def get(self, url: str, timeout: float | None = None) -> httpx.Response:
+        """
+        GETs `url`, sharing the upstream call with any identical request already in flight.
+        A coalesced caller gets the leader's response (or exception) and its timeout.
+        """
+        key = canonical_url(url)
+        self.stats["requests"] += 1
+
+        ttl = response_cache.ttl_for(url) if self.cache is not None else 0
+        if ttl > 0:
+            entry = await self._cache_call(self.cache.lookup, key)
+            if entry is not None and self.cache.is_fresh(entry, ttl):
+                self.stats["cache_hits"] += 1
+                return response_cache.to_response(entry, url)
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(url, key, ttl, timeout))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.stats["coalesced"] += 1
+
+        # shielded so a cancelled caller does not cancel the request other callers wait on
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch(self, url: str, key: str, ttl: float, timeout: float | None) -> httpx.Response:
+        # a stale cache entry is revalidated instead of downloaded again
+        entry = await self._cache_call(self.cache.lookup, key) if ttl > 0 else None
+        headers = {}
+        if entry is not None and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry is not None and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        endpoint = response_cache.endpoint_of(url)
+        breaker = self._breaker(endpoint)
+        if not breaker.allow():
+            self.stats["breaker_rejected"] += 1
+            if entry is not None:
+                return self._serve_stale(entry, url)
+            raise resilience.CircuitOpen(f"OBIS {endpoint} endpoint is failing, not calling it for now")
+
+        try:
+            response = await self._send_with_retries(url, headers, timeout, resilience.policy_for(endpoint))
+        except rate_limiter.QueueTimeout:
+            # our own backlog, says nothing about whether OBIS is up
+            breaker.release()
+            raise
+        except httpx.HTTPError:
+            breaker.record(False)
+            if entry is not None:
+                return self._serve_stale(entry, url)
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+
+        breaker.record(not rate_limiter.is_congested(response.status_code))
+        if entry is not None and rate_limiter.is_congested(response.status_code):
+            return self._serve_stale(entry, url)
+
+        if entry is not None and response.status_code == 304:
+            await self._cache_call(self.cache.refresh, key)
+            self.stats["cache_revalidated"] += 1
+            return response_cache.to_response(entry, url)
+
+        if ttl > 0 and response.status_code == 200:
+            await self._cache_call(self.cache.store, key, response)
+
+        return response
+
+    async def _cache_call(self, method, *args):
+        """Runs a response_cache method in a worker thread; a sqlite error is logged and gives None."""
+        try:
+            return await asyncio.to_thread(method, *args)
+        except sqlite3.Error as e:
+            print(f"Response cache unavailable, bypassing it: {e}")
+            return None
+
+    async def _send_with_retries(self, url: str, headers: dict, timeout: float | None, policy: resilience.RetryPolicy) -> httpx.Response:
+        for attempt in range(policy.retries + 1):
+            last_attempt = attempt == policy.retries
+            try:
+                response = await self._send(url, headers, timeout)
+            except rate_limiter.QueueTimeout:
+                raise
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+                delay = policy.delay(attempt)
+            else:
+                if last_attempt or not resilience.is_retryable(response.status_code):
+                    return response
+                delay = policy.delay(attempt, response.headers.get("Retry-After"))
+
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+
+    async def _send(self, url: str, headers: dict, timeout: float | None) -> httpx.Response:
+        limiter = self._limiter(url)
+        await limiter.acquire()
+
+        self.stats["upstream"] += 1
+        started = time.monotonic()
+        response = None
+        try:
+            response = await self._client.get(url, headers=headers, timeout=self.timeout if timeout is None else timeout)
+        finally:
+            await limiter.release(time.monotonic() - started, response.status_code if response is not None else None)
+        return response
+
+    def _serve_stale(self, entry: dict, url: str) -> httpx.Response:
+        self.stats["stale_served"] += 1
+        return response_cache.to_response(entry, url)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_client: OBISClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_client() -> OBISClient:
+    """
+    Returns the shared client, creating it on first use.
+
+    Pooled connections belong to the event loop that opened them, so a new client is built
+    if the running loop changes (e.g. between test cases). The server runs a single loop.
+    """
+    global _client, _client_loop
+
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = OBISClient(cache=response_cache.get_cache())
+        _client_loop = loop
+    return _client
+
+
+async def get(url: str, timeout: float | None = None) -> httpx.Response:
+    return await get_client().get(url, timeout)
+
+
+def stats() -> dict:
+    """
+    Request counters of the shared client: total requests, upstream calls, coalesced and
+    cached answers, plus the response cache's own counters prefixed with `cache_` and the
+    current concurrency limit and queue counters of each host prefixed with its name.
+    """
+    if _client is None:
+        return {}
+    counters = dict(_client.stats)
+    if _client.cache is not None:
+        counters.update({f"cache_{name}": value for name, value in _client.cache.stats.items()})
+    for host, limiter in _client._limiters.items():
+        counters[f"{host}_limit"] = int(limiter.limit)
+        counters.update({f"{host}_{name}": value for name, value in limiter.stats.items()})
+    return counters
+
+
+async def close():
+    global _client, _client_loop
+
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
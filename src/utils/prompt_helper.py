@@ -1,14 +1,26 @@
-import importlib
+import hashlib
+import math
 import os
-import yaml
-from urllib.parse import urlencode
-import requests
-from utils import utils
-import json
+import re
 from pathlib import Path
 
-def build_system_prompt(api):
-    SYSTEM_PROMPT_TEMPLATE = """
+from utils import utils
+
+RESOURCES = Path(__file__).parent.parent / "resources"
+
+# how many examples go into a prompt, and how many tokens they may take, when the examples
+# are picked for the request. OBIS_PROMPT_EXAMPLE_TOKENS_<ENTRYPOINT> overrides the budget
+# of one entrypoint.
+DEFAULT_EXAMPLES = 4
+DEFAULT_EXAMPLE_TOKENS = 1500
+
+STOPWORDS = {
+    "a", "an", "the", "of", "for", "from", "in", "on", "to", "and", "or", "with", "me", "all",
+    "get", "show", "search", "find", "give", "records", "record", "request", "response", "params",
+    "is", "are", "be", "by", "at", "as", "it", "this", "that", "when", "has", "have", "example",
+}
+
+SYSTEM_PROMPT_TEMPLATE = """
         {system_prompt}
 
         # Examples
@@ -16,33 +28,168 @@ def build_system_prompt(api):
         {examples_doc}
     """
 
-    # system_prompt = importlib.resources.files().joinpath("../resources/system_prompt.md").read_text()
-    system_prompt = (Path(__file__).parent.parent / "resources" / "system_prompt.md").read_text()
-    examples_doc = get_api_examples("src/resources/api_examples.md", api)
 
-    prompt = SYSTEM_PROMPT_TEMPLATE.format(
-        api=api,
-        system_prompt=system_prompt,
-        examples_doc=examples_doc,
-    ).strip()
+def parse_api_examples(content: str) -> dict[str, str]:
+    """Splits api_examples.md into {api name: examples} on its `### <api>` headers."""
+    sections = {}
+    name = None
+    lines = []
+    for line in content.splitlines(keepends=True):
+        if line.startswith("### "):
+            if name is not None:
+                sections[name] = "".join(lines).strip()
+            name = line[4:].strip()
+            lines = []
+        elif name is not None:
+            lines.append(line)
+    if name is not None:
+        sections[name] = "".join(lines).strip()
+    return sections
 
-    # print(prompt)
 
-    return prompt
+def split_examples(section: str) -> list[str]:
+    """Splits an api section into its `## Example` blocks."""
+    return [block.strip() for block in re.split(r"^(?=## )", section, flags=re.M) if block.strip()]
 
-def get_api_examples(file_path: str, api_name: str) -> str:
-    with open(file_path, "r") as f:
-        content = f.read()
 
-    # Find the section header for the API
-    marker = f"### {api_name}"
-    parts = content.split(marker)
+def estimate_tokens(text: str) -> int:
+    # roughly four characters per token for English and JSON
+    return len(text) // 4 + 1
+
+
+def terms(text: str) -> set[str]:
+    return {word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS}
+
+
+class ExampleIndex:
+    """Lexical index of one entrypoint's examples, scored by the idf of the terms shared with a request."""
+
+    def __init__(self, examples: list[str]):
+        self.examples = examples
+        self.terms = [terms(example) for example in examples]
+        self.tokens = [estimate_tokens(example) for example in examples]
+
+        frequency = {}
+        for example_terms in self.terms:
+            for term in example_terms:
+                frequency[term] = frequency.get(term, 0) + 1
+        self.idf = {term: math.log(1 + len(examples) / count) for term, count in frequency.items()}
+
+    def select(self, request: str, k: int, budget: int) -> str:
+        """The `k` most similar examples that fit in `budget` tokens, in their original order."""
+        request_terms = terms(request)
+        scores = [sum(self.idf[term] for term in request_terms & example_terms) for example_terms in self.terms]
+        ranked = sorted(range(len(self.examples)), key=lambda i: -scores[i])
+
+        chosen = []
+        used = 0
+        for i in ranked:
+            if len(chosen) == k:
+                break
+            if chosen and used + self.tokens[i] > budget:
+                continue
+            chosen.append(i)
+            used += self.tokens[i]
+
+        return "\n\n".join(self.examples[i] for i in sorted(chosen))
+
+
+class PromptRegistry:
+    """
+    Finished system prompts by entrypoint id, built once from system_prompt.md and
+    api_examples.md instead of reading and splitting both files on every request. The
+    prompts are rebuilt when either file changes on disk.
+
+    Given the request, `get` includes only the examples most similar to it (see
+    `ExampleIndex`) rather than the entrypoint's whole section.
+    """
 
-    if len(parts) < 2:
-        return f"No examples found for {api_name}"
+    def __init__(self, system_prompt_path: Path, examples_path: Path):
+        self.paths = (Path(system_prompt_path), Path(examples_path))
+        self._versions = None
+        self._system_prompt = ""
+        self._examples = {}
+        # entrypoint id -> whether it must have an examples section
+        self._registered: dict[str, bool] = {}
+        self._prompts: dict[str, tuple[str, str]] = {}
+        self._indexes: dict[str, ExampleIndex] = {}
 
-    # Take content after the marker until next section
-    section = parts[1]
-    section = section.split("### ", 1)[0].strip()
+    def _load(self):
+        versions = tuple(os.stat(path).st_mtime_ns for path in self.paths)
+        if versions == self._versions:
+            return
+
+        system_prompt = self.paths[0].read_text()
+        examples = parse_api_examples(self.paths[1].read_text())
+        prompts = {api: self._build(api, system_prompt, examples, required) for api, required in self._registered.items()}
+
+        self._system_prompt, self._examples, self._prompts = system_prompt, examples, prompts
+        self._indexes = {api: ExampleIndex(split_examples(section)) for api, section in examples.items()}
+        self._versions = versions
+
+    def _build(self, api: str, system_prompt: str, examples: dict, required: bool) -> tuple[str, str]:
+        if api in examples:
+            examples_doc = examples[api]
+        elif required:
+            raise ValueError(f"{self.paths[1].name} has no '### {api}' section")
+        else:
+            examples_doc = f"No examples found for {api}"
+
+        return self._finish(system_prompt, examples_doc)
+
+    def _finish(self, system_prompt: str, examples_doc: str) -> tuple[str, str]:
+        prompt = SYSTEM_PROMPT_TEMPLATE.format(
+            system_prompt=system_prompt,
+            examples_doc=examples_doc,
+        ).strip()
+        return prompt, hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def register(self, api: str, examples: bool = True) -> str:
+        """Builds the prompt of `api` now, so a missing examples section fails at startup."""
+        self._load()
+        if api not in self._prompts:
+            self._prompts[api] = self._build(api, self._system_prompt, self._examples, examples)
+            self._registered[api] = examples
+        return self._prompts[api][0]
+
+    def get(self, api: str, request: str | None = None) -> tuple[str, str]:
+        """
+        Returns (prompt, sha256 of the prompt) of a registered entrypoint, with all of its
+        examples, or with those most similar to `request` if it is given.
+        """
+        try:
+            self._load()
+        except (OSError, ValueError) as e:
+            # keep serving the prompts we have while the files are being edited
+            print(f"Could not reload prompts, using the previous ones: {e}")
+
+        if api not in self._prompts:
+            self.register(api)
+        if request is None or api not in self._indexes:
+            return self._prompts[api]
+
+        k = int(utils.getValue("OBIS_PROMPT_EXAMPLES", DEFAULT_EXAMPLES))
+        budget = int(utils.getValue(f"OBIS_PROMPT_EXAMPLE_TOKENS_{api.upper()}", utils.getValue("OBIS_PROMPT_EXAMPLE_TOKENS", DEFAULT_EXAMPLE_TOKENS)))
+        return self._finish(self._system_prompt, self._indexes[api].select(request, k, budget))
+
+
+prompts = PromptRegistry(RESOURCES / "system_prompt.md", RESOURCES / "api_examples.md")
+
+
+def register_prompt(api: str, examples: bool = True) -> str:
+    return prompts.register(api, examples)
+
+
+def build_system_prompt(api: str, request: str | None = None) -> str:
+    return prompts.get(api, request)[0]
+
+
+def prompt_hash(api: str, request: str | None = None) -> str:
+    return prompts.get(api, request)[1]
+
+
+def get_api_examples(file_path: str, api_name: str) -> str:
+    with open(file_path, "r") as f:
+        sections = parse_api_examples(f.read())
 
-    return f"{section}"
\ No newline at end of file
+    return sections.get(api_name, f"No examples found for {api_name}")
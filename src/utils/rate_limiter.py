@@ -0,0 +1,116 @@
+"""
+Per-host admission control for the OBIS client.
+
+Each upstream host gets a `HostLimiter` combining two limits:
+
+* a token bucket that caps the request rate (`rate` per second, bursts of up to `burst`),
+* an AIMD concurrency limit: it grows by one slot every `limit` well-behaved responses
+  and halves when OBIS answers 429/5xx, fails, or is slower than the latency target.
+
+Requests over either limit wait in line rather than fail, but only for `queue_timeout`
+seconds; after that `QueueTimeout` is raised. It is an `httpx.TimeoutException`, so the
+`httpx.HTTPError` handlers around every `obis_client.get` call report it like any other
+failed request, and it does not count against the endpoint's circuit breaker.
+
+Tunables (environment or src/env.yaml):
+    OBIS_RATE_LIMIT         requests per second allowed per host (default 20)
+    OBIS_RATE_BURST         requests allowed in a burst above that rate (default 40)
+    OBIS_LATENCY_TARGET     seconds above which a response counts as congestion (default 2)
+    OBIS_QUEUE_TIMEOUT      seconds a request may wait for admission (default 30)
+"""
+import asyncio
+import time
+
+import httpx
+
+DEFAULT_RATE = 20.0
+DEFAULT_BURST = 40
+DEFAULT_LATENCY_TARGET = 2.0
+DEFAULT_QUEUE_TIMEOUT = 30.0
+
+
+class QueueTimeout(httpx.TimeoutException):
+    """Raised when a request waited longer than the queue timeout to be sent."""
+
+
+def is_congested(status: int | None) -> bool:
+    """429 and 5xx mean OBIS is struggling; None means no response arrived at all."""
+    return status is None or status == 429 or status >= 500
+
+
+class HostLimiter:
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        latency_target: float = DEFAULT_LATENCY_TARGET,
+        queue_timeout: float = DEFAULT_QUEUE_TIMEOUT,
+    ):
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.latency_target = latency_target
+        self.queue_timeout = queue_timeout
+
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.stats = {"queued": 0, "queue_timeouts": 0, "decreases": 0}
+
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._last_decrease = 0.0
+        self._slot_freed = asyncio.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    async def _take_token(self):
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def acquire(self):
+        """Waits for a concurrency slot and a rate token, or raises QueueTimeout."""
+        if self.in_flight >= int(self.limit) or self._tokens < 1:
+            self.stats["queued"] += 1
+
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                async with self._slot_freed:
+                    await self._slot_freed.wait_for(lambda: self.in_flight < int(self.limit))
+                    self.in_flight += 1
+                try:
+                    await self._take_token()
+                except BaseException:
+                    await self._release_slot()
+                    raise
+        except TimeoutError:
+            self.stats["queue_timeouts"] += 1
+            raise QueueTimeout(f"waited more than {self.queue_timeout}s for a free slot")
+
+    async def release(self, latency: float, status: int | None):
+        """Returns the slot and adapts the concurrency limit to how the request went."""
+        if is_congested(status) or latency > self.latency_target:
+            # one halving per round trip, so a burst of failures of requests sent together
+            # does not collapse the limit to 1
+            now = time.monotonic()
+            if now - self._last_decrease > latency:
+                self.limit = max(1.0, self.limit / 2)
+                self._last_decrease = now
+                self.stats["decreases"] += 1
+        else:
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+
+        await self._release_slot()
+
+    async def _release_slot(self):
+        async with self._slot_freed:
+            self.in_flight -= 1
+            self._slot_freed.notify_all()
@@ -0,0 +1,156 @@
+"""
+Deterministic repair of LLM parameter values that would fail validation.
+
+A validation error makes instructor send the whole conversation again, which costs a
+second round trip. Some of the values the model gets wrong have only one sensible reading
+and are fixed here before the api model validates them:
+
+    startdate "2010" / 2010         -> "2010-01-01" (enddate -> "2010-12-31")
+    startdate "2010-05"             -> "2010-05-01" (enddate -> "2010-05-31")
+    "2010-05-01T00:00:00Z"          -> "2010-05-01"
+    size 50000, "max", "all"        -> 10000, the largest page the OBIS API returns
+    facets "Kingdom, phylum"        -> ["kingdom", "phylum"]
+    startdepth 200, enddepth 50     -> startdepth 50, enddepth 200 (negative depths lose their sign)
+
+Anything else is left alone and still goes through validation, and a re-ask if it fails.
+"""
+import calendar
+import re
+from datetime import datetime
+from typing import Type
+
+from pydantic import BaseModel
+
+from schema import FacetField
+
+MAX_SIZE = 10000
+
+YEAR = re.compile(r"^(\d{4})$")
+MONTH = re.compile(r"^(\d{4})[-/](\d{1,2})$")
+
+
+def squash(name: str) -> str:
+    return re.sub(r"[\W_]", "", name).lower()
+
+
+# facet names without case -> FacetField value, and without case and separators for the
+# names that stay unambiguous ("datasetID" and "dataset_id" both squash to "datasetid")
+FACETS = {facet.value.lower(): facet.value for facet in FacetField}
+SQUASHED_FACETS = {
+    squash(facet.value): facet.value
+    for facet in FacetField
+    if sum(squash(other.value) == squash(facet.value) for other in FacetField) == 1
+}
+
+# field -> number of values repaired, for stats()
+_counts: dict[str, int] = {}
+
+
+def repair_date(value, end: bool = False):
+    """Returns `value` as YYYY-MM-DD if it is a year, a year and month or an ISO datetime."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str):
+        return value
+
+    text = value.strip()
+    if match := YEAR.match(text):
+        return f"{match[1]}-12-31" if end else f"{match[1]}-01-01"
+
+    if match := MONTH.match(text):
+        year, month = int(match[1]), int(match[2])
+        if 1 <= month <= 12:
+            day = calendar.monthrange(year, month)[1] if end else 1
+            return f"{year:04d}-{month:02d}-{day:02d}"
+        return value
+
+    if "T" in text or " " in text or text.endswith("Z"):
+        try:
+            # "2010-05-01T10:00:00Z", "2010-05-01 10:00", "2010-05-01T10:00:00+02:00"
+            return datetime.fromisoformat(text).strftime("%Y-%m-%d")
+        except ValueError:
+            return value
+
+    return value
+
+
+def repair_size(value):
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in ("max", "maximum", "all"):
+            return MAX_SIZE
+        if not text.isdigit():
+            return value
+        value = int(text)
+    if isinstance(value, int) and not isinstance(value, bool) and value > MAX_SIZE:
+        return MAX_SIZE
+    return value
+
+
+def repair_facets(value):
+    if isinstance(value, str):
+        value = re.split(r"[,;]", value)
+    if not isinstance(value, list):
+        return value
+
+    facets = []
+    for facet in value:
+        if isinstance(facet, str):
+            facet = facet.strip()
+            # unknown names are kept, so validation still reports them
+            facet = FACETS.get(facet.lower()) or SQUASHED_FACETS.get(squash(facet), facet)
+            if not facet:
+                continue
+        facets.append(facet)
+    return facets
+
+
+def repair_depths(start, end):
+    if isinstance(start, int) and start < 0:
+        start = -start
+    if isinstance(end, int) and end < 0:
+        end = -end
+    if isinstance(start, int) and isinstance(end, int) and end < start:
+        start, end = end, start
+    return start, end
+
+
+def repair_params(api_model: Type[BaseModel], params: dict) -> tuple[dict, list[str]]:
+    """
+    Returns a repaired copy of `params` and the names of the fields that were changed. Only
+    fields of `api_model` are touched.
+    """
+    fields = api_model.model_fields
+    repaired = dict(params)
+
+    for name in ("startdate", "enddate"):
+        if name in fields and name in repaired:
+            repaired[name] = repair_date(repaired[name], end=name == "enddate")
+
+    if "size" in fields and "size" in repaired:
+        repaired["size"] = repair_size(repaired["size"])
+
+    if "facets" in fields and "facets" in repaired:
+        repaired["facets"] = repair_facets(repaired["facets"])
+
+    if "startdepth" in fields and "enddepth" in fields:
+        start, end = repair_depths(repaired.get("startdepth"), repaired.get("enddepth"))
+        if start is not None:
+            repaired["startdepth"] = start
+        if end is not None:
+            repaired["enddepth"] = end
+
+    changed = [name for name in repaired if repaired[name] != params.get(name)]
+    for name in changed:
+        _counts[name] = _counts.get(name, 0) + 1
+
+    return repaired, changed
+
+
+def stats() -> dict:
+    """Repaired values by field."""
+    return dict(_counts)
+
+
+def clear():
+    _counts.clear()
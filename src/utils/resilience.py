@@ -0,0 +1,118 @@
+"""
+Retry and circuit breaker policy of the OBIS client.
+
+GETs to OBIS are idempotent, so a transport error or a 429/502/503/504 answer is retried
+with capped exponential backoff and full jitter (a Retry-After header is honoured, within
+the cap). Each endpoint (first path segment, see `response_cache.endpoint_of`) has its own
+`CircuitBreaker`: after `threshold` consecutive failed calls it opens and the client fails
+fast, or serves a stale cached response, until `cooldown` seconds have passed and a single
+probe request gets through. A probe that ends without an answer from OBIS (its admission
+timed out, or it failed outside httpx) is released, so it cannot keep the breaker half open.
+
+Tunables (environment or src/env.yaml), each can be set per endpoint by appending the
+endpoint name, e.g. OBIS_RETRIES_OCCURRENCE:
+    OBIS_RETRIES                retries after the first attempt (default 2)
+    OBIS_RETRY_BACKOFF          base delay in seconds, doubled per retry (default 0.2)
+    OBIS_RETRY_BACKOFF_MAX      cap of a single delay in seconds (default 5)
+    OBIS_BREAKER_THRESHOLD      consecutive failures that open the breaker (default 5)
+    OBIS_BREAKER_COOLDOWN       seconds the breaker stays open (default 30)
+"""
+import functools
+import random
+import time
+
+import httpx
+
+from utils import utils
+
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.2
+DEFAULT_BACKOFF_MAX = 5.0
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_COOLDOWN = 30.0
+
+RETRYABLE_STATUSES = (429, 502, 503, 504)
+
+
+class CircuitOpen(httpx.TransportError):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+
+def is_retryable(status: int) -> bool:
+    return status in RETRYABLE_STATUSES
+
+
+def _setting(name: str, endpoint: str, default):
+    return utils.getValue(f"{name}_{endpoint.upper()}", utils.getValue(name, default))
+
+
+class RetryPolicy:
+
+    def __init__(self, retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF, backoff_max: float = DEFAULT_BACKOFF_MAX):
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+
+    def delay(self, attempt: int, retry_after: str | None = None) -> float:
+        """Seconds to wait before retry number `attempt` (0-based)."""
+        if retry_after is not None and retry_after.isdigit():
+            return min(self.backoff_max, float(retry_after))
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+
+@functools.cache
+def policy_for(endpoint: str) -> RetryPolicy:
+    return RetryPolicy(
+        retries=int(_setting("OBIS_RETRIES", endpoint, DEFAULT_RETRIES)),
+        backoff=float(_setting("OBIS_RETRY_BACKOFF", endpoint, DEFAULT_BACKOFF)),
+        backoff_max=float(_setting("OBIS_RETRY_BACKOFF_MAX", endpoint, DEFAULT_BACKOFF_MAX)),
+    )
+
+
+class CircuitBreaker:
+
+    def __init__(self, threshold: int = DEFAULT_BREAKER_THRESHOLD, cooldown: float = DEFAULT_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now. Once the cooldown is over one probe is let through."""
+        if self.state == "closed":
+            return True
+        if time.monotonic() - self._opened_at < self.cooldown:
+            return False
+        if self.state == "open":
+            self.state = "half_open"
+            self._opened_at = time.monotonic()
+            return True
+        # a probe that never reported back opens the breaker again for another cooldown
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        return False
+
+    def release(self):
+        """Ends a probe that got no answer from OBIS, so the next call may probe again."""
+        if self.state == "half_open":
+            self.state = "open"
+            self._opened_at = time.monotonic() - self.cooldown
+
+    def record(self, success: bool):
+        if success:
+            self.state = "closed"
+            self.failures = 0
+            return
+
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+
+def breaker_for(endpoint: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        threshold=int(_setting("OBIS_BREAKER_THRESHOLD", endpoint, DEFAULT_BREAKER_THRESHOLD)),
+        cooldown=float(_setting("OBIS_BREAKER_COOLDOWN", endpoint, DEFAULT_BREAKER_COOLDOWN)),
+    )
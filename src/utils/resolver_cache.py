@@ -0,0 +1,168 @@
+"""
+Memoization of the OBIS name resolvers in utils.utils.
+
+"great white shark" resolves to the same AphiaID for weeks, so each resolver keeps an
+in-process LRU of its answers with a TTL, keyed on the normalised name (case, whitespace
+and diacritics are ignored). An optional sqlite tier shares answers between the workers
+on a node and across restarts. Its queries run in a worker thread, one at a time, so a
+worker holding the sqlite write lock never stalls the event loop; an error of the shared
+tier counts as a miss. Empty answers are not cached, so a timed out lookup is retried on
+the next request.
+
+Tunables (environment or src/env.yaml):
+    OBIS_RESOLVER_CACHE_TTL     seconds an answer is reused (default 7 days)
+    OBIS_RESOLVER_CACHE_SIZE    entries kept in memory per resolver (default 4096)
+    OBIS_RESOLVER_CACHE_PATH    sqlite file for the shared tier (unset: memory only)
+"""
+import asyncio
+import copy
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+DEFAULT_TTL = 7 * 24 * 60 * 60
+DEFAULT_SIZE = 4096
+
+
+def normalize(text) -> str:
+    """Casefolds, strips diacritics and collapses whitespace: " Île  de  France" -> "ile de france"."""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+class ResolverCache:
+
+    def __init__(self, name: str, max_entries: int = DEFAULT_SIZE, ttl: float = DEFAULT_TTL, path: str | None = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "disk_hits": 0}
+        self._entries: OrderedDict[str, tuple[object, float]] = OrderedDict()
+
+        self._db = None
+        self._lock = threading.Lock()
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS resolutions (resolver TEXT, key TEXT, value TEXT, expires_at REAL, "
+                "PRIMARY KEY (resolver, key))"
+            )
+
+    async def get(self, key: str) -> tuple[bool, object]:
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return True, copy.deepcopy(value)
+            del self._entries[key]
+
+        if self._db is not None:
+            row = await self._on_disk(
+                "SELECT value, expires_at FROM resolutions WHERE resolver = ? AND key = ?", (self.name, key)
+            )
+            if row is not None and row[1] > now:
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+                self.stats["hits"] += 1
+                self.stats["disk_hits"] += 1
+                return True, copy.deepcopy(value)
+
+        self.stats["misses"] += 1
+        return False, None
+
+    async def put(self, key: str, value):
+        expires_at = time.time() + self.ttl
+        self._remember(key, copy.deepcopy(value), expires_at)
+        if self._db is not None:
+            await self._on_disk(
+                "INSERT OR REPLACE INTO resolutions VALUES (?, ?, ?, ?)",
+                (self.name, key, json.dumps(value), expires_at),
+            )
+
+    async def _on_disk(self, sql: str, parameters: tuple):
+        """First row of `sql` on the shared tier, run in a worker thread; None if sqlite fails."""
+        def run():
+            with self._lock:
+                return self._db.execute(sql, parameters).fetchone()
+
+        try:
+            return await asyncio.to_thread(run)
+        except sqlite3.Error as e:
+            print(f"Shared {self.name} cache unavailable: {e}")
+            return None
+
+    def _remember(self, key: str, value, expires_at: float):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.stats = {"hits": 0, "misses": 0, "disk_hits": 0}
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM resolutions WHERE resolver = ?", (self.name,))
+
+
+_caches: dict[str, ResolverCache] = {}
+
+
+def get_cache(name: str) -> ResolverCache:
+    # imported here because utils.utils applies `memoize` while it is being imported
+    from utils import utils
+
+    if name not in _caches:
+        _caches[name] = ResolverCache(
+            name,
+            max_entries=int(utils.getValue("OBIS_RESOLVER_CACHE_SIZE", DEFAULT_SIZE)),
+            ttl=float(utils.getValue("OBIS_RESOLVER_CACHE_TTL", DEFAULT_TTL)),
+            path=utils.getValue("OBIS_RESOLVER_CACHE_PATH"),
+        )
+    return _caches[name]
+
+
+def memoize(name: str, cache_if=bool):
+    """
+    Caches the answers of an async single-argument resolver under `name`. Only answers
+    for which `cache_if(answer)` is true are stored.
+    """
+    def decorator(resolver):
+        @functools.wraps(resolver)
+        async def wrapper(query):
+            cache = get_cache(name)
+            key = normalize(query)
+
+            found, value = await cache.get(key)
+            if found:
+                return value
+
+            value = await resolver(query)
+            if cache_if(value):
+                await cache.put(key, value)
+            return value
+        return wrapper
+    return decorator
+
+
+def stats() -> dict:
+    """Hit and miss counters per resolver."""
+    return {name: dict(cache.stats) for name, cache in _caches.items()}
+
+
+def clear():
+    for cache in _caches.values():
+        cache.clear()
@@ -0,0 +1,202 @@
+"""
+Disk-backed cache of OBIS GET responses, used by the OBIS client.
+
+Entries are keyed on the canonical url and live in a small sqlite database so they are
+shared by every worker on the node and survive restarts. How long an entry is served
+without asking OBIS depends on the endpoint (see `DEFAULT_TTLS`); once it is stale it is
+revalidated with If-None-Match / If-Modified-Since when OBIS sent an ETag or Last-Modified,
+so an unchanged resource costs a 304 instead of a full download. When the database grows
+beyond its byte budget the least recently used entries are evicted.
+
+The methods block on sqlite, so the OBIS client calls them through `asyncio.to_thread`;
+one lock serialises the threads on the shared connection. Writes are kept short: the
+access time of a hit is recorded in memory and written in batches, and the size of the
+cached bodies is kept as a running total that is only summed again from the database
+once it passes the budget (other workers write to the same file).
+
+Tunables (environment or src/env.yaml):
+    OBIS_CACHE                  "false" to disable the cache (default "true")
+    OBIS_CACHE_PATH             sqlite file (default .cache/obis_responses.sqlite)
+    OBIS_CACHE_MAX_BYTES        size budget for cached bodies (default 256 MB)
+    OBIS_CACHE_TTL_<ENDPOINT>   override the ttl in seconds of one endpoint, e.g. OBIS_CACHE_TTL_DATASET
+"""
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from utils import utils
+
+DAY = 24 * 60 * 60
+
+# seconds a response is served from the cache before it is revalidated, by the first
+# path segment of the url. metadata barely changes; endpoints not listed are not cached.
+DEFAULT_TTLS = {
+    "dataset": DAY,
+    "institute": DAY,
+    "node": DAY,
+    "area": 7 * DAY,
+    "taxon": 7 * DAY,
+    "statistics": 60 * 60,
+    "checklist": 60 * 60,
+    "facet": 60 * 60,
+    "occurrence": 0,
+}
+
+DEFAULT_PATH = ".cache/obis_responses.sqlite"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# hits whose access time is kept in memory before it is written
+TOUCH_BATCH = 64
+
+# only headers that still describe the decoded body are kept
+STORED_HEADERS = ("content-type", "etag", "last-modified")
+
+
+def endpoint_of(url: str) -> str:
+    path = urlsplit(url).path.strip("/")
+    # api.obis.org serves the api at the root, skip a version prefix if there is one
+    segments = [s for s in path.split("/") if s and s != "v3"]
+    return segments[0] if segments else ""
+
+
+@functools.cache
+def _endpoint_ttl(endpoint: str) -> float:
+    return float(utils.getValue(f"OBIS_CACHE_TTL_{endpoint.upper()}", DEFAULT_TTLS.get(endpoint, 0)))
+
+
+def ttl_for(url: str) -> float:
+    return _endpoint_ttl(endpoint_of(url))
+
+
+class ResponseCache:
+
+    def __init__(self, path: str = DEFAULT_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.stats = {"stored": 0, "evicted": 0}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._touched: dict[str, float] = {}
+        self._db = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, body BLOB, headers TEXT, etag TEXT, last_modified TEXT, "
+            "stored_at REAL, accessed_at REAL, size INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._size = self._total_size()
+
+    def lookup(self, key: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, headers, etag, last_modified, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            self._touched[key] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                self._flush_touched()
+
+        body, headers, etag, last_modified, stored_at = row
+        return {
+            "body": body,
+            "headers": json.loads(headers),
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": stored_at,
+        }
+
+    def is_fresh(self, entry: dict, ttl: float) -> bool:
+        return time.time() - entry["stored_at"] < ttl
+
+    def store(self, key: str, response: httpx.Response):
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        body = response.content
+        now = time.time()
+        with self._lock:
+            replaced = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, body, json.dumps(headers), headers.get("etag"), headers.get("last-modified"), now, now, len(body)),
+            )
+            self._touched.pop(key, None)
+            self.stats["stored"] += 1
+            self._size += len(body) - (replaced[0] if replaced else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def refresh(self, key: str):
+        """Marks an entry as fresh again after OBIS confirmed it unchanged (304)."""
+        now = time.time()
+        with self._lock:
+            self._touched.pop(key, None)
+            self._db.execute("UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+
+    def _flush_touched(self):
+        self._db.executemany(
+            "UPDATE responses SET accessed_at = ? WHERE key = ?",
+            [(accessed_at, key) for key, accessed_at in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def _total_size(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self):
+        # the running total misses what other workers stored or evicted
+        self._size = self._total_size()
+        if self._size <= self.max_bytes:
+            return
+
+        self._flush_touched()
+        evicted = []
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at")
+        for key, size in rows:
+            if self._size <= self.max_bytes:
+                break
+            evicted.append((key,))
+            self._size -= size
+        rows.close()
+        self._db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.stats["evicted"] += len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._touched.clear()
+            self._size = 0
+
+
+def to_response(entry: dict, url: str) -> httpx.Response:
+    return httpx.Response(
+        200,
+        headers=entry["headers"],
+        content=entry["body"],
+        request=httpx.Request("GET", url),
+    )
+
+
+_cache: ResponseCache | None = None
+
+
+def get_cache() -> ResponseCache | None:
+    """Returns the process-wide cache, or None if it is disabled."""
+    global _cache
+
+    if str(utils.getValue("OBIS_CACHE", "true")).lower() != "true":
+        return None
+    if _cache is None:
+        _cache = ResponseCache(
+            path=utils.getValue("OBIS_CACHE_PATH", DEFAULT_PATH),
+            max_bytes=int(utils.getValue("OBIS_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        )
+    return _cache
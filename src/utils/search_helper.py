@@ -1,18 +1,34 @@
-from openai import AsyncOpenAI
 from utils import prompt_helper as prompt
 from utils import utils as utils
-import instructor
+from utils import llm_client
+from utils import generation_cache
+from utils import fast_path as rules
+from utils import llm_metrics
+from utils import repair
+from utils import model_router as router
 from ichatbio.types import AgentEntrypoint
 
 import sys
 
-from typing import Type, Optional
-from pydantic import BaseModel, Field, create_model
+from typing import Type, Optional, NamedTuple, Callable
+from pydantic import BaseModel, Field, ValidationError, create_model, model_validator
 # import requests
 
-async def create_response_model(api_model: Type[BaseModel]) -> Type[BaseModel]:
+def repair_validator(api_model: Type[BaseModel]):
+    """Before-validator that repairs the recoverable values of `params` (see utils.repair) instead of failing."""
+    def repair_params(cls, data):
+        if isinstance(data, dict) and isinstance(data.get("params"), dict):
+            params, repaired = repair.repair_params(api_model, data["params"])
+            if repaired:
+                print(f"Repaired {', '.join(repaired)} of the generated parameters")
+                data = {**data, "params": params}
+        return data
+    return model_validator(mode="before")(repair_params)
+
+def create_response_model(api_model: Type[BaseModel], repair_values: bool = True) -> Type[BaseModel]:
     response_model = create_model(
                         "response_model",
+                        __validators__={"repair_params": repair_validator(api_model)} if repair_values else None,
                         params = (
                             Optional[api_model],
                             Field(
@@ -45,33 +61,183 @@ async def create_response_model(api_model: Type[BaseModel]) -> Type[BaseModel]:
     
     return response_model
 
-async def _generate_search_parameters(request: str, entrypoint: AgentEntrypoint, returnModel):
-    system_prompt = prompt.build_system_prompt(entrypoint.id)
+def create_stream_model(api_model: Type[BaseModel]) -> Type[BaseModel]:
+    """
+    Response model with the same fields and schema as create_response_model(api_model) but
+    without the api model's validators, which would reject half-streamed values (a date of "20").
+    """
+    fields = {name: (field.annotation, field) for name, field in api_model.model_fields.items()}
+    return create_response_model(create_model(api_model.__name__, __doc__=api_model.__doc__, **fields), repair_values=False)
 
-    response_model = await create_response_model(returnModel)
-        
-    client = AsyncOpenAI(api_key=utils.getValue("OPENAI_API_KEY"), base_url=utils.getValue("OPENAI_BASE_URL"))
-    
-    instructor_client = instructor.patch(client)
-
-    req = await instructor_client.chat.completions.create(
-        model="gpt-4o-mini",
-        response_model=response_model,
-        messages=[
-            {"role": "system",
-                "content": system_prompt},
-            {"role": "user", "content": request}],
+class ResponseModels(NamedTuple):
+    api_model: Type[BaseModel]
+    model: Type[BaseModel]
+    schema: dict
+    schema_hash: str
+    stream_model: Type[BaseModel]
+
+# entrypoint id -> its response models. Models are built once when the entrypoint module is
+# imported instead of by create_model on every request; a stable class also lets instructor
+# reuse the tool schema it derives from it.
+_response_models: dict[str, ResponseModels] = {}
+
+def register_response_model(entrypoint_id: str, api_model: Type[BaseModel]) -> Type[BaseModel]:
+    if entrypoint_id in _response_models:
+        registered = _response_models[entrypoint_id].api_model
+        if registered is not api_model:
+            raise ValueError(f"{entrypoint_id} is already registered with {registered.__name__}, not {api_model.__name__}")
+    else:
+        response_model = create_response_model(api_model)
+        schema = response_model.model_json_schema()
+        _response_models[entrypoint_id] = ResponseModels(
+            api_model, response_model, schema, generation_cache.schema_hash(schema), create_stream_model(api_model)
+        )
+
+    return _response_models[entrypoint_id].model
+
+def get_response_schema(entrypoint_id: str) -> dict:
+    return _response_models[entrypoint_id].schema
+
+MODEL = router.DEFAULT_MODEL
+
+def streaming_enabled() -> bool:
+    return str(utils.getValue("OBIS_LLM_STREAMING", "true")).lower() == "true"
+
+async def _stream_generation(instructor_client, model: str, models: ResponseModels, messages: list,
+                             on_field: Callable[[str, object], None], metrics: llm_metrics.CallMetrics) -> BaseModel:
+    """
+    Streams the structured output and calls on_field(name, value) for each field of params as
+    soon as it is complete, i.e. once the model has moved on to another field. Returns the
+    final object validated against the real response model.
+    """
+    stream = instructor_client.chat.completions.create_partial(
+        model=model,
+        response_model=models.stream_model,
+        messages=messages,
         temperature=0,
+        # without it a streamed response has no token counts
+        stream_options={"include_usage": True},
+        hooks=metrics.hooks(),
     )
 
-    generation = req.model_dump(exclude_none=True, by_alias=True)
+    last = None
+    seen = set()
+    reported = set()
+    async for partial in stream:
+        last = partial.model_dump(exclude_none=True)
+        params = last.get("params") or {}
+
+        # the field written last may still be growing, every field before it is final
+        complete = seen if params.keys() - seen else set()
+        if len(last) > 1:
+            complete = params.keys()
+        for name in complete - reported:
+            reported.add(name)
+            on_field(name, params[name])
+        seen = set(params.keys())
+
+    return models.model.model_validate(last or {})
+
+async def _generate_search_parameters(request: str, entrypoint: AgentEntrypoint, returnModel, fast_path: bool = True,
+                                      on_field: Callable[[str, object], None] | None = None, process=None):
+    """
+    Generates the API params for `request`. If `on_field` is given the LLM output is streamed
+    and on_field(name, value) is called for each param as soon as the LLM has written it, so
+    the caller can start resolving it while the rest is being generated.
+
+    Time, tokens, re-asks and validation errors of the call are added to llm_metrics and,
+    if `process` is given, written to its log.
+    """
+    metrics = llm_metrics.CallMetrics(entrypoint.id, MODEL)
+    try:
+        generation, source = await _generate(request, entrypoint, returnModel, fast_path, on_field, metrics)
+    except Exception:
+        metrics.finish("failed")
+        raise
+
+    record = metrics.finish(source)
+    print("Parameter generation", record)
+    if process is not None:
+        await process.log(f"Search parameters generated ({source}) in {record['seconds']:.2f}s", data=record)
+
+    return generation
+
+async def _generate(request: str, entrypoint: AgentEntrypoint, returnModel, fast_path: bool,
+                    on_field: Callable[[str, object], None] | None, metrics: llm_metrics.CallMetrics) -> tuple[dict, str]:
+    if fast_path and (generation := rules.parse(request, entrypoint.id)) is not None:
+        print("Parsed without the LLM", generation)
+        return generation, "rules"
+
+    register_response_model(entrypoint.id, returnModel)
+    system_prompt, prompt_hash = prompt.prompts.get(entrypoint.id, request)
+
+    tiers = router.route(entrypoint.id)
+    models = "+".join(tier.model for tier in tiers)
+
+    cache = generation_cache.get_cache()
+    key = generation_cache.cache_key(request, entrypoint.id, models, prompt_hash, _response_models[entrypoint.id].schema_hash)
+    if cache is not None:
+        found, generation = await cache.get(key)
+        if found:
+            print("Using cached generation", generation)
+            return generation, "cache"
+
+    messages = [
+        {"role": "system",
+            "content": system_prompt},
+        {"role": "user", "content": request}]
+
+    for tier in tiers:
+        metrics.use_tier(tier.name, tier.model)
+        last = tier is tiers[-1]
+        try:
+            req = await _generate_with(tier, entrypoint.id, messages, on_field, metrics)
+        except Exception as e:
+            if last:
+                raise
+            print(f"{tier.model} could not generate the parameters, escalating: {e}")
+            metrics.escalate("error")
+            continue
+
+        generation = req.model_dump(exclude_none=True, by_alias=True)
+        if not last and (reason := router.escalation_reason(generation)):
+            print(f"Escalating the answer of {tier.model} ({reason}): {generation}")
+            metrics.escalate(reason)
+            continue
+        break
 
     print(generation)
 
+    # a generation without params is not worth repeating
+    if cache is not None and generation.get("params"):
+        await cache.put(key, generation)
+
     # if len(generation['unresolved_params']) > 0:
     #     await handleUnresolvedParams(entrypoint, generation)
     # print("returning from search params")
-    return generation
+    return generation, "llm"
+
+async def _generate_with(tier: router.Tier, entrypoint_id: str, messages: list,
+                         on_field: Callable[[str, object], None] | None, metrics: llm_metrics.CallMetrics) -> BaseModel:
+    instructor_client = llm_client.get_client(tier.base_url, tier.api_key)
+    models = _response_models[entrypoint_id]
+
+    if on_field is not None and streaming_enabled():
+        try:
+            return await _stream_generation(instructor_client, tier.model, models, messages, on_field, metrics)
+        except ValidationError as e:
+            # the non-streaming call below re-asks the LLM with the validation errors
+            print(f"Streamed parameters did not validate, generating again: {e}")
+            metrics.on_parse_error(e)
+
+    return await instructor_client.chat.completions.create(
+        model=tier.model,
+        response_model=models.model,
+        messages=messages,
+        temperature=0,
+        max_retries=tier.max_retries,
+        hooks=metrics.hooks(),
+    )
 
 async def handleUnresolvedParams(entrypoint, generation):
     match entrypoint.id:
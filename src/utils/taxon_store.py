@@ -0,0 +1,207 @@
+"""
+Local store of taxon names, consulted by `utils.resolveCommonName` and
+`utils.getTaxonIdFromScientificName` before `taxon/search/common` and `taxon/search`.
+
+Species are the names we resolve most often, and most of them repeat. The store maps
+normalised vernacular ("common") and scientific names to AphiaIDs, accepted names and
+the vernacular name OBIS lists for the taxon. It is kept as two sorted tables: a list of
+keys searched with bisect, next to int32 arrays of AphiaIDs and of indexes into one
+deduplicated list of names. A key can have several rows ("kelp"), which keep the order
+OBIS gave them.
+
+The tables are read from the store file once, when the agent starts. Answers to lookups
+the store could not serve are appended to the file in a worker thread and are served
+after the next start. Until then `resolver_cache` serves the repeats. The store stops
+growing once it holds `OBIS_TAXON_STORE_MAX_NAMES` names.
+
+The store file is a TSV with one row per line, in any order:
+
+    kind<TAB>name<TAB>aphiaid<TAB>accepted name<TAB>vernacular name
+
+`kind` is "common" or "scientific"; the vernacular name may be left out, and is then
+taken to be `name`. The file can be seeded from OBIS/WoRMS exports (csv or tsv with
+Darwin Core columns taxonID or AphiaID, scientificName, and optionally
+acceptedNameUsage and vernacularName):
+
+    PYTHONPATH=src python -m utils.taxon_store seed export.csv [more.tsv ...]
+
+Tunables (environment or src/env.yaml):
+    OBIS_TAXON_STORE            "false" to always ask OBIS (default "true")
+    OBIS_TAXON_STORE_PATH       the store file (unset: no store)
+    OBIS_TAXON_STORE_MAX_NAMES  names after which answers are no longer added (default 1000000)
+"""
+import asyncio
+import bisect
+import csv
+import os
+import sys
+
+import numpy as np
+
+from utils import resolver_cache
+
+KINDS = ("common", "scientific")
+
+DEFAULT_MAX_NAMES = 1_000_000
+
+Row = tuple[str, int, str, str]
+
+
+def normalize(name) -> str:
+    return resolver_cache.normalize(name)
+
+
+class NameTable:
+    """Immutable sorted table of (key, AphiaID, accepted name, vernacular name) rows."""
+
+    def __init__(self, rows: list[Row]):
+        # stable: the rows of one key keep their order
+        rows = sorted(rows, key=lambda row: row[0])
+        self.keys = [row[0] for row in rows]
+        self.ids = np.array([row[1] for row in rows], dtype=np.int32)
+        self.names = sorted({name for row in rows for name in row[2:]})
+        index = {name: i for i, name in enumerate(self.names)}
+        self.accepted = np.array([index[row[2]] for row in rows], dtype=np.int32)
+        self.vernacular = np.array([index[row[3]] for row in rows], dtype=np.int32)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def distinct_keys(self) -> int:
+        return len(set(self.keys))
+
+    def get(self, key: str) -> list[tuple[int, str, str]]:
+        """(AphiaID, accepted name, vernacular name) rows of `key`."""
+        start = bisect.bisect_left(self.keys, key)
+        end = bisect.bisect_right(self.keys, key, lo=start)
+        return [(int(self.ids[i]), self.names[self.accepted[i]], self.names[self.vernacular[i]]) for i in range(start, end)]
+
+
+class TaxonStore:
+
+    def __init__(self, path: str, max_names: int = DEFAULT_MAX_NAMES):
+        self.path = path
+        self.max_names = max_names
+        self.tables = {kind: NameTable([]) for kind in KINDS}
+        # keys appended since the file was read, so a name is written once per process
+        self.added: set[tuple[str, str]] = set()
+        self.stats = {"hits": 0, "misses": 0, "added": 0}
+
+        if os.path.exists(path):
+            self.load(path)
+        self.size = sum(table.distinct_keys() for table in self.tables.values())
+
+    def load(self, path: str):
+        rows = {kind: [] for kind in KINDS}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) not in (4, 5) or parts[0] not in rows:
+                    continue
+                try:
+                    aphiaid = int(parts[2])
+                except ValueError:
+                    continue
+                vernacular = parts[4] if len(parts) == 5 else parts[1]
+                rows[parts[0]].append((normalize(parts[1]), aphiaid, parts[3], vernacular))
+
+        # the same answer may have been appended twice, by workers missing at the same time
+        for kind, kind_rows in rows.items():
+            self.tables[kind] = NameTable(list(dict.fromkeys(kind_rows)))
+
+    def lookup(self, kind: str, name: str) -> list[tuple[int, str, str]]:
+        """(AphiaID, accepted name, vernacular name) rows of `name`, or [] if the store does not know it."""
+        rows = self.tables[kind].get(normalize(name))
+        self.stats["hits" if rows else "misses"] += 1
+        return rows
+
+    async def add(self, kind: str, name: str, rows: list[tuple[int, str, str]]):
+        """Appends the answer OBIS gave for `name` to the store file, off the event loop."""
+        key = normalize(name)
+        rows = [
+            (int(aphiaid), accepted or "", vernacular or "")
+            for aphiaid, accepted, vernacular in rows if str(aphiaid).strip().isdigit()
+        ]
+        if not key or not rows or (kind, key) in self.added or self.tables[kind].get(key):
+            return
+        if self.size >= self.max_names:
+            return
+
+        self.added.add((kind, key))
+        self.size += 1
+        self.stats["added"] += 1
+        await asyncio.to_thread(self.append, self.path, [(kind, key, *row) for row in rows])
+
+    @staticmethod
+    def append(path: str, rows: list[tuple[str, str, int, str, str]]):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.writelines(
+                "\t".join([kind, key, str(aphiaid), " ".join(accepted.split()), " ".join(vernacular.split())]) + "\n"
+                for kind, key, aphiaid, accepted, vernacular in rows
+            )
+
+
+def enabled() -> bool:
+    from utils import utils
+    return str(utils.getValue("OBIS_TAXON_STORE", "true")).lower() == "true" and bool(utils.getValue("OBIS_TAXON_STORE_PATH"))
+
+
+_store: TaxonStore | None = None
+
+
+def get_store() -> TaxonStore | None:
+    """The process-wide store, or None if it is disabled or has no file."""
+    global _store
+
+    if not enabled():
+        return None
+    if _store is None:
+        from utils import utils
+        _store = TaxonStore(
+            utils.getValue("OBIS_TAXON_STORE_PATH"),
+            max_names=int(utils.getValue("OBIS_TAXON_STORE_MAX_NAMES", DEFAULT_MAX_NAMES)),
+        )
+    return _store
+
+
+def clear():
+    global _store
+    _store = None
+
+
+def export_rows(path: str) -> list[tuple[str, str, int, str, str]]:
+    """Store rows of a Darwin Core csv/tsv export of OBIS or WoRMS."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        reader = csv.DictReader(f, delimiter="\t" if "\t" in sample.splitlines()[0] else ",")
+        rows = []
+        for record in reader:
+            aphiaid = record.get("taxonID") or record.get("AphiaID") or record.get("acceptedNameUsageID")
+            scientific = record.get("scientificName")
+            if not aphiaid or not str(aphiaid).strip().isdigit() or not scientific:
+                continue
+            accepted = record.get("acceptedNameUsage") or scientific
+            vernacular = record.get("vernacularName") or ""
+            rows.append(("scientific", normalize(scientific), int(aphiaid), accepted, vernacular))
+            if vernacular:
+                rows.append(("common", normalize(vernacular), int(aphiaid), accepted, vernacular))
+        return rows
+
+
+def seed(store_path: str, export_paths: list[str]) -> int:
+    rows = [row for path in export_paths for row in export_rows(path)]
+    TaxonStore.append(store_path, rows)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "seed":
+        raise SystemExit("usage: python -m utils.taxon_store seed <export.csv|tsv> [...]")
+    from utils import utils
+    path = utils.getValue("OBIS_TAXON_STORE_PATH")
+    if not path:
+        raise SystemExit("Set OBIS_TAXON_STORE_PATH to the store file to seed")
+    print(f"Added {seed(path, sys.argv[2:])} names to {path}")
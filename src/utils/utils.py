@@ -1,31 +1,54 @@
 import os
+import functools
 import yaml
 from urllib.parse import urlencode, quote
 import json
-import requests
+import asyncio
+import httpx
 
 # from fuzzywuzzy import fuzz, process
 from rapidfuzz import fuzz, process
-# import numpy as np
+import numpy as np
 from schema import FacetField
 
 from openai import AsyncOpenAI
 import instructor
 
+from utils import obis_client
+from utils import resolver_cache
+from utils import entity_index
+from utils import fuzzy
+from utils import embedding_index
+from utils import gazetteer
+from utils import taxon_store
+
 # from sentence_transformers import SentenceTransformer, util
 # import torch
 
-def getValue(key):
+CONFIG_FILE = 'src/env.yaml'
+
+# parsed once per version of the file instead of on every lookup
+@functools.lru_cache(maxsize=1)
+def readConfigFile(path, mtime):
+    with open(path, 'r') as file:
+        return yaml.safe_load(file) or {}
+
+def getValue(key, default=None):
     value = os.getenv(key)
 
-    if value == None:
-        with open('src/env.yaml', 'r') as file:
-            data = yaml.safe_load(file)
+    if value == None and os.path.exists(CONFIG_FILE):
+        value = readConfigFile(CONFIG_FILE, os.path.getmtime(CONFIG_FILE)).get(key)
 
-        value = data[key]
+    if value == None:
+        value = default
 
     return value
 
+# resolver lookups are small; a hung search should not hold up the request for long
+RESOLVER_TIMEOUT = float(getValue("OBIS_RESOLVER_TIMEOUT", 5))
+# full area/institute/dataset listings used to seed the local json files
+CATALOGUE_TIMEOUT = float(getValue("OBIS_CATALOGUE_TIMEOUT", 60))
+
 def generate_obis_url(api, payload):
     obis_url = "https://api.obis.org/"
     # payload = payload["params"]
@@ -64,13 +87,13 @@ def generate_mapper_obis_url(api, payload):
     url = obis_url+api+'?'+params
     return url
 
-def initializeAreaIds():
+async def initializeAreaIds():
     areas = []
 
     url = generate_obis_url('area', None)
-    response = requests.get(url)
+    response = await obis_client.get(url, timeout=CATALOGUE_TIMEOUT)
 
-    if response.ok:
+    if response.is_success:
         results = response.json()['results']
         for i in results:
             areas.append({
@@ -87,13 +110,13 @@ def initializeAreaIds():
         
     return
 
-def initializeInstitutes():
+async def initializeInstitutes():
     institutes = []
 
     url = generate_obis_url('institute', None)
-    response = requests.get(url)
+    response = await obis_client.get(url, timeout=CATALOGUE_TIMEOUT)
 
-    if response.ok:
+    if response.is_success:
         results = response.json()['results']
         for i in results:
             if i["id"] == None:
@@ -110,13 +133,13 @@ def initializeInstitutes():
         
     return
     
-def initializeDatasets():
+async def initializeDatasets():
     datasets = []
 
     url = generate_obis_url('dataset', None)
-    response = requests.get(url)
+    response = await obis_client.get(url, timeout=CATALOGUE_TIMEOUT)
 
-    if response.ok:
+    if response.is_success:
         results = response.json()['results']
         for i in results:
             if i["id"] == None:
@@ -131,15 +154,15 @@ def initializeDatasets():
         
     return
 
-def getData(path, queryType):
+async def getData(path, queryType):
     if os.path.exists(path) == False:
         match queryType:
             case "areaid":
-                initializeAreaIds()
+                await initializeAreaIds()
             case "institute":
-                initializeInstitutes()
+                await initializeInstitutes()
             case "dataset":
-                initializeDatasets()
+                await initializeDatasets()
             case _:
                 pass
 
@@ -148,8 +171,26 @@ def getData(path, queryType):
 
     return entity
 
+async def downloadAreaListing():
+    try:
+        await initializeAreaIds()
+    except Exception as e:
+        print(f"Could not download the area listing, areas will be searched over the network: {e}")
+    finally:
+        await obis_client.close()
+
 def setup():
-    pass
+    # the area gazetteer is built from the area listing, fetch it once before serving
+    if gazetteer.enabled() and not os.path.exists("areas.json"):
+        asyncio.run(downloadAreaListing())
+    # read the taxon store file now rather than on the first species lookup
+    taxon_store.get_store()
+
+def getGazetteer():
+    """The area gazetteer, or None until areas.json has been downloaded."""
+    if not gazetteer.enabled() or not os.path.exists("areas.json"):
+        return None
+    return gazetteer.load("areas.json", os.path.getmtime("areas.json"))
 
 
 def destroy():
@@ -159,7 +200,32 @@ def destroy():
             os.remove(path)
             print(f"{path} deleted successfully.")
 
+async def fetchResults(url):
+    """
+    Returns the `results` list of an OBIS search url, or an empty list if OBIS errors,
+    returns invalid json or does not answer within RESOLVER_TIMEOUT. Cancellation of the
+    calling task is not swallowed.
+    """
+    try:
+        async with asyncio.timeout(RESOLVER_TIMEOUT):
+            response = await obis_client.get(url, timeout=RESOLVER_TIMEOUT)
+        if not response.is_success:
+            print(f"OBIS returned {response.status_code} for {url}")
+            return []
+        return response.json().get("results", [])
+    except TimeoutError:
+        print(f"OBIS did not respond within {RESOLVER_TIMEOUT}s for {url}")
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"OBIS lookup failed for {url}: {e}")
+    return []
+
+@resolver_cache.memoize("area", cache_if=lambda answer: bool(answer[1]))
 async def getAreaId(query):
+    # most area mentions are known names or aliases, answered without a round trip
+    areas = getGazetteer()
+    if areas is not None and (matches := areas.lookup(query)):
+        return None, matches
+
     reqQuery = {}
     reqQuery['q'] = query
     reqQuery['size'] = 10
@@ -168,11 +234,7 @@ async def getAreaId(query):
     url = generate_obis_url('area/search', reqQuery)
     results = []
     try:
-        response = requests.get(url)
-
-        response_json = response.json()
-
-        results = response_json.get("results", [])
+        results = await fetchResults(url)
 
         # print(results)
 
@@ -189,7 +251,12 @@ async def getAreaId(query):
                     ret.append({"name": x.get('name', ''), "id":x.get('id', '')})
             return url, ret
 
-    areas = getData("areas.json", "areaid")
+    # names that mean the same without sharing words, if the embedding index was built
+    semantic = await embedding_index.search("area", query)
+    if semantic:
+        return None, semantic
+
+    areas = await getData("areas.json", "areaid")
     
     query = query.lower()
     matches = [
@@ -203,37 +270,21 @@ async def getAreaId(query):
     return None, matches
 
 async def getInstituteId(query):
-    institutes = getData("institutes.json", "institute")
+    if not os.path.exists("institutes.json"):
+        await initializeInstitutes()
 
-    query_dict = {"name": query.get("institute")}
+    # built once per version of the file, and only institutes sharing a rare token are scored
+    index = entity_index.load("institutes.json", os.path.getmtime("institutes.json"))
 
+    name = query.get("institute")
     if "area" in query:
-        query_dict["name"] = query_dict.get("name") + " " + query.get("area")
-
-    # match, score = process.extract(query=query_dict, choices=institutes, processor=lambda d:d["name"], scorer=fuzz.token_set_ratio)
+        name = name + " " + query.get("area")
 
-    matches = await hybrid_match(query=query_dict, query_options=institutes, weights=[0.7,0.3])
-    # print(matches)
+    matches = index.search(name)
+    if not matches:
+        matches = await embedding_index.search("institute", name) or []
     return matches
 
-# function to get best match
-async def fn(query, choice):
-    if choice == None:
-        return 0
-    q_tokens = query.split(' ')
-    c_tokens = choice.split(' ')
-    ret = 0
-
-    for i in q_tokens:
-        if i in c_tokens:
-            ret+=1
-
-    if ret > 0:
-        print(choice)
-    
-    return ret
-
-
 async def exceptionHandler(p, e, descr):
     if e != None:
         await p.log(str(e) +" "+ descr)
@@ -299,37 +350,24 @@ async def exceptionHandler(p, e, descr):
 
 # query = dict('name':)
 # query_options = dict('name':,'id':,)
-# best_n = best matches 
+# best_n = best matches
 # weights = [weightage for embedding score, weightage for fuzzy score]
-async def hybrid_match(query, query_options, best_n = 5, weights = [0.5, 0.5]):
+# semantic_scores = embedding similarity of each option, if available
+async def hybrid_match(query, query_options, best_n = 5, weights = [0.5, 0.5], semantic_scores = None):
     if len(query_options) == 0:
         return []
-    names = [i["name"] for i in query_options]
-    query_token_len = float(len(query["name"].split(" ")))
-    
-    # model = SentenceTransformer('all-MiniLM-L6-v2')
-    
-    # # Embedding scores
-    # q_emb = model.encode(query["name"], convert_to_tensor=True)
-    # inst_embs = model.encode(names, convert_to_tensor=True)
-    # emb_scores = util.cos_sim(q_emb, inst_embs)[0].cpu().numpy()
-
-    emb_scores = 0
-
-    # Fuzzy scores
-    fuzzy_scores = []
-    for n in names:
-        tp = ( await fn(query["name"], n)) / query_token_len
-        fuzzy_scores.append(tp)
-    
-    fuzzy_scores = list(fuzzy_scores)
 
-    # Weighted combination (x% semantic, y% fuzzy)
-    # hybrid_scores = weights[0] * emb_scores + weights[1] * fuzzy_scores
-    hybrid_scores = fuzzy_scores
+    # normalised once per list of names and scored in one batch (see utils.fuzzy)
+    matcher = fuzzy.matcher_for(tuple(i["name"] for i in query_options))
+    fuzzy_scores = matcher.scores(query["name"])
 
-    # best_ind = np.argsort(hybrid_scores)[::-1][:best_n]
-    best_ind = [index for index, _ in sorted(enumerate(hybrid_scores), key=lambda x: x[1], reverse=True)[:best_n]]
+    # Weighted combination (x% semantic, y% fuzzy); without semantic scores only the fuzzy ones count
+    if semantic_scores is None:
+        hybrid_scores = fuzzy_scores
+    else:
+        hybrid_scores = np.average(np.vstack([semantic_scores, fuzzy_scores]), axis=0, weights=weights)
+
+    best_ind = fuzzy.top_k(hybrid_scores, best_n)
     best_matches = [
         {
             "id": query_options[i]["id"],
@@ -339,11 +377,12 @@ async def hybrid_match(query, query_options, best_n = 5, weights = [0.5, 0.5]):
         for i in best_ind
     ]
 
-    if best_matches[0].get("score", 0) < 0.5:
+    if not best_matches or best_matches[0].get("score", 0) < 0.5:
         return []
     return best_matches
 
 
+@resolver_cache.memoize("datasetname", cache_if=lambda answer: bool(answer[1]))
 async def getDatasetId(datasetname: str) -> str | list:
     query = {}
     query['q'] = datasetname
@@ -351,18 +390,19 @@ async def getDatasetId(datasetname: str) -> str | list:
     query['skip'] = 0
 
     url = generate_obis_url('dataset/search2', query)
-    response = requests.get(url)
-
-    response_json = response.json()
-
-    results = response_json.get("results", [])
+    results = await fetchResults(url)
 
     if len(results) > 0:
         return url, [[x.get('id', ''), x.get('title', '')] for x in results]
 
+    semantic = await embedding_index.search("dataset", datasetname)
+    if semantic:
+        return url, [[x["id"], x["name"]] for x in semantic]
+
     return url, None
 
 
+@resolver_cache.memoize("scientificname_of_commonname", cache_if=lambda answer: bool(answer[1]))
 async def getScientificName(commonname: str) -> str | list:
     query = {}
     query['q'] = commonname
@@ -370,11 +410,7 @@ async def getScientificName(commonname: str) -> str | list:
     query['skip'] = 0
 
     url = generate_obis_url('taxon/search/common', query)
-    response = requests.get(url)
-
-    response_json = response.json()
-
-    results = response_json.get("results", [])
+    results = await fetchResults(url)
 
     print(results)
 
@@ -383,24 +419,28 @@ async def getScientificName(commonname: str) -> str | list:
 
     return url, None
 
+@resolver_cache.memoize("scientificname")
 async def getTaxonIdFromScientificName(scientificname: str) -> list:
+    store = taxon_store.get_store()
+    if store is not None and (known := store.lookup("scientific", scientificname)):
+        return [[aphiaid, name] for aphiaid, name, _ in known]
+
     query = {}
     query['q'] = scientificname
     query['size'] = 10
     query['skip'] = 0
 
     url = generate_obis_url('taxon/search', query)
-    response = requests.get(url)
-
-    response_json = response.json()
-
-    results = response_json.get("results", [])
+    results = await fetchResults(url)
 
     if len(results) > 0:
+        if store is not None:
+            await store.add("scientific", scientificname, [(x.get('taxonID'), x.get('scientificName'), x.get('commonName')) for x in results])
         return [[x.get('taxonID', ''), x.get('scientificName', '')] for x in results]
 
     return []
 
+@resolver_cache.memoize("commonname", cache_if=lambda answer: bool(answer[1]))
 async def resolveCommonName(commonname: str) -> str | list:
     query = {}
     query['q'] = commonname
@@ -408,11 +448,13 @@ async def resolveCommonName(commonname: str) -> str | list:
     query['skip'] = 0
 
     url = generate_obis_url('taxon/search/common', query)
-    response = requests.get(url)
 
-    response_json = response.json()
+    # most species names repeat; answer known ones without a round trip
+    store = taxon_store.get_store()
+    if store is not None and (known := store.lookup("common", commonname)):
+        return url, [[vernacular, aphiaid, name] for aphiaid, name, vernacular in known]
 
-    results = response_json.get("results", [])
+    results = await fetchResults(url)
 
     # print(results, url)
 
@@ -421,7 +463,9 @@ async def resolveCommonName(commonname: str) -> str | list:
         for x in results:
             if x.get('taxonID', '') != '':
                 ret.append([x.get('commonName', ''), x.get('taxonID', ''), x.get('scientificName', '')])
-            
+
+        if store is not None:
+            await store.add("common", commonname, [(row[1], row[2], row[0]) for row in ret])
         return url, ret
 
     return url, None
@@ -556,3 +600,71 @@ async def resolveParams(params: dict, parameter: str, resolveToParam: str, proce
             
     except ValueError as e:
         await exceptionHandler(process, e, "OBIS agent encountered an error with parameter resolution")
+
+
+# name params and the id params they resolve to, in merge order. when both institute and area
+# are present institute gets higher priority: the area is folded into the institute lookup and
+# is not resolved on its own.
+RESOLUTION_ORDER = [
+    ("institute", "instituteid"),
+    ("area", "areaid"),
+    ("datasetname", "datasetid"),
+    ("commonname", "taxonid"),
+]
+
+# background lookups started by prefetchParam, referenced here so they are not garbage collected
+_prefetches: set[asyncio.Task] = set()
+
+def prefetchParam(parameter: str, value):
+    """
+    Starts resolving a name param in the background, as soon as the LLM has streamed it.
+    resolveAllParams later finds the answer in the resolver cache, or joins the OBIS request
+    still in flight. Institutes are matched locally and not worth starting early.
+    """
+    match parameter:
+        case "area":
+            lookup = getAreaId(value)
+        case "datasetname":
+            lookup = getDatasetId(value)
+        case "commonname":
+            lookup = resolveCommonName(value)
+        case _:
+            return
+
+    task = asyncio.ensure_future(lookup)
+    _prefetches.add(task)
+    task.add_done_callback(_prefetches.discard)
+
+async def resolveAllParams(params: dict, process, parameters: list[str] | None = None) -> bool:
+    """
+    Runs resolveParams for every name param present in `params` (limited to `parameters` if
+    given) concurrently. Each resolution works on its own copy of params; the rewrites are
+    merged back in RESOLUTION_ORDER once all of them finished. Returns False without touching
+    `params` if any resolution failed.
+    """
+    resolutions = [
+        (parameter, resolveToParam) for parameter, resolveToParam in RESOLUTION_ORDER
+        if parameter in params and (parameters is None or parameter in parameters)
+    ]
+    if any(parameter == "institute" for parameter, _ in resolutions):
+        resolutions = [r for r in resolutions if r[0] != "area"]
+
+    async def resolve(parameter, resolveToParam):
+        resolved = dict(params)
+        ok = await resolveParams(resolved, parameter, resolveToParam, process)
+        return ok, resolved
+
+    outcomes = await asyncio.gather(*[resolve(p, r) for p, r in resolutions])
+
+    if not all(ok for ok, _ in outcomes):
+        return False
+
+    original = dict(params)
+    for _, resolved in outcomes:
+        for key in original.keys() - resolved.keys():
+            params.pop(key, None)
+        for key, value in resolved.items():
+            if key not in original or original[key] != value:
+                params[key] = value
+
+    return True
@@ -3,6 +3,7 @@ from unittest.mock import patch, AsyncMock, MagicMock
 from instructor.core import InstructorRetryException
 from ichatbio.agent_response import ResponseContext, IChatBioAgentProcess
 from entrypoints import dataset
+from utils import resilience
 
 
 @pytest.mark.asyncio
@@ -18,7 +19,7 @@ async def test_run_dataset_basic_success():
     }
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = {
         "total": 10,
@@ -27,7 +28,7 @@ async def test_run_dataset_basic_success():
 
     with patch("entrypoints.dataset.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
          patch("entrypoints.dataset.utils.getAreaId", AsyncMock(return_value=[None,[{"id": "A1"}]])), \
-         patch("entrypoints.dataset.requests.get", return_value=mock_response):
+         patch("entrypoints.dataset.obis_client.get", AsyncMock(return_value=mock_response)):
         
         await dataset.run("Find datasets of brachyura in Atlantic Ocean", mock_context)
 
@@ -53,13 +54,13 @@ async def test_run_dataset_institute_priority():
 
     mock_institutes = [{"id": "inst1", "name": "Smithsonian", "score": 1.0}]
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = {"total": 5, "results": [{"id": 1}]}
 
     with patch("entrypoints.dataset.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
          patch("entrypoints.dataset.utils.getInstituteId", AsyncMock(return_value=mock_institutes)), \
-         patch("entrypoints.dataset.requests.get", return_value=mock_response):
+         patch("entrypoints.dataset.obis_client.get", AsyncMock(return_value=mock_response)):
 
         await dataset.run("Get datasets of brachyura from Smithsonian", mock_context)
 
@@ -102,12 +103,12 @@ async def test_run_dataset_institute_low_confidence():
         {"id": "instA", "name": "Institute A", "score": 0.75},
         {"id": "instB", "name": "Institute B", "score": 0.7},
     ]
-    mock_response = MagicMock(ok=True, status_code=200)
+    mock_response = MagicMock(is_success=True, status_code=200)
     mock_response.json.return_value = {"total": 2, "results": [{"id": 1}, {"id": 2}]}
 
     with patch("entrypoints.dataset.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
          patch("entrypoints.dataset.utils.getInstituteId", AsyncMock(return_value=mock_institutes)), \
-         patch("entrypoints.dataset.requests.get", return_value=mock_response):
+         patch("entrypoints.dataset.obis_client.get", AsyncMock(return_value=mock_response)):
 
         await dataset.run("Get datasets from an unknown institute", mock_context)
         
@@ -125,10 +126,10 @@ async def test_dataset_non_ok_response():
     mock_context.begin_process.return_value.__aenter__.return_value = mock_process
 
     llm_response = {"params": {"species": "brachyura"}, "clarification_needed": False}
-    mock_response = MagicMock(ok=False, status_code=500)
+    mock_response = MagicMock(is_success=False, status_code=500)
 
     with patch("entrypoints.dataset.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
-         patch("entrypoints.dataset.requests.get", return_value=mock_response):
+         patch("entrypoints.dataset.obis_client.get", AsyncMock(return_value=mock_response)):
         await dataset.run("Find datasets for brachyura", mock_context)
 
     mock_process.log.assert_any_call("Response code: 500 Internal Server Error - something went wrong!")
@@ -142,11 +143,11 @@ async def test_dataset_invalid_json():
     mock_context.begin_process.return_value.__aenter__.return_value = mock_process
 
     llm_response = {"params": {"species": "brachyura"}, "clarification_needed": False}
-    mock_response = MagicMock(ok=True, status_code=200)
+    mock_response = MagicMock(is_success=True, status_code=200)
     mock_response.json.side_effect = ValueError("Invalid JSON")
 
     with patch("entrypoints.dataset.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
-         patch("entrypoints.dataset.requests.get", return_value=mock_response), \
+         patch("entrypoints.dataset.obis_client.get", AsyncMock(return_value=mock_response)), \
          patch("entrypoints.dataset.utils.exceptionHandler", AsyncMock()) as mock_exception:
         await dataset.run("Find datasets of brachyura", mock_context)
 
@@ -161,7 +162,7 @@ async def test_instructor_retry_exception():
     mock_context.begin_process.return_value.__aenter__.return_value = mock_process
 
     with patch("entrypoints.dataset.search._generate_search_parameters", AsyncMock(return_value={"params": {}, "clarification_needed": False})), \
-         patch("entrypoints.dataset.requests.get", side_effect=InstructorRetryException(messages=["retry"], n_attempts=1, total_usage={})):
+         patch("entrypoints.dataset.obis_client.get", AsyncMock(side_effect=InstructorRetryException(messages=["retry"], n_attempts=1, total_usage={}))):
         await dataset.run("Retry test", mock_context)
         mock_process.log.assert_any_call("Sorry, I couldn't find any species datasets.")
 
@@ -210,13 +211,29 @@ async def test_dataset_multiple_area_matches():
 
     llm_response = {"params": {"species": "brachyura", "area": "Atlantic"}, "clarification_needed": False}
     mock_areas = (None, [{"id": "A1"}, {"id": "A2"}])
-    mock_response = MagicMock(ok=True, status_code=200)
+    mock_response = MagicMock(is_success=True, status_code=200)
     mock_response.json.return_value = {"total": 2, "results": [{"id": 1}]}
 
     with patch("entrypoints.dataset.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
          patch("entrypoints.dataset.utils.getAreaId", AsyncMock(return_value=mock_areas)), \
-         patch("entrypoints.dataset.requests.get", return_value=mock_response):
+         patch("entrypoints.dataset.obis_client.get", AsyncMock(return_value=mock_response)):
 
         await dataset.run("Find brachyura datasets in Atlantic", mock_context)
 
-    mock_process.log.assert_any_call("Multiple area matches found")
\ No newline at end of file
+    mock_process.log.assert_any_call("Multiple area matches found")
+
+@pytest.mark.asyncio
+async def test_dataset_open_circuit_breaker():
+    """A tripped circuit breaker is logged instead of escaping run()."""
+    mock_context = AsyncMock(spec=ResponseContext)
+    mock_process = AsyncMock(spec=IChatBioAgentProcess)
+    mock_context.begin_process.return_value.__aenter__.return_value = mock_process
+
+    llm_response = {"params": {"species": "brachyura"}, "clarification_needed": False}
+
+    with patch("entrypoints.dataset.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
+         patch("entrypoints.dataset.obis_client.get", AsyncMock(side_effect=resilience.CircuitOpen("breaker open"))):
+        await dataset.run("Find datasets for brachyura", mock_context)
+
+    mock_process.log.assert_any_call("Failed to connect to OBIS API: breaker open")
+    mock_process.create_artifact.assert_not_awaited()
@@ -0,0 +1,113 @@
+import threading
+
+import numpy as np
+import pytest
+from unittest.mock import patch
+
+from utils import embedding_index
+from utils import utils
+
+VOCABULARY = ["gulf", "maine", "mexico", "reef", "barrier", "great", "coral", "sea", "north"]
+# words that mean the same to the fake model
+SYNONYMS = {"corals": "coral", "gbr": "reef"}
+
+AREAS = [
+    {"id": 1, "name": "Gulf of Maine"},
+    {"id": 2, "name": "Gulf of Mexico"},
+    {"id": 3, "name": "Great Barrier Reef"},
+    {"id": None, "name": "unnamed"},
+]
+
+
+def encoder(texts):
+    """Bag of words over VOCABULARY, standing in for the sentence-transformers model."""
+    vectors = np.zeros((len(texts), len(VOCABULARY)), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            word = SYNONYMS.get(word, word)
+            if word in VOCABULARY:
+                vectors[row, VOCABULARY.index(word)] = 1
+    return vectors
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    with patch.dict("os.environ", {"OBIS_EMBEDDING_INDEX_PATH": str(tmp_path)}):
+        yield tmp_path
+
+
+@pytest.mark.parametrize("dtype, stored", [("int8", np.int8), ("float16", np.float16)])
+def test_build_writes_a_quantized_matrix_and_sidecar(tmp_path, dtype, stored):
+    embedding_index.build("area", AREAS, tmp_path, encoder, "fake-model", dtype)
+
+    index = embedding_index.EmbeddingIndex.load(tmp_path, "area")
+
+    assert isinstance(index.matrix, np.memmap)
+    assert index.matrix.dtype == stored
+    assert index.matrix.shape == (3, len(VOCABULARY))
+    assert index.ids == [1, 2, 3]
+    assert index.model == "fake-model"
+
+    matches = index.search(encoder(["gbr"])[0])
+    assert matches[0]["id"] == 3
+    assert matches[0]["score"] == pytest.approx(1 / np.sqrt(3), abs=0.01)
+
+
+def test_scores_are_computed_in_chunks(tmp_path):
+    entries = [{"id": i, "name": "Gulf of Maine" if i == 20000 else "North Sea"} for i in range(20001)]
+    embedding_index.build("area", entries, tmp_path, encoder, "fake-model")
+
+    index = embedding_index.EmbeddingIndex.load(tmp_path, "area")
+
+    assert index.search(encoder(["gulf maine"])[0], best_n=1) == [{"id": 20000, "name": "Gulf of Maine", "score": pytest.approx(1.0, abs=0.01)}]
+
+
+@pytest.mark.asyncio
+async def test_search_without_an_index_returns_none(index_dir):
+    assert await embedding_index.search("area", "Gulf of Maine", encoder=encoder) is None
+
+
+@pytest.mark.asyncio
+async def test_search_without_sentence_transformers_returns_none(index_dir):
+    embedding_index.build("area", AREAS, index_dir, encoder, "fake-model")
+
+    with patch("utils.embedding_index.available", return_value=False):
+        assert await embedding_index.search("area", "Gulf of Maine") is None
+
+
+@pytest.mark.asyncio
+async def test_model_is_loaded_off_the_event_loop(index_dir):
+    embedding_index.build("area", AREAS, index_dir, encoder, "fake-model")
+    loaded_in = []
+
+    def load(model_name):
+        loaded_in.append(threading.current_thread())
+        return encoder
+
+    with patch("utils.embedding_index.available", return_value=True), \
+         patch("utils.embedding_index.sentence_encoder", side_effect=load):
+        matches = await embedding_index.search("area", "Gulf of Maine")
+
+    assert matches[0]["id"] == 1
+    assert loaded_in and loaded_in[0] is not threading.main_thread()
+
+
+@pytest.mark.asyncio
+async def test_search_applies_the_minimum_score(index_dir):
+    embedding_index.build("area", AREAS, index_dir, encoder, "fake-model")
+
+    assert (await embedding_index.search("area", "maine", encoder=encoder))[0]["id"] == 1
+    assert await embedding_index.search("area", "north sea", encoder=encoder) == []
+
+
+@pytest.mark.asyncio
+async def test_institutes_fall_back_to_semantic_matches(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "institutes.json").write_text('[{"id": 7, "name": "Coral Reef Research Foundation", "country": null}]')
+    semantic = [{"id": 7, "name": "Coral Reef Research Foundation", "score": 0.8}]
+
+    with patch("utils.utils.embedding_index.search", return_value=semantic) as search:
+        matches = await utils.getInstituteId({"institute": "corals lab"})
+
+    search.assert_awaited_once_with("institute", "corals lab")
+    assert matches == semantic
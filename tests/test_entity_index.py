@@ -0,0 +1,74 @@
+import json
+import pytest
+
+from utils import entity_index
+from utils import utils
+
+INSTITUTES = [
+    {"id": 1, "name": "Marine Institute Ireland", "country": "Ireland"},
+    {"id": 2, "name": "Flanders Marine Institute Belgium", "country": "Belgium"},
+    {"id": 3, "name": "Smithsonian Institution United States", "country": "United States"},
+    {"id": 4, "name": "National Oceanic and Atmospheric Administration (NOAA)", "country": "United States"},
+    {"id": 5, "name": "Australian Institute of Marine Science", "country": "Australia"},
+]
+
+
+def test_scores_are_the_share_of_query_tokens_found():
+    index = entity_index.TokenIndex(INSTITUTES)
+
+    matches = index.search("Smithsonian Institution")
+
+    assert matches[0] == {"id": 3, "name": "Smithsonian Institution United States", "score": 1.0}
+
+
+def test_matching_ignores_case_punctuation_and_counts_the_country():
+    index = entity_index.TokenIndex(INSTITUTES)
+
+    assert index.search("noaa")[0]["id"] == 4
+    assert index.search("NOAA United States")[0]["id"] == 4
+
+
+def test_ties_prefer_the_rarer_tokens():
+    index = entity_index.TokenIndex(INSTITUTES)
+
+    matches = index.search("Marine Institute Ireland")
+
+    assert [match["id"] for match in matches][:2] == [1, 2]
+    assert matches[0]["score"] == 1.0
+
+
+def test_no_match_above_the_threshold():
+    index = entity_index.TokenIndex(INSTITUTES)
+
+    assert index.search("University of Tokyo") == []
+    assert index.search("") == []
+
+
+def test_only_entries_with_rare_tokens_are_candidates():
+    index = entity_index.TokenIndex(INSTITUTES)
+
+    # "marine" and "institute" alone cannot reach 3 of 4 tokens, so only the postings of "flanders" and "belgium" are read
+    tokens = entity_index.tokenize("Flanders Marine Institute Belgium")
+    assert index.candidates(tokens, needed=3) == {1}
+
+
+@pytest.mark.asyncio
+async def test_best_match_and_score_agree_with_hybrid_match():
+    index = entity_index.TokenIndex(INSTITUTES)
+
+    for query in ["Smithsonian Institution", "Australian Institute of Marine Science", "Marine Institute Belgium"]:
+        expected = await utils.hybrid_match(query={"name": query}, query_options=INSTITUTES)
+        found = index.search(query)
+        assert found[0]["id"] == expected[0]["id"]
+        assert found[0]["score"] == expected[0]["score"]
+
+
+@pytest.mark.asyncio
+async def test_get_institute_id_uses_the_index_of_the_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "institutes.json").write_text(json.dumps(INSTITUTES))
+
+    matches = await utils.getInstituteId({"institute": "Smithsonian", "area": "United States"})
+
+    assert matches[0]["id"] == 3
+    assert entity_index.load.cache_info().currsize >= 1
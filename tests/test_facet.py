@@ -19,7 +19,7 @@ async def test_run_facet_basic_success():
     }
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = {
         "total": 100,
@@ -32,8 +32,8 @@ async def test_run_facet_basic_success():
                AsyncMock(return_value=mock_llm_response)), \
          patch("entrypoints.facet.utils.generate_obis_url",
                return_value="https://fake-obis.org/facet"), \
-         patch("entrypoints.facet.requests.get",
-               return_value=mock_response):
+         patch("entrypoints.facet.obis_client.get",
+               AsyncMock(return_value=mock_response)):
 
         await facet.run("Facet datasets for Egregia menziesii", mock_context)
 
@@ -60,7 +60,7 @@ async def test_run_facet_institute_resolution():
     mock_institutes = [{"id": "123", "name": "CSIRO", "score": 1.0}]
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = {"total": 5, "results": {"datasetid": []}}
 
@@ -70,8 +70,8 @@ async def test_run_facet_institute_resolution():
                AsyncMock(return_value=mock_institutes)), \
          patch("entrypoints.facet.utils.generate_obis_url",
                return_value="fake-url?instituteid=123"), \
-         patch("entrypoints.facet.requests.get",
-               return_value=mock_response):
+         patch("entrypoints.facet.obis_client.get",
+               AsyncMock(return_value=mock_response)):
 
         await facet.run("Facet by institute CSIRO", mock_context)
 
@@ -178,15 +178,15 @@ async def test_run_facet_http_error():
     }
 
     mock_response = MagicMock()
-    mock_response.ok = False
+    mock_response.is_success = False
     mock_response.status_code = 500
 
     with patch("entrypoints.facet.search._generate_search_parameters",
                AsyncMock(return_value=mock_llm_response)), \
          patch("entrypoints.facet.utils.generate_obis_url",
                return_value="fake-url"), \
-         patch("entrypoints.facet.requests.get",
-               return_value=mock_response):
+         patch("entrypoints.facet.obis_client.get",
+               AsyncMock(return_value=mock_response)):
 
         await facet.run("Facet test HTTP error", mock_context)
 
@@ -229,12 +229,12 @@ async def test_run_facet_instructor_retry_exception():
                AsyncMock(return_value=mock_llm_response)), \
          patch("entrypoints.facet.utils.generate_obis_url",
                return_value="fake-url"), \
-         patch("entrypoints.facet.requests.get",
-               side_effect=InstructorRetryException(
+         patch("entrypoints.facet.obis_client.get",
+               AsyncMock(side_effect=InstructorRetryException(
                    messages=["retry"],
                    n_attempts=1,
                    total_usage={"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
-               )):
+               ))):
 
         await facet.run("Facet retry test", mock_context)
 
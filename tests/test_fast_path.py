@@ -0,0 +1,90 @@
+import pytest
+from unittest.mock import patch
+
+from ichatbio.types import AgentEntrypoint
+from pydantic import BaseModel
+
+from utils import fast_path
+from utils import search_helper
+
+
+@pytest.mark.parametrize("request_text, params", [
+    ("Get 20 records of Egregia menziesii from California after 2010",
+     {"scientificname": "Egregia menziesii", "area": "California", "startdate": "2011-01-01", "size": 20}),
+    ("Show records of Carcharodon carcharias",
+     {"scientificname": "Carcharodon carcharias"}),
+    ("records of Delphinus delphis from the North Sea between 2000 and 2010.",
+     {"scientificname": "Delphinus delphis", "area": "North Sea", "startdate": "2000-01-01", "enddate": "2010-12-31"}),
+    ("Get 20000 records of Delphinus delphis",
+     {"scientificname": "Delphinus delphis", "size": 10000}),
+    ("Get occurrence record with id 0000039C-74cd-4e37-9bf8-848d560bf519",
+     {"id": "0000039c-74cd-4e37-9bf8-848d560bf519"}),
+    ("occurrence with uuid 0000039c-74cd-4e37-9bf8-848d560bf519?",
+     {"id": "0000039c-74cd-4e37-9bf8-848d560bf519"}),
+])
+def test_simple_occurrence_requests_are_parsed(request_text, params):
+    generation = fast_path.parse(request_text, "get_occurrence")
+
+    assert generation["params"] == params
+    assert generation["clarification_needed"] is False
+
+
+@pytest.mark.parametrize("request_text", [
+    "records of great white shark",
+    "Get 10 records of Blue whale",
+    "Search for brachyura from Pacific",
+    "records of Carcharodon carcharias from CSIRO Australia",
+    "records of Carcharodon carcharias from Marine Institute",
+    "records of Carcharodon carcharias in the last year",
+    "How many crabs were recorded near Perth since the nineties?",
+    "Get occurrence record with id 0000039c-74cd-4e37-9bf8-848d560bf519 from australia from January 2020",
+    "Compare occurrence record with id 0000039c-74cd-4e37-9bf8-848d560bf519 with records of Egregia menziesii from Japan",
+    "Don't show the occurrence record with id 0000039c-74cd-4e37-9bf8-848d560bf519",
+])
+def test_anything_unusual_falls_back_to_the_llm(request_text):
+    assert fast_path.parse(request_text, "get_occurrence") is None
+
+
+def test_yearly_statistics_request_selects_the_years_extension():
+    generation = fast_path.parse("yearly statistics of Delphinus delphis in Australia", "statistics")
+
+    assert generation["params"] == {
+        "scientificname": "Delphinus delphis", "area": "Australia", "statistics_extensions": ["years"],
+    }
+
+
+@pytest.mark.parametrize("request_text, params", [
+    ("statistics of Delphinus delphis in Australia",
+     {"scientificname": "Delphinus delphis", "area": "Australia", "statistics_extensions": []}),
+    ("stats for Mola mola", {"scientificname": "Mola mola", "statistics_extensions": []}),
+    ("trends of Mola mola since 2000", {"scientificname": "Mola mola", "startdate": "2000-01-01", "statistics_extensions": []}),
+])
+def test_plain_statistics_requests_are_parsed(request_text, params):
+    assert fast_path.parse(request_text, "statistics")["params"] == params
+
+
+@pytest.mark.parametrize("request_text, entrypoint_id", [
+    ("records of Delphinus delphis between 2010 and 2000", "get_occurrence"),
+    ("statistics of Delphinus delphis between 2010 and 2000", "statistics"),
+    ("Get 0 records of Delphinus delphis", "get_occurrence"),
+])
+def test_suspicious_values_fall_back_to_the_llm(request_text, entrypoint_id):
+    assert fast_path.parse(request_text, entrypoint_id) is None
+
+
+def test_other_entrypoints_are_not_parsed():
+    assert fast_path.parse("Show records of Carcharodon carcharias", "facet") is None
+
+
+@pytest.mark.asyncio
+async def test_parsed_requests_skip_the_llm():
+    class Params(BaseModel):
+        scientificname: str | None = None
+
+    entrypoint = AgentEntrypoint(id="get_occurrence", description="", parameters=None)
+
+    with patch("utils.search_helper.llm_client.get_client") as get_client:
+        generation = await search_helper._generate_search_parameters("Show records of Egregia menziesii", entrypoint, Params)
+
+    get_client.assert_not_called()
+    assert generation["params"] == {"scientificname": "Egregia menziesii"}
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from rapidfuzz import fuzz
+
+from utils import fuzzy
+from utils import utils
+
+AREAS = [
+    {"id": 1, "name": "North Sea"},
+    {"id": 2, "name": "Gulf of Maine (US)"},
+    {"id": 3, "name": "Gulf of Mexico"},
+    {"id": 4, "name": "Great Barrier Reef"},
+]
+
+
+def test_names_are_normalised_before_scoring():
+    matcher = fuzzy.FuzzyMatcher(["GULF OF MAINE!", "North Sea"])
+
+    scores = matcher.scores("gulf of maine")
+
+    assert scores[0] == pytest.approx(1.0)
+    assert scores[1] < 0.5
+
+
+def test_default_score_is_the_share_of_query_words_found():
+    matcher = fuzzy.FuzzyMatcher(["Flanders Marine Institute Belgium", "Marine Institute Ireland", "Smithsonian Institution", None])
+
+    assert matcher.scores("Marine Institute Belgium").tolist() == pytest.approx([1.0, 2 / 3, 0.0, 0.0])
+    assert matcher.scores("smithsonian institution").tolist() == pytest.approx([0.0, 0.0, 1.0, 0.0])
+    assert matcher.scores("marine marine sea").tolist() == pytest.approx([2 / 3, 2 / 3, 0.0, 0.0])
+    assert fuzzy.token_overlap("Marine Institute Belgium", "Marine Institute Ireland") == pytest.approx(200 / 3)
+    assert matcher.scores("").tolist() == [0.0, 0.0, 0.0, 0.0]
+
+
+def test_scorers_are_blended_by_weight():
+    names = ["Gulf of Maine (US)"]
+    set_score = fuzzy.FuzzyMatcher(names, [(fuzz.token_set_ratio, 1.0)]).scores("gulf of maine")[0]
+    ratio_score = fuzzy.FuzzyMatcher(names, [(fuzz.ratio, 1.0)]).scores("gulf of maine")[0]
+
+    blended = fuzzy.FuzzyMatcher(names, [(fuzz.token_set_ratio, 3.0), (fuzz.ratio, 1.0)]).scores("gulf of maine")[0]
+
+    assert blended == pytest.approx(0.75 * set_score + 0.25 * ratio_score)
+
+
+def test_top_k_is_best_first_with_ties_in_list_order():
+    scores = np.array([0.2, 0.9, 0.5, 0.9, 0.1])
+
+    assert fuzzy.top_k(scores, 3).tolist() == [1, 3, 2]
+    assert fuzzy.top_k(scores, 10).tolist() == [1, 3, 2, 0, 4]
+    assert fuzzy.top_k(scores, 0).tolist() == []
+
+
+def test_matchers_are_reused_for_the_same_names():
+    names = tuple(area["name"] for area in AREAS)
+
+    assert fuzzy.matcher_for(names) is fuzzy.matcher_for(names)
+
+
+@pytest.mark.asyncio
+async def test_hybrid_match_keeps_best_n_and_threshold():
+    matches = await utils.hybrid_match(query={"name": "Gulf of Maine"}, query_options=AREAS, best_n=2)
+
+    assert [match["id"] for match in matches] == [2, 3]
+    assert matches[0]["score"] == pytest.approx(1.0)
+
+    assert await utils.hybrid_match(query={"name": "Bay of Biscay"}, query_options=AREAS) == []
+    assert await utils.hybrid_match(query={"name": "Gulf of Maine"}, query_options=[]) == []
+
+
+@pytest.mark.asyncio
+async def test_hybrid_match_blends_semantic_scores_by_weights():
+    semantic = np.array([0.0, 0.0, 0.0, 1.0])
+
+    matches = await utils.hybrid_match(query={"name": "GBR"}, query_options=AREAS, weights=[0.9, 0.1], semantic_scores=semantic)
+
+    assert matches[0]["id"] == 4
+    assert matches[0]["score"] >= 0.9
+
+
+def test_large_catalogue_is_scored_in_one_batch():
+    names = tuple(f"Dataset {i} of marine observations" for i in range(50000))
+    matcher = fuzzy.matcher_for(names)
+
+    scores = matcher.scores("Dataset 49999 of marine observations")
+
+    assert scores.shape == (50000,)
+    assert fuzzy.top_k(scores, 1).tolist() == [49999]
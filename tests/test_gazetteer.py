@@ -0,0 +1,117 @@
+import json
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from utils import gazetteer
+from utils import resolver_cache
+from utils import utils
+
+AREAS = [
+    {"id": "1", "name": "Great Barrier Reef Marine Park", "type": "marineregion"},
+    {"id": "2", "name": "Gulf of Maine", "type": "marineregion"},
+    {"id": "3", "name": "Gulf of Mexico", "type": "marineregion"},
+    {"id": "4", "name": "North Sea", "type": "marineregion"},
+    {"id": "5", "name": "Persian Gulf", "type": "marineregion"},
+    {"id": None, "name": "Unnamed", "type": "marineregion"},
+]
+
+ALIASES = {
+    "GBR": ["Great Barrier Reef", "Great Barrier Reef Marine Park"],
+    "Arabian Gulf": ["Persian Gulf"],
+    "Gulf of Maine": ["Gulf of Maine and Bay of Fundy"],
+    "Sea of Japan": ["Japan Sea"],
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_resolver_cache():
+    resolver_cache.clear()
+    yield
+    resolver_cache.clear()
+
+
+def test_normalize():
+    assert gazetteer.normalize("  The Gulf of Maine! ") == "gulf of maine"
+    assert gazetteer.normalize("Turks & Caicos") == "turks and caicos"
+
+
+def test_trie_exact_and_completions():
+    trie = gazetteer.Trie()
+    trie.insert("gulf of maine", 2)
+    trie.insert("gulf of mexico", 3)
+
+    assert trie.exact("gulf of maine") == [2]
+    assert trie.exact("gulf of") == []
+    assert sorted(key for key, _ in trie.completions("gulf of m", limit=10)) == ["gulf of maine", "gulf of mexico"]
+    assert trie.completions("baltic", limit=10) == []
+
+
+def test_exact_names_and_aliases_are_hits():
+    areas = gazetteer.Gazetteer(AREAS, ALIASES)
+
+    assert areas.lookup("gulf of maine") == [{"name": "Gulf of Maine", "id": "2"}]
+    assert areas.lookup("GBR") == [{"name": "Great Barrier Reef Marine Park", "id": "1"}]
+    assert areas.lookup("the Arabian Gulf") == [{"name": "Persian Gulf", "id": "5"}]
+
+
+def test_a_unique_prefix_on_a_word_boundary_is_a_hit():
+    areas = gazetteer.Gazetteer(AREAS, ALIASES)
+
+    assert areas.lookup("Great Barrier Reef") == [{"name": "Great Barrier Reef Marine Park", "id": "1"}]
+    assert areas.lookup("North") == [{"name": "North Sea", "id": "4"}]
+    # not on a word boundary
+    assert areas.lookup("Great Barr") is None
+
+
+def test_ambiguous_and_unknown_names_are_misses():
+    areas = gazetteer.Gazetteer(AREAS, ALIASES)
+
+    assert areas.lookup("Gulf of") is None
+    assert areas.lookup("Baltic Sea") is None
+    # the alias target is not in the listing
+    assert areas.lookup("Sea of Japan") is None
+    assert areas.lookup("") is None
+
+
+def test_shipped_aliases_load():
+    aliases = gazetteer.load_aliases()
+
+    assert aliases["GBR"][0] == "Great Barrier Reef"
+    assert all(isinstance(targets, list) and targets for targets in aliases.values())
+
+
+@pytest.mark.asyncio
+async def test_get_area_id_answers_hits_without_the_network(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "areas.json").write_text(json.dumps(AREAS))
+
+    with patch("utils.utils.fetchResults", AsyncMock()) as fetch:
+        url, matches = await utils.getAreaId("Gulf of Maine")
+
+    fetch.assert_not_called()
+    assert url is None
+    assert matches == [{"name": "Gulf of Maine", "id": "2"}]
+
+
+@pytest.mark.asyncio
+async def test_get_area_id_searches_on_a_miss(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "areas.json").write_text(json.dumps(AREAS))
+
+    with patch("utils.utils.fetchResults", AsyncMock(return_value=[{"id": "9", "name": "Baltic Sea"}])) as fetch:
+        url, matches = await utils.getAreaId("Baltic Sea")
+
+    fetch.assert_awaited_once()
+    assert url is not None
+    assert matches == [{"name": "Baltic Sea", "id": "9"}]
+
+
+@pytest.mark.asyncio
+async def test_get_area_id_without_a_listing_uses_the_network(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    with patch("utils.utils.fetchResults", AsyncMock(return_value=[{"id": "2", "name": "Gulf of Maine"}])) as fetch:
+        url, matches = await utils.getAreaId("Gulf of Maine")
+
+    fetch.assert_awaited_once()
+    assert matches == [{"name": "Gulf of Maine", "id": "2"}]
@@ -18,7 +18,7 @@ async def test_run_occurrence_basic_success():
     }
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = {
         "total": 10,
@@ -27,7 +27,7 @@ async def test_run_occurrence_basic_success():
 
     with patch("entrypoints.get_occurrence.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
          patch("entrypoints.get_occurrence.utils.getAreaId", AsyncMock(return_value=(None,[{"id": "123"}]))), \
-         patch("entrypoints.get_occurrence.requests.get", return_value=mock_response):
+         patch("entrypoints.get_occurrence.obis_client.get", AsyncMock(return_value=mock_response)):
         
         await get_occurrence.run("Find occurrences of brachyura", mock_context)
 
@@ -52,7 +52,7 @@ async def test_run_occurrence_institute_priority():
     }
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = {"total": 5, "results": [{"id": 1}]}
 
@@ -60,7 +60,7 @@ async def test_run_occurrence_institute_priority():
 
     with patch("entrypoints.get_occurrence.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
          patch("entrypoints.get_occurrence.utils.getInstituteId", AsyncMock(return_value=mock_institutes)), \
-         patch("entrypoints.get_occurrence.requests.get", return_value=mock_response):
+         patch("entrypoints.get_occurrence.obis_client.get", AsyncMock(return_value=mock_response)):
         
         await get_occurrence.run("Records of brachyura at Smithsonian", mock_context)
 
@@ -126,13 +126,13 @@ async def test_run_occurrence_institute_low_score_multiple():
     ]
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = {"total": 2, "results": [{"id": 1}, {"id": 2}]}
 
     with patch("entrypoints.get_occurrence.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
          patch("entrypoints.get_occurrence.utils.getInstituteId", AsyncMock(return_value=mock_institutes)), \
-         patch("entrypoints.get_occurrence.requests.get", return_value=mock_response):
+         patch("entrypoints.get_occurrence.obis_client.get", AsyncMock(return_value=mock_response)):
         
         await get_occurrence.run("Records for an unknown institute", mock_context)
 
@@ -158,12 +158,12 @@ async def test_run_occurrence_non_ok_response():
     }
 
     mock_response = MagicMock()
-    mock_response.ok = False
+    mock_response.is_success = False
     mock_response.status_code = 500
 
     with patch("entrypoints.get_occurrence.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
          patch("entrypoints.get_occurrence.utils.getAreaId", AsyncMock(return_value=(None,[{"id": "999"}]))), \
-         patch("entrypoints.get_occurrence.requests.get", return_value=mock_response):
+         patch("entrypoints.get_occurrence.obis_client.get", AsyncMock(return_value=mock_response)):
 
         await get_occurrence.run("Find occurrences of brachyura", mock_context)
         mock_process.log.assert_any_call("OBIS returned error 500 - something went wrong!")
@@ -189,13 +189,13 @@ async def test_multiple_area_matches():
     ]
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = {"total": 10, "results": [{"id": i} for i in range(3)]}
 
     with patch("entrypoints.get_occurrence.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
          patch("entrypoints.get_occurrence.utils.getAreaId", AsyncMock(return_value=(None,mock_areas))), \
-         patch("entrypoints.get_occurrence.requests.get", return_value=mock_response):
+         patch("entrypoints.get_occurrence.obis_client.get", AsyncMock(return_value=mock_response)):
 
         await get_occurrence.run("Find brachyura in ocean", mock_context)
         mock_process.log.assert_any_call("Multiple area matches found")
@@ -215,12 +215,12 @@ async def test_no_results_from_obis():
     }
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = {"total": 0, "results": []}
 
     with patch("entrypoints.get_occurrence.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
-         patch("entrypoints.get_occurrence.requests.get", return_value=mock_response):
+         patch("entrypoints.get_occurrence.obis_client.get", AsyncMock(return_value=mock_response)):
 
         await get_occurrence.run("Find nonexistent records", mock_context)
         mock_process.log.assert_any_call("Querying OBIS")
@@ -244,9 +244,9 @@ async def test_instructor_retry_exception():
     }
 
     with patch("entrypoints.get_occurrence.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
-         patch("entrypoints.get_occurrence.requests.get", 
-               side_effect=InstructorRetryException(messages=["retry"], n_attempts=1,
-                                                    total_usage={"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0})):
+         patch("entrypoints.get_occurrence.obis_client.get", 
+               AsyncMock(side_effect=InstructorRetryException(messages=["retry"], n_attempts=1,
+                                                    total_usage={"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}))):
         await get_occurrence.run("Find brachyura", mock_context)
         mock_process.log.assert_any_call("Sorry, information retrival failed.")
 
@@ -286,7 +286,7 @@ async def test_unresolved_institute_bypass():
 
     with patch("entrypoints.get_occurrence.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
          patch("entrypoints.get_occurrence.utils.getInstituteId", AsyncMock(return_value=[{"id": "123", "score": 1.0}])), \
-         patch("entrypoints.get_occurrence.requests.get", return_value=MagicMock(ok=True, status_code=200, json=lambda: {"total": 1, "results": [{"id": 1}]})):
+         patch("entrypoints.get_occurrence.obis_client.get", AsyncMock(return_value=MagicMock(is_success=True, status_code=200, json=lambda: {"total": 1, "results": [{"id": 1}]}))):
 
         await get_occurrence.run("Find records from institute", mock_context)
         mock_process.create_artifact.assert_awaited_once()
@@ -305,12 +305,12 @@ async def test_invalid_json_from_obis():
     }
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.side_effect = ValueError("Invalid JSON")
 
     with patch("entrypoints.get_occurrence.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
-         patch("entrypoints.get_occurrence.requests.get", return_value=mock_response), \
+         patch("entrypoints.get_occurrence.obis_client.get", AsyncMock(return_value=mock_response)), \
          patch("entrypoints.get_occurrence.utils.exceptionHandler", AsyncMock()):
 
         await get_occurrence.run("Find brachyura", mock_context)
@@ -350,12 +350,12 @@ async def test_invalid_json_from_obis():
 
     mock_llm_response = {"params": {"species": "brachyura"}, "clarification_needed": False}
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.side_effect = ValueError("Invalid JSON")
 
     with patch("entrypoints.get_occurrence.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
-         patch("entrypoints.get_occurrence.requests.get", return_value=mock_response), \
+         patch("entrypoints.get_occurrence.obis_client.get", AsyncMock(return_value=mock_response)), \
          patch("entrypoints.get_occurrence.utils.exceptionHandler", AsyncMock()) as mock_exception:
         await get_occurrence.run("Find brachyura", mock_context)
 
@@ -371,11 +371,11 @@ async def test_obis_api_error_response():
 
     mock_llm_response = {"params": {"species": "brachyura"}, "clarification_needed": False}
     mock_response = MagicMock()
-    mock_response.ok = False
+    mock_response.is_success = False
     mock_response.status_code = 500
 
     with patch("entrypoints.get_occurrence.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
-         patch("entrypoints.get_occurrence.requests.get", return_value=mock_response):
+         patch("entrypoints.get_occurrence.obis_client.get", AsyncMock(return_value=mock_response)):
         await get_occurrence.run("Find brachyura", mock_context)
 
     mock_process.log.assert_any_call("OBIS returned error 500 - something went wrong!")
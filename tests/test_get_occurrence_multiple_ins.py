@@ -0,0 +1,136 @@
+import asyncio
+import json
+import httpx
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from ichatbio.agent_response import ResponseContext, IChatBioAgentProcess
+from entrypoints import get_occurrence_multiple_ins
+
+
+def make_process():
+    mock_context = AsyncMock(spec=ResponseContext)
+    mock_process = AsyncMock(spec=IChatBioAgentProcess)
+    mock_context.begin_process.return_value.__aenter__.return_value = mock_process
+    return mock_context, mock_process
+
+
+@pytest.mark.asyncio
+async def test_multiple_institutes_fetched_concurrently_and_merged():
+    """Every matching institute is queried in parallel and merged into one artifact."""
+    mock_context, mock_process = make_process()
+
+    mock_llm_response = {
+        "params": {"scientificname": "brachyura", "institute": "Smithsonian"},
+        "clarification_needed": False
+    }
+    mock_institutes = [{"id": str(i), "name": f"Smithsonian {i}", "score": 1.0} for i in range(4)]
+
+    in_flight = 0
+    peak = 0
+
+    async def respond(url, timeout=None):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        response = MagicMock()
+        response.is_success = True
+        response.status_code = 200
+        response.json.return_value = {"total": 3, "results": [{"id": 1}, {"id": 2}]}
+        return response
+
+    with patch("entrypoints.get_occurrence_multiple_ins.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
+         patch("entrypoints.get_occurrence_multiple_ins.utils.getInstituteId", AsyncMock(return_value=mock_institutes)), \
+         patch("entrypoints.get_occurrence_multiple_ins.INSTITUTE_CONCURRENCY", 2), \
+         patch("entrypoints.get_occurrence_multiple_ins.obis_client.get", respond):
+
+        await get_occurrence_multiple_ins.run("Records of brachyura from Smithsonian", mock_context)
+
+    assert peak == 2
+    mock_process.create_artifact.assert_awaited_once()
+    kwargs = mock_process.create_artifact.call_args.kwargs
+    assert kwargs["metadata"]["retrieved_record_count"] == 8
+    assert kwargs["metadata"]["total_matching_count"] == 12
+    content = json.loads(kwargs["content"])
+    assert content["total"] == 12
+    assert sorted(content["records"]) == [str(i) for i in range(4)]
+    assert content["records"]["0"] == {"name": "Smithsonian 0", "records": [{"id": 1}, {"id": 2}]}
+
+
+@pytest.mark.asyncio
+async def test_failed_institute_does_not_discard_others():
+    """An institute that errors is reported and left out of the merged records."""
+    mock_context, mock_process = make_process()
+
+    mock_llm_response = {
+        "params": {"scientificname": "brachyura", "institute": "Smithsonian"},
+        "clarification_needed": False
+    }
+    mock_institutes = [{"id": "1", "name": "Smithsonian A", "score": 1.0}, {"id": "2", "name": "Smithsonian B", "score": 1.0}]
+
+    async def respond(url, timeout=None):
+        if "instituteid=2" in url:
+            raise httpx.ConnectError("connection refused")
+        response = MagicMock()
+        response.is_success = True
+        response.status_code = 200
+        response.json.return_value = {"total": 1, "results": [{"id": 1}]}
+        return response
+
+    with patch("entrypoints.get_occurrence_multiple_ins.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
+         patch("entrypoints.get_occurrence_multiple_ins.utils.getInstituteId", AsyncMock(return_value=mock_institutes)), \
+         patch("entrypoints.get_occurrence_multiple_ins.obis_client.get", respond):
+
+        await get_occurrence_multiple_ins.run("Records of brachyura from Smithsonian", mock_context)
+
+    kwargs = mock_process.create_artifact.call_args.kwargs
+    assert list(json.loads(kwargs["content"])["records"]) == ["1"]
+    assert "Smithsonian B" in kwargs["description"]
+
+
+@pytest.mark.asyncio
+async def test_institutes_with_the_same_name_are_kept_apart():
+    """Records are keyed by institute id, so namesakes do not overwrite each other."""
+    mock_context, mock_process = make_process()
+
+    mock_llm_response = {
+        "params": {"scientificname": "brachyura", "institute": "Marine Institute"},
+        "clarification_needed": False
+    }
+    mock_institutes = [{"id": "7", "name": "Marine Institute", "score": 1.0}, {"id": "8", "name": "Marine Institute", "score": 1.0}]
+
+    async def respond(url, timeout=None):
+        response = MagicMock()
+        response.is_success = True
+        response.status_code = 200
+        response.json.return_value = {"total": 1, "results": [{"id": url.split("instituteid=")[1].split("&")[0]}]}
+        return response
+
+    with patch("entrypoints.get_occurrence_multiple_ins.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
+         patch("entrypoints.get_occurrence_multiple_ins.utils.getInstituteId", AsyncMock(return_value=mock_institutes)), \
+         patch("entrypoints.get_occurrence_multiple_ins.obis_client.get", respond):
+
+        await get_occurrence_multiple_ins.run("Records of brachyura from Marine Institute", mock_context)
+
+    records = json.loads(mock_process.create_artifact.call_args.kwargs["content"])["records"]
+    assert records == {
+        "7": {"name": "Marine Institute", "records": [{"id": "7"}]},
+        "8": {"name": "Marine Institute", "records": [{"id": "8"}]},
+    }
+
+
+@pytest.mark.asyncio
+async def test_no_institute_in_request():
+    """The entrypoint needs an institute name to fan out over."""
+    mock_context, mock_process = make_process()
+
+    mock_llm_response = {"params": {"scientificname": "brachyura"}, "clarification_needed": False}
+
+    with patch("entrypoints.get_occurrence_multiple_ins.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
+         patch("entrypoints.get_occurrence_multiple_ins.utils.exceptionHandler", AsyncMock()) as mock_exception:
+
+        await get_occurrence_multiple_ins.run("Records of brachyura", mock_context)
+
+    mock_exception.assert_awaited_once()
+    mock_process.create_artifact.assert_not_awaited()
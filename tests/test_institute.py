@@ -3,6 +3,7 @@ from unittest.mock import patch, AsyncMock, MagicMock
 from ichatbio.agent_response import ResponseContext, IChatBioAgentProcess
 from instructor.core import InstructorRetryException
 from entrypoints import institute
+from utils import rate_limiter
 
 
 @pytest.mark.asyncio
@@ -18,7 +19,7 @@ async def test_institute_basic_success():
     }
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = {
         "total": 5,
@@ -27,7 +28,7 @@ async def test_institute_basic_success():
 
     with patch("entrypoints.institute.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
          patch("entrypoints.institute.utils.generate_obis_url", return_value="http://fake-url"), \
-         patch("entrypoints.institute.requests.get", return_value=mock_response):
+         patch("entrypoints.institute.obis_client.get", AsyncMock(return_value=mock_response)):
 
         await institute.run("Get institutes with brachyura", mock_context)
 
@@ -118,14 +119,14 @@ async def test_institute_low_score_multiple():
     ]
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = {"total": 2, "results": [{"id": 1}]}
 
     with patch("entrypoints.institute.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
          patch("entrypoints.institute.utils.getInstituteId", AsyncMock(return_value=mock_institutes)), \
          patch("entrypoints.institute.utils.generate_obis_url", return_value="http://fake-url"), \
-         patch("entrypoints.institute.requests.get", return_value=mock_response):
+         patch("entrypoints.institute.obis_client.get", AsyncMock(return_value=mock_response)):
 
         await institute.run("Unknown institute records", mock_context)
 
@@ -174,14 +175,14 @@ async def test_institute_multiple_area_matches():
     mock_areas = None,[{"id": "A1"}, {"id": "A2"}]
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = {"total": 1, "results": [{"id": 1}]}
 
     with patch("entrypoints.institute.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
          patch("entrypoints.institute.utils.getAreaId", AsyncMock(return_value=mock_areas)), \
          patch("entrypoints.institute.utils.generate_obis_url", return_value="http://fake-url"), \
-         patch("entrypoints.institute.requests.get", return_value=mock_response):
+         patch("entrypoints.institute.obis_client.get", AsyncMock(return_value=mock_response)):
 
         await institute.run("Institutes in Atlantic", mock_context)
 
@@ -201,12 +202,12 @@ async def test_institute_non_ok_response():
     }
 
     mock_response = MagicMock()
-    mock_response.ok = False
+    mock_response.is_success = False
     mock_response.status_code = 500
 
     with patch("entrypoints.institute.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
          patch("entrypoints.institute.utils.generate_obis_url", return_value="http://fake-url"), \
-         patch("entrypoints.institute.requests.get", return_value=mock_response):
+         patch("entrypoints.institute.obis_client.get", AsyncMock(return_value=mock_response)):
 
         await institute.run("Institute records", mock_context)
 
@@ -230,12 +231,29 @@ async def test_institute_instructor_retry_exception():
 
     with patch("entrypoints.institute.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
          patch("entrypoints.institute.utils.generate_obis_url", return_value="http://fake-url"), \
-         patch("entrypoints.institute.requests.get",
-               side_effect=InstructorRetryException(messages=["retry"], n_attempts=1,
-                                                    total_usage={"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0})):
+         patch("entrypoints.institute.obis_client.get",
+               AsyncMock(side_effect=InstructorRetryException(messages=["retry"], n_attempts=1,
+                                                    total_usage={"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}))):
 
         await institute.run("Institute stats request", mock_context)
 
     mock_process.log.assert_any_call(
         "Sorry, I couldn't find any institutes."
     )
+
+
+@pytest.mark.asyncio
+async def test_institute_queue_timeout():
+    """A request that waited too long for admission is logged instead of escaping run()."""
+    mock_context = AsyncMock(spec=ResponseContext)
+    mock_process = AsyncMock(spec=IChatBioAgentProcess)
+    mock_context.begin_process.return_value.__aenter__.return_value = mock_process
+
+    llm_response = {"params": {"species": "brachyura"}, "clarification_needed": False}
+
+    with patch("entrypoints.institute.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
+         patch("entrypoints.institute.obis_client.get", AsyncMock(side_effect=rate_limiter.QueueTimeout("queue timeout"))):
+        await institute.run("Get institutes with brachyura", mock_context)
+
+    mock_process.log.assert_any_call("Failed to connect to OBIS API: queue timeout")
+    mock_process.create_artifact.assert_not_awaited()
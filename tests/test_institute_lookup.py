@@ -21,7 +21,7 @@ async def test_run_institute_basic_success():
     mock_area = [{"areaid": "123"}]
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = {
         "total": 10,
@@ -36,8 +36,8 @@ async def test_run_institute_basic_success():
                AsyncMock(return_value=mock_area)), \
          patch("entrypoints.institute_lookup.utils.generate_obis_extension_url",
                return_value="http://fake-url"), \
-         patch("entrypoints.institute_lookup.requests.get",
-               return_value=mock_response):
+         patch("entrypoints.institute_lookup.obis_client.get",
+               AsyncMock(return_value=mock_response)):
 
         await institute_lookup.run("Records at Smithsonian in Atlantic", mock_context)
 
@@ -93,7 +93,7 @@ async def test_run_institute_low_score_multiple_matches():
     ]
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = {"total": 2, "results": [{"id": 1}]}
 
@@ -103,8 +103,8 @@ async def test_run_institute_low_score_multiple_matches():
                AsyncMock(return_value=mock_institutes)), \
          patch("entrypoints.institute_lookup.utils.generate_obis_extension_url",
                return_value="http://fake-url"), \
-         patch("entrypoints.institute_lookup.requests.get",
-               return_value=mock_response):
+         patch("entrypoints.institute_lookup.obis_client.get",
+               AsyncMock(return_value=mock_response)):
 
         await institute_lookup.run("Records for unknown institute", mock_context)
 
@@ -155,7 +155,7 @@ async def test_run_non_ok_response():
     mock_institute = [{"id": "inst1", "name": "Smithsonian", "score": 1.0}]
 
     mock_response = MagicMock()
-    mock_response.ok = False
+    mock_response.is_success = False
     mock_response.status_code = 500
 
     with patch("entrypoints.institute_lookup.search._generate_search_parameters",
@@ -164,8 +164,8 @@ async def test_run_non_ok_response():
                AsyncMock(return_value=mock_institute)), \
          patch("entrypoints.institute_lookup.utils.generate_obis_extension_url",
                return_value="http://fake-url"), \
-         patch("entrypoints.institute_lookup.requests.get",
-               return_value=mock_response):
+         patch("entrypoints.institute_lookup.obis_client.get",
+               AsyncMock(return_value=mock_response)):
 
         await institute_lookup.run("Records at Smithsonian", mock_context)
 
@@ -210,12 +210,12 @@ async def test_instructor_retry_exception():
                AsyncMock(return_value=mock_institute)), \
          patch("entrypoints.institute_lookup.utils.generate_obis_extension_url",
                return_value="http://fake-url"), \
-         patch("entrypoints.institute_lookup.requests.get",
-               side_effect=InstructorRetryException(
+         patch("entrypoints.institute_lookup.obis_client.get",
+               AsyncMock(side_effect=InstructorRetryException(
                    messages=["retry"],
                    n_attempts=1,
                    total_usage={"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
-               )):
+               ))):
 
         await institute_lookup.run("Records at Smithsonian", mock_context)
 
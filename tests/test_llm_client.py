@@ -0,0 +1,40 @@
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from pydantic import BaseModel
+from ichatbio.types import AgentEntrypoint
+
+from utils import llm_client
+from utils import search_helper
+
+
+@pytest.mark.asyncio
+async def test_client_is_shared_within_a_loop():
+    """Every request on the same event loop reuses one pooled client."""
+    with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        first = llm_client.get_client()
+        second = llm_client.get_client()
+
+    assert first is second
+    await llm_client.close()
+
+
+@pytest.mark.asyncio
+async def test_parameter_generation_uses_the_shared_client():
+    """_generate_search_parameters does not build a client of its own."""
+    class Params(BaseModel):
+        scientificname: str | None = None
+
+    generation = MagicMock()
+    generation.model_dump.return_value = {"params": {"scientificname": "Brachyura"}}
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=generation)
+    entrypoint = AgentEntrypoint(id="test_llm_client", description="", parameters=None)
+
+    with patch("utils.search_helper.llm_client.get_client", return_value=client) as get_client, \
+         patch("utils.search_helper.prompt.prompts.get", return_value=("prompt", "hash")):
+        result = await search_helper._generate_search_parameters("crabs", entrypoint, Params)
+
+    get_client.assert_called_once()
+    assert result == {"params": {"scientificname": "Brachyura"}}
+
@@ -0,0 +1,81 @@
+import json
+import httpx
+import instructor
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from openai import AsyncOpenAI
+from ichatbio.types import AgentEntrypoint
+
+from schema import occurrenceApi
+from utils import generation_cache
+from utils import llm_metrics
+from utils import model_router
+from utils import search_helper
+
+
+def completion(arguments: dict, prompt_tokens: int, completion_tokens: int) -> dict:
+    return {
+        "id": "c", "object": "chat.completion", "created": 0, "model": search_helper.MODEL,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {
+            "role": "assistant", "content": None,
+            "tool_calls": [{"id": "call", "type": "function",
+                            "function": {"name": "response_model", "arguments": json.dumps(arguments)}}],
+        }}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    llm_metrics.clear()
+    generation_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_reasks_tokens_and_validation_errors_are_recorded():
+    """A re-ask after a validation error shows up as a retry with the failed field, and both attempts' tokens count."""
+    answers = iter([
+        completion({"params": {"scientificname": "Brachyura", "startdate": "sometime"}}, 900, 40),
+        completion({"params": {"scientificname": "Brachyura", "startdate": "2010-01-01"}}, 1000, 30),
+    ])
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json=next(answers)))
+    client = instructor.from_openai(AsyncOpenAI(api_key="test", http_client=httpx.AsyncClient(transport=transport)))
+    entrypoint = AgentEntrypoint(id="test_llm_metrics", description="", parameters=None)
+    process = AsyncMock()
+
+    # the default tier does not re-ask; give this call a second attempt
+    tiers = [model_router.Tier("default", model_router.DEFAULT_MODEL, max_retries=2)]
+
+    with patch("utils.search_helper.llm_client.get_client", return_value=client), \
+         patch("utils.search_helper.router.route", return_value=tiers), \
+         patch("utils.search_helper.prompt.prompts.get", return_value=("prompt", "hash")):
+        generation = await search_helper._generate_search_parameters("crabs since 2010", entrypoint, occurrenceApi, process=process)
+
+    assert generation["params"]["startdate"] == "2010-01-01"
+
+    totals = llm_metrics.stats()["test_llm_metrics"]
+    assert totals["llm_calls"] == 1
+    assert totals["attempts"] == 2
+    assert totals["retries"] == 1
+    assert totals["prompt_tokens"] == 1900
+    assert totals["completion_tokens"] == 70
+    assert totals["validation_errors"] == {"params.startdate:value_error": 1}
+
+    logged = process.log.await_args.kwargs["data"]
+    assert logged["source"] == "llm"
+    assert logged["retries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_answers_without_the_llm_are_counted_by_source():
+    entrypoint = AgentEntrypoint(id="get_occurrence", description="", parameters=None)
+
+    await search_helper._generate_search_parameters("Show records of Egregia menziesii", entrypoint, occurrenceApi)
+
+    totals = llm_metrics.stats()["get_occurrence"]
+    assert totals["calls"] == 1
+    assert totals["rules"] == 1
+    assert totals["llm_calls"] == 0
+    assert totals["prompt_tokens"] == 0
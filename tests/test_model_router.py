@@ -0,0 +1,121 @@
+import json
+import httpx
+import instructor
+import pytest
+from unittest.mock import patch
+
+from openai import AsyncOpenAI
+from pydantic import BaseModel
+from ichatbio.types import AgentEntrypoint
+
+from utils import generation_cache
+from utils import llm_metrics
+from utils import model_router
+from utils import search_helper
+from tests.test_llm_metrics import completion
+
+FAST = {"OBIS_LLM_FAST_MODEL": "small-model", "OBIS_LLM_FAST_ENTRYPOINTS": "test_model_router"}
+
+
+class Params(BaseModel):
+    scientificname: str | None = None
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    llm_metrics.clear()
+    generation_cache.clear()
+
+
+def test_routes_without_a_fast_model_use_the_default_tier():
+    with patch("utils.model_router.utils.getValue", side_effect=lambda key, default=None: default):
+        tiers = model_router.route("dataset_search")
+
+    assert [tier.name for tier in tiers] == ["default"]
+    assert tiers[0].model == model_router.DEFAULT_MODEL
+    # like the baseline instructor.patch call, the default tier does not re-ask
+    assert tiers[0].max_retries == 1
+
+
+def test_only_simple_entrypoints_try_the_fast_tier():
+    config = {"OBIS_LLM_FAST_MODEL": "small-model", "OBIS_LLM_FAST_BASE_URL": "http://localhost:8000/v1"}
+    with patch.dict("os.environ", config):
+        fast = model_router.route("taxon")
+        default = model_router.route("get_occurrence")
+
+    assert [(tier.name, tier.model) for tier in fast] == [("fast", "small-model"), ("default", model_router.DEFAULT_MODEL)]
+    assert fast[0].base_url == "http://localhost:8000/v1"
+    assert fast[0].max_retries == 1
+    assert [tier.name for tier in default] == ["default"]
+
+
+def test_escalation_reason():
+    assert model_router.escalation_reason({"params": {"scientificname": "Brachyura"}}) is None
+    assert model_router.escalation_reason({"params": {"scientificname": "Brachyura"}, "clarification_needed": True}) == "clarification"
+    assert model_router.escalation_reason({"params": {}, "reason": "nothing to search"}) == "no_params"
+
+
+async def generate(answers: dict):
+    """Runs a generation against a mock endpoint answering `answers[model]`; returns it and the models asked."""
+    asked = []
+
+    def handler(request):
+        model = json.loads(request.content)["model"]
+        asked.append(model)
+        return httpx.Response(200, json=answers[model])
+
+    client = instructor.from_openai(AsyncOpenAI(api_key="test", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))))
+    entrypoint = AgentEntrypoint(id="test_model_router", description="", parameters=None)
+
+    with patch.dict("os.environ", FAST), \
+         patch("utils.search_helper.llm_client.get_client", return_value=client), \
+         patch("utils.search_helper.prompt.prompts.get", return_value=("prompt", "hash")):
+        generation = await search_helper._generate_search_parameters("crabs", entrypoint, Params)
+
+    return generation, asked
+
+
+@pytest.mark.asyncio
+async def test_fast_tier_answer_is_kept():
+    generation, asked = await generate({"small-model": completion({"params": {"scientificname": "Brachyura"}}, 100, 10)})
+
+    assert generation["params"] == {"scientificname": "Brachyura"}
+    assert asked == ["small-model"]
+
+    totals = llm_metrics.stats()["test_model_router"]
+    assert totals["escalations"] == {}
+    assert totals["tiers"]["fast"]["answered"] == 1
+    assert totals["tiers"]["fast"]["prompt_tokens"] == 100
+    assert "default" not in totals["tiers"]
+
+
+@pytest.mark.asyncio
+async def test_clarification_from_the_fast_tier_escalates():
+    generation, asked = await generate({
+        "small-model": completion({"params": {}, "clarification_needed": True, "reason": "which crabs?"}, 100, 10),
+        model_router.DEFAULT_MODEL: completion({"params": {"scientificname": "Brachyura"}}, 1000, 20),
+    })
+
+    assert generation["params"] == {"scientificname": "Brachyura"}
+    assert asked == ["small-model", model_router.DEFAULT_MODEL]
+
+    totals = llm_metrics.stats()["test_model_router"]
+    assert totals["escalations"] == {"clarification": 1}
+    assert totals["tiers"]["fast"]["answered"] == 0
+    assert totals["tiers"]["default"]["answered"] == 1
+    assert totals["prompt_tokens"] == 1100
+
+
+@pytest.mark.asyncio
+async def test_failed_fast_tier_escalates_without_reasking_it():
+    generation, asked = await generate({
+        "small-model": completion({"params": {"scientificname": ["Brachyura"]}}, 100, 10),
+        model_router.DEFAULT_MODEL: completion({"params": {"scientificname": "Brachyura"}}, 1000, 20),
+    })
+
+    assert generation["params"] == {"scientificname": "Brachyura"}
+    assert asked == ["small-model", model_router.DEFAULT_MODEL]
+
+    totals = llm_metrics.stats()["test_model_router"]
+    assert totals["escalations"] == {"error": 1}
+    assert totals["tiers"]["fast"]["attempts"] == 1
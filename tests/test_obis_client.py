@@ -0,0 +1,105 @@
+import asyncio
+import httpx
+import pytest
+
+from utils import obis_client
+
+
+def make_client(handler):
+    return obis_client.OBISClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_get_returns_response():
+    """The client returns the upstream response untouched."""
+    client = make_client(lambda request: httpx.Response(200, json={"total": 1, "results": [{"id": 1}]}))
+
+    response = await client.get("https://api.obis.org/occurrence?scientificname=Brachyura")
+
+    assert response.is_success
+    assert response.json()["total"] == 1
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_per_host_limit_caps_in_flight_requests():
+    """No more than max_per_host requests are in flight for the same host."""
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json={})
+
+    client = make_client(handler)
+    client.max_per_host = 2
+
+    await asyncio.gather(*[client.get(f"https://api.obis.org/taxon/{i}") for i in range(6)])
+
+    assert peak == 2
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_get_client_is_shared_within_a_loop():
+    """Every caller on the same event loop shares one pooled client."""
+    first = obis_client.get_client()
+    second = obis_client.get_client()
+
+    assert first is second
+    await obis_client.close()
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_requests_are_coalesced():
+    """Concurrent requests for the same canonical url share one upstream call."""
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"results": [{"taxonID": 105838}]})
+
+    client = make_client(handler)
+
+    responses = await asyncio.gather(
+        client.get("https://api.obis.org/taxon/search/common?q=great+white+shark&size=10"),
+        client.get("https://api.obis.org/taxon/search/common?size=10&q=great+white+shark"),
+        client.get("https://API.obis.org/taxon/search/common?q=great+white+shark&size=10"),
+    )
+
+    assert calls == 1
+    assert all(r.json()["results"][0]["taxonID"] == 105838 for r in responses)
+    assert client.stats["requests"] == 3
+    assert client.stats["upstream"] == 1
+    assert client.stats["coalesced"] == 2
+
+    # once the shared call finished a new request goes upstream again
+    await client.get("https://api.obis.org/taxon/search/common?q=great+white+shark&size=10")
+    assert calls == 2
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_coalesced_waiters_share_errors_and_survive_cancellation():
+    """A cancelled waiter does not cancel the shared call; errors reach every waiter."""
+    async def handler(request):
+        await asyncio.sleep(0.01)
+        raise httpx.ConnectError("connection refused")
+
+    client = make_client(handler)
+
+    first = asyncio.create_task(client.get("https://api.obis.org/area/search?q=Australia"))
+    second = asyncio.create_task(client.get("https://api.obis.org/area/search?q=Australia"))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    with pytest.raises(httpx.ConnectError):
+        await second
+    assert first.cancelled()
+    await client.aclose()
@@ -0,0 +1,93 @@
+import os
+import pytest
+from unittest.mock import patch
+
+from utils import prompt_helper
+
+
+def make_registry(tmp_path, examples="### get_occurrence\nexample one\n### facet\nexample two\n"):
+    (tmp_path / "system_prompt.md").write_text("You are an OBIS expert.")
+    (tmp_path / "api_examples.md").write_text(examples)
+    return prompt_helper.PromptRegistry(tmp_path / "system_prompt.md", tmp_path / "api_examples.md")
+
+
+def test_sections_are_matched_on_the_whole_header():
+    sections = prompt_helper.parse_api_examples("### dataset\nA\n### dataset_lookup\nB\n")
+
+    assert sections == {"dataset": "A", "dataset_lookup": "B"}
+
+
+def test_prompts_are_built_once_with_a_content_hash(tmp_path):
+    registry = make_registry(tmp_path)
+    registry.register("get_occurrence")
+
+    prompt, digest = registry.get("get_occurrence")
+
+    assert prompt.startswith("You are an OBIS expert.")
+    assert prompt.endswith("example one")
+    assert registry.get("get_occurrence") == (prompt, digest)
+    assert registry.get("facet")[1] != digest
+
+
+def test_missing_examples_section_fails_at_registration(tmp_path):
+    registry = make_registry(tmp_path)
+
+    with pytest.raises(ValueError):
+        registry.register("taxon")
+    assert "No examples found for taxon" in registry.register("taxon", examples=False)
+
+
+def test_prompts_are_rebuilt_when_a_file_changes(tmp_path):
+    registry = make_registry(tmp_path)
+    registry.register("get_occurrence")
+    _, digest = registry.get("get_occurrence")
+
+    path = tmp_path / "api_examples.md"
+    path.write_text("### get_occurrence\nexample three\n")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+
+    prompt, new_digest = registry.get("get_occurrence")
+    assert prompt.endswith("example three")
+    assert new_digest != digest
+
+
+def test_every_entrypoint_has_its_prompt():
+    """Entrypoints register their prompt at import, so the agent starts only if all sections exist."""
+    from entrypoints import get_occurrence, statistics
+
+    assert "# Examples" in prompt_helper.build_system_prompt(get_occurrence.entrypoint.id)
+    assert prompt_helper.prompt_hash(statistics.entrypoint.id)
+
+
+EXAMPLES = """### get_occurrence
+## Example 1 - scientific name
+"Request": "Search for Egregia menziesii"
+## Example 2 - depth
+"Request": "occurrences below 100 meters depth"
+## Example 3 - institute
+"Request": "Search for crabs from CSIRO Australia institute"
+"""
+
+
+def test_examples_most_similar_to_the_request_are_selected(tmp_path):
+    registry = make_registry(tmp_path, EXAMPLES)
+    registry.register("get_occurrence")
+
+    with patch.dict("os.environ", {"OBIS_PROMPT_EXAMPLES": "1"}):
+        prompt, digest = registry.get("get_occurrence", "kelp records deeper than 50 meters")
+
+    assert "Example 2" in prompt
+    assert "Example 1" not in prompt and "Example 3" not in prompt
+    assert digest != registry.get("get_occurrence")[1]
+
+
+def test_selected_examples_respect_the_token_budget(tmp_path):
+    registry = make_registry(tmp_path, EXAMPLES)
+    registry.register("get_occurrence")
+
+    with patch.dict("os.environ", {"OBIS_PROMPT_EXAMPLES": "3", "OBIS_PROMPT_EXAMPLE_TOKENS_GET_OCCURRENCE": "45"}):
+        prompt, _ = registry.get("get_occurrence", "crabs from an Australian institute")
+
+    # the best match always makes it in, the rest only while they fit
+    assert "Example 3" in prompt
+    assert prompt.count("## Example") == 2
@@ -0,0 +1,75 @@
+import asyncio
+import time
+import httpx
+import pytest
+from unittest.mock import patch
+
+from utils import obis_client
+from utils import rate_limiter
+from utils import resilience
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_spaces_requests_beyond_the_burst():
+    """Once the burst is spent requests are admitted at `rate` per second."""
+    limiter = rate_limiter.HostLimiter(10, rate=50, burst=1)
+
+    started = time.monotonic()
+    for _ in range(3):
+        await limiter.acquire()
+        await limiter.release(0.0, 200)
+
+    assert time.monotonic() - started >= 0.035
+
+
+@pytest.mark.asyncio
+async def test_congestion_halves_the_limit_and_success_grows_it_back():
+    """429/5xx answers cut concurrency multiplicatively; good answers add it back slowly."""
+    limiter = rate_limiter.HostLimiter(8)
+
+    await limiter.acquire()
+    await limiter.release(0.01, 503)
+    assert limiter.limit == 4
+
+    for _ in range(4):
+        await limiter.acquire()
+        await limiter.release(0.01, 200)
+    assert 4 < limiter.limit <= 5
+
+
+@pytest.mark.asyncio
+async def test_slow_responses_count_as_congestion():
+    limiter = rate_limiter.HostLimiter(8, latency_target=0.5)
+
+    await limiter.acquire()
+    await limiter.release(1.0, 200)
+
+    assert limiter.limit == 4
+
+
+@pytest.mark.asyncio
+async def test_excess_requests_wait_then_time_out():
+    """A request over the limit queues, and gives up after queue_timeout."""
+    limiter = rate_limiter.HostLimiter(1, queue_timeout=0.02)
+    await limiter.acquire()
+
+    with pytest.raises(rate_limiter.QueueTimeout):
+        await limiter.acquire()
+
+    assert limiter.stats["queued"] == 1
+    assert limiter.stats["queue_timeouts"] == 1
+    assert limiter.in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_client_backs_off_when_obis_throttles():
+    """The OBIS client lowers its per-host concurrency after a 429."""
+    client = obis_client.OBISClient(transport=httpx.MockTransport(lambda request: httpx.Response(429)))
+    client.max_per_host = 8
+
+    with patch("utils.obis_client.resilience.policy_for", lambda endpoint: resilience.RetryPolicy(retries=0)):
+        response = await client.get("https://api.obis.org/occurrence?scientificname=Brachyura")
+
+    assert response.status_code == 429
+    assert client._limiter("https://api.obis.org/").limit == 4
+    await client.aclose()
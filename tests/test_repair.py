@@ -0,0 +1,108 @@
+import httpx
+import instructor
+import pytest
+from unittest.mock import patch
+
+from openai import AsyncOpenAI
+from ichatbio.types import AgentEntrypoint
+
+from schema import occurrenceApi, facetsAPIParams, FacetField
+from utils import generation_cache
+from utils import llm_metrics
+from utils import repair
+from utils import search_helper
+from tests.test_llm_metrics import completion
+
+
+@pytest.fixture(autouse=True)
+def clear_repairs():
+    repair.clear()
+    llm_metrics.clear()
+    generation_cache.clear()
+
+
+@pytest.mark.parametrize("value, end, expected", [
+    ("2010", False, "2010-01-01"),
+    ("2010", True, "2010-12-31"),
+    (2010, True, "2010-12-31"),
+    ("2012-02", True, "2012-02-29"),
+    ("2012/2", False, "2012-02-01"),
+    ("2010-05-01T10:00:00Z", False, "2010-05-01"),
+    ("2010-05-01 23:59", True, "2010-05-01"),
+    ("2010-05-01", False, "2010-05-01"),
+    ("2010-13", False, "2010-13"),
+    ("sometime", False, "sometime"),
+    (None, False, None),
+])
+def test_repair_date(value, end, expected):
+    assert repair.repair_date(value, end=end) == expected
+
+
+def test_repair_size():
+    assert repair.repair_size(50000) == 10000
+    assert repair.repair_size("20000") == 10000
+    assert repair.repair_size("all") == 10000
+    assert repair.repair_size(20) == 20
+    assert repair.repair_size("many") == "many"
+
+
+def test_repair_facets():
+    assert repair.repair_facets("Kingdom, phylum;date_year") == ["kingdom", "phylum", "date_year"]
+    assert repair.repair_facets(["scientific name", "DatasetID"]) == ["scientificName", "datasetID"]
+    # unknown facets are left for validation to reject
+    assert repair.repair_facets(["colour"]) == ["colour"]
+
+
+def test_repair_depths():
+    assert repair.repair_depths(200, 50) == (50, 200)
+    assert repair.repair_depths(-200, None) == (200, None)
+    assert repair.repair_depths(10, 100) == (10, 100)
+
+
+def test_repair_params_only_touches_fields_of_the_model():
+    params, repaired = repair.repair_params(occurrenceApi, {"startdate": "2010", "facets": "kingdom", "size": 20})
+
+    assert params == {"startdate": "2010-01-01", "facets": "kingdom", "size": 20}
+    assert repaired == ["startdate"]
+    assert repair.stats() == {"startdate": 1}
+
+
+def test_response_model_repairs_before_validation():
+    model = search_helper.create_response_model(facetsAPIParams)
+
+    response = model.model_validate({"params": {"facets": "Kingdom, phylum", "startdate": "2010", "startdepth": 200, "enddepth": 50}})
+
+    assert response.params.facets == [FacetField.kingdom, FacetField.phylum]
+    assert response.params.startdate == "2010-01-01"
+    assert (response.params.startdepth, response.params.enddepth) == (50, 200)
+
+
+def test_stream_model_does_not_repair():
+    model = search_helper.create_stream_model(occurrenceApi)
+
+    assert model.model_validate({"params": {"startdate": "20"}}).params.startdate == "20"
+    assert model.model_json_schema() == search_helper.create_response_model(occurrenceApi).model_json_schema()
+
+
+@pytest.mark.asyncio
+async def test_repaired_values_need_no_reask():
+    answers = iter([
+        completion({"params": {"scientificname": "Brachyura", "startdate": "2010", "enddate": "2015-06-30T00:00:00Z"}}, 900, 40),
+    ])
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=next(answers))
+
+    client = instructor.from_openai(AsyncOpenAI(api_key="test", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))))
+    entrypoint = AgentEntrypoint(id="test_repair", description="", parameters=None)
+
+    with patch("utils.search_helper.llm_client.get_client", return_value=client), \
+         patch("utils.search_helper.prompt.prompts.get", return_value=("prompt", "hash")):
+        generation = await search_helper._generate_search_parameters("crabs from 2010 to mid 2015", entrypoint, occurrenceApi)
+
+    assert generation["params"]["startdate"] == "2010-01-01"
+    assert generation["params"]["enddate"] == "2015-06-30"
+    assert len(requests) == 1
+    assert llm_metrics.stats()["test_repair"]["retries"] == 0
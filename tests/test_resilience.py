@@ -0,0 +1,153 @@
+import httpx
+import pytest
+from unittest.mock import patch
+
+from utils import obis_client
+from utils import rate_limiter
+from utils import resilience
+from utils.response_cache import ResponseCache
+
+
+def make_client(handler, **kwargs):
+    return obis_client.OBISClient(transport=httpx.MockTransport(handler), **kwargs)
+
+
+def no_backoff(endpoint):
+    return resilience.RetryPolicy(retries=2, backoff=0)
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried():
+    """A 502 followed by a success is invisible to the caller."""
+    statuses = iter([502, 503, 200])
+    client = make_client(lambda request: httpx.Response(next(statuses), json={"total": 1}))
+
+    with patch("utils.obis_client.resilience.policy_for", no_backoff):
+        response = await client.get("https://api.obis.org/occurrence?scientificname=Brachyura")
+
+    assert response.status_code == 200
+    assert client.stats["retries"] == 2
+    assert client.stats["upstream"] == 3
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried():
+    client = make_client(lambda request: httpx.Response(404))
+
+    with patch("utils.obis_client.resilience.policy_for", no_backoff):
+        response = await client.get("https://api.obis.org/dataset/unknown")
+
+    assert response.status_code == 404
+    assert client.stats["upstream"] == 1
+    await client.aclose()
+
+
+def test_backoff_is_jittered_capped_and_honours_retry_after():
+    policy = resilience.RetryPolicy(backoff=1, backoff_max=3)
+
+    assert all(0 <= policy.delay(attempt) <= min(3, 2 ** attempt) for attempt in range(6))
+    assert policy.delay(0, retry_after="2") == 2
+    assert policy.delay(0, retry_after="120") == 3
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_fails_fast():
+    """After `threshold` failed calls the endpoint is not called until the cooldown ends."""
+    calls = 0
+
+    def handler(request):
+        nonlocal calls
+        calls += 1
+        raise httpx.ConnectError("connection refused")
+
+    client = make_client(handler)
+    client._breakers["occurrence"] = resilience.CircuitBreaker(threshold=2, cooldown=60)
+
+    with patch("utils.obis_client.resilience.policy_for", lambda endpoint: resilience.RetryPolicy(retries=0)):
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                await client.get("https://api.obis.org/occurrence?scientificname=Brachyura")
+        with pytest.raises(resilience.CircuitOpen):
+            await client.get("https://api.obis.org/occurrence?scientificname=Brachyura")
+
+    assert calls == 2
+    assert client.stats["breaker_rejected"] == 1
+    await client.aclose()
+
+
+def test_breaker_lets_one_probe_through_after_cooldown():
+    breaker = resilience.CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record(False)
+
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+    breaker.record(True)
+    assert breaker.state == "closed"
+
+
+def test_probe_that_never_reports_back_reopens_the_breaker():
+    breaker = resilience.CircuitBreaker(threshold=1, cooldown=60)
+    breaker.record(False)
+    breaker._opened_at -= 60
+
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # the probe was lost; after another cooldown the breaker is open again, then probes
+    breaker._opened_at -= 60
+    assert not breaker.allow()
+    assert breaker.state == "open"
+    breaker._opened_at -= 60
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_probe_that_times_out_in_the_queue_is_released():
+    """A probe that never reached OBIS does not keep the endpoint shut."""
+    calls = 0
+
+    def handler(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(200, json={"total": 1})
+
+    client = make_client(handler)
+    breaker = client._breakers["occurrence"] = resilience.CircuitBreaker(threshold=1, cooldown=60)
+    breaker.record(False)
+    breaker._opened_at -= 60
+
+    limiter = client._limiter("https://api.obis.org/occurrence")
+    with patch.object(limiter, "acquire", side_effect=rate_limiter.QueueTimeout("queue timeout")):
+        with pytest.raises(rate_limiter.QueueTimeout):
+            await client.get("https://api.obis.org/occurrence?scientificname=Brachyura")
+
+    assert breaker.state == "open"
+    response = await client.get("https://api.obis.org/occurrence?scientificname=Brachyura")
+
+    assert response.status_code == 200
+    assert calls == 1
+    assert breaker.state == "closed"
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_stale_cache_is_served_while_obis_is_down(tmp_path):
+    """A stale cached response beats an error page when OBIS keeps failing."""
+    statuses = iter([200, 503, 503, 503])
+    client = make_client(
+        lambda request: httpx.Response(next(statuses), json={"results": [{"id": 1}]}),
+        cache=ResponseCache(path=str(tmp_path / "cache.sqlite")),
+    )
+
+    with patch("utils.obis_client.response_cache.ttl_for", lambda url: 1e-9), \
+         patch("utils.obis_client.resilience.policy_for", no_backoff):
+        await client.get("https://api.obis.org/dataset/1")
+        response = await client.get("https://api.obis.org/dataset/1")
+
+    assert response.status_code == 200
+    assert response.json()["results"] == [{"id": 1}]
+    assert client.stats["stale_served"] == 1
+    await client.aclose()
@@ -0,0 +1,132 @@
+import sqlite3
+
+import httpx
+import pytest
+
+from utils import obis_client
+from utils import response_cache
+
+
+@pytest.fixture()
+def cache(tmp_path):
+    return response_cache.ResponseCache(path=str(tmp_path / "responses.sqlite"))
+
+
+def test_ttl_depends_on_endpoint():
+    """Metadata endpoints are cached, occurrence queries are not."""
+    assert response_cache.ttl_for("https://api.obis.org/dataset/00000002-3cef-4bc1-8540-2c20b4798855") > 0
+    assert response_cache.ttl_for("https://api.obis.org/taxon/search/common?q=kelp") > 0
+    assert response_cache.ttl_for("https://api.obis.org/occurrence?scientificname=Brachyura") == 0
+
+
+@pytest.mark.asyncio
+async def test_fresh_entry_is_served_without_network(cache):
+    """A repeated metadata request is answered from the cache."""
+    calls = 0
+
+    def handler(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(200, json={"id": "19482", "name": "Smithsonian"})
+
+    client = obis_client.OBISClient(transport=httpx.MockTransport(handler), cache=cache)
+
+    first = await client.get("https://api.obis.org/institute/19482")
+    second = await client.get("https://api.obis.org/institute/19482")
+
+    assert calls == 1
+    assert second.json() == first.json()
+    assert client.stats["cache_hits"] == 1
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_revalidated_with_etag(cache, monkeypatch):
+    """Once stale, an entry is revalidated and a 304 keeps the cached body."""
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={"taxonID": 105838}, headers={"ETag": '"v1"'})
+
+    client = obis_client.OBISClient(transport=httpx.MockTransport(handler), cache=cache)
+    url = "https://api.obis.org/taxon/105838"
+
+    await client.get(url)
+    monkeypatch.setattr(cache, "is_fresh", lambda entry, ttl: False)
+    response = await client.get(url)
+
+    assert seen == [None, '"v1"']
+    assert response.status_code == 200
+    assert response.json() == {"taxonID": 105838}
+    assert client.stats["cache_revalidated"] == 1
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_locked_cache_falls_back_to_the_network(cache, monkeypatch):
+    """A cache that raises sqlite errors is bypassed instead of failing the request."""
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(cache, "lookup", locked)
+    monkeypatch.setattr(cache, "store", locked)
+    client = obis_client.OBISClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"id": "19482"})), cache=cache)
+
+    response = await client.get("https://api.obis.org/institute/19482")
+
+    assert response.status_code == 200
+    assert response.json() == {"id": "19482"}
+    assert client.stats["upstream"] == 1
+    await client.aclose()
+
+
+def test_eviction_keeps_cache_under_budget(cache):
+    """Least recently used entries are evicted once the byte budget is exceeded."""
+    cache.max_bytes = 250
+    request = httpx.Request("GET", "https://api.obis.org/dataset")
+
+    for i in range(3):
+        cache.store(f"https://api.obis.org/dataset/{i}", httpx.Response(200, content=b"x" * 100, request=request))
+
+    assert cache.lookup("https://api.obis.org/dataset/0") is None
+    assert cache.lookup("https://api.obis.org/dataset/2") is not None
+    assert cache.stats["evicted"] == 1
+
+
+def test_hits_are_written_in_batches_and_count_for_eviction(cache, monkeypatch):
+    """Access times are kept in memory until a batch fills or an eviction needs them."""
+    monkeypatch.setattr(response_cache, "TOUCH_BATCH", 2)
+    cache.max_bytes = 250
+    request = httpx.Request("GET", "https://api.obis.org/dataset")
+
+    for i in range(2):
+        cache.store(f"https://api.obis.org/dataset/{i}", httpx.Response(200, content=b"x" * 100, request=request))
+    cache.lookup("https://api.obis.org/dataset/0")
+    assert list(cache._touched) == ["https://api.obis.org/dataset/0"]
+
+    cache.store("https://api.obis.org/dataset/2", httpx.Response(200, content=b"x" * 100, request=request))
+
+    assert cache._touched == {}
+    assert cache.lookup("https://api.obis.org/dataset/1") is None
+    assert cache.lookup("https://api.obis.org/dataset/0") is not None
+    assert cache._size == 200
+
+
+def test_size_total_includes_other_writers(cache, tmp_path):
+    """Another worker's entries are counted once this worker's running total passes the budget."""
+    other = response_cache.ResponseCache(path=str(tmp_path / "responses.sqlite"))
+    request = httpx.Request("GET", "https://api.obis.org/dataset")
+    other.store("https://api.obis.org/dataset/0", httpx.Response(200, content=b"x" * 100, request=request))
+
+    cache.max_bytes = 150
+    cache.store("https://api.obis.org/dataset/1", httpx.Response(200, content=b"x" * 100, request=request))
+    assert cache.stats["evicted"] == 0
+
+    cache.store("https://api.obis.org/dataset/2", httpx.Response(200, content=b"x" * 100, request=request))
+
+    assert cache.stats["evicted"] == 2
+    assert cache.lookup("https://api.obis.org/dataset/0") is None
+    assert cache.lookup("https://api.obis.org/dataset/2") is not None
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import httpx
+import instructor
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from openai import AsyncOpenAI
+from pydantic import BaseModel
+from ichatbio.types import AgentEntrypoint
+
+from schema import occurrenceApi
+from utils import search_helper
+from utils import generation_cache
+from utils import resolver_cache
+from utils import utils
+
+
+def test_response_models_are_built_once_per_entrypoint():
+    """Entrypoints register their response model at import; later lookups reuse it."""
+    from entrypoints import get_occurrence
+
+    model = search_helper.register_response_model(get_occurrence.entrypoint.id, occurrenceApi)
+
+    assert search_helper.register_response_model(get_occurrence.entrypoint.id, occurrenceApi) is model
+    assert "params" in search_helper.get_response_schema(get_occurrence.entrypoint.id)["properties"]
+    with pytest.raises(ValueError):
+        search_helper.register_response_model(get_occurrence.entrypoint.id, BaseModel)
+
+
+@pytest.mark.asyncio
+async def test_repeated_requests_reuse_the_cached_generation():
+    """Requests that differ only in case and spacing pay for one LLM call."""
+    class Params(BaseModel):
+        scientificname: str | None = None
+
+    generation = MagicMock()
+    generation.model_dump.return_value = {"params": {"scientificname": "Carcharodon carcharias"}}
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=generation)
+    entrypoint = AgentEntrypoint(id="test_generation_cache", description="", parameters=None)
+
+    generation_cache.clear()
+    with patch("utils.search_helper.llm_client.get_client", return_value=client), \
+         patch("utils.search_helper.prompt.prompts.get", return_value=("prompt", "hash-1")):
+        first = await search_helper._generate_search_parameters("Show records of great white shark", entrypoint, Params)
+        second = await search_helper._generate_search_parameters("show records of  great white shark.", entrypoint, Params)
+
+    with patch("utils.search_helper.llm_client.get_client", return_value=client), \
+         patch("utils.search_helper.prompt.prompts.get", return_value=("new prompt", "hash-2")):
+        await search_helper._generate_search_parameters("Show records of great white shark", entrypoint, Params)
+
+    assert first == second
+    # the edited prompt does not match the cached generation
+    assert client.chat.completions.create.await_count == 2
+    assert generation_cache.stats()["hits"] == 1
+
+
+def streaming_client(arguments: dict, sent: list, usage: dict | None = None, requests: list | None = None):
+    """
+    An instructor client whose OpenAI endpoint streams `arguments` as a tool call, 7 characters
+    per chunk, followed by a chunk with `usage` if given. Request bodies are added to `requests`.
+    """
+    text = json.dumps(arguments)
+
+    def chunk(delta):
+        return {"id": "c", "object": "chat.completion.chunk", "created": 0, "model": search_helper.MODEL,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+
+    events = [chunk({"role": "assistant", "tool_calls": [
+        {"index": 0, "id": "call", "type": "function", "function": {"name": "response_model", "arguments": ""}}]})]
+    events += [chunk({"tool_calls": [{"index": 0, "function": {"arguments": text[i:i + 7]}}]}) for i in range(0, len(text), 7)]
+    if usage is not None:
+        events.append({"id": "c", "object": "chat.completion.chunk", "created": 0, "model": search_helper.MODEL,
+                       "choices": [], "usage": usage})
+
+    async def body():
+        for event in events:
+            sent.append(event)
+            yield f"data: {json.dumps(event)}\n\n".encode()
+        yield b"data: [DONE]\n\n"
+
+    def respond(request):
+        if requests is not None:
+            requests.append(json.loads(request.content))
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body())
+
+    transport = httpx.MockTransport(respond)
+    return instructor.from_openai(AsyncOpenAI(api_key="test", http_client=httpx.AsyncClient(transport=transport)))
+
+
+@pytest.mark.asyncio
+async def test_streamed_fields_are_reported_as_soon_as_they_are_complete():
+    """Resolution of the area can start while the LLM is still writing the rest."""
+    from schema import occurrenceApi
+
+    sent = []
+    reported = []
+    client = streaming_client(
+        {"params": {"area": "Australia", "commonname": "great white shark", "startdate": "2010/01/01"},
+         "clarification_needed": False},
+        sent,
+    )
+    entrypoint = AgentEntrypoint(id="test_streaming", description="", parameters=None)
+
+    generation_cache.clear()
+    with patch("utils.search_helper.llm_client.get_client", return_value=client), \
+         patch("utils.search_helper.prompt.prompts.get", return_value=("prompt", "hash")):
+        generation = await search_helper._generate_search_parameters(
+            "great white sharks in Australia since 2010", entrypoint, occurrenceApi,
+            on_field=lambda name, value: reported.append((name, value, len(sent))),
+        )
+
+    assert [(name, value) for name, value, _ in reported] == [
+        ("area", "Australia"), ("commonname", "great white shark"), ("startdate", "2010/01/01"),
+    ]
+    assert reported[0][2] < len(sent) / 2
+    # the final object is validated against the real model, so the date is normalised
+    assert generation["params"]["startdate"] == "2010-01-01"
+
+
+@pytest.mark.asyncio
+async def test_streamed_calls_record_their_tokens():
+    """Streamed generations ask for usage and count the tokens of the last chunk."""
+    from utils import llm_metrics
+
+    requests = []
+    client = streaming_client(
+        {"params": {"scientificname": "Brachyura"}, "clarification_needed": False},
+        [],
+        usage={"prompt_tokens": 1200, "completion_tokens": 35, "total_tokens": 1235},
+        requests=requests,
+    )
+    entrypoint = AgentEntrypoint(id="test_streaming_usage", description="", parameters=None)
+
+    generation_cache.clear()
+    llm_metrics.clear()
+    with patch("utils.search_helper.llm_client.get_client", return_value=client), \
+         patch("utils.search_helper.prompt.prompts.get", return_value=("prompt", "hash")):
+        await search_helper._generate_search_parameters("crab records", entrypoint, occurrenceApi, on_field=lambda name, value: None)
+
+    assert requests[0]["stream_options"] == {"include_usage": True}
+    totals = llm_metrics.stats()["test_streaming_usage"]
+    assert totals["prompt_tokens"] == 1200
+    assert totals["completion_tokens"] == 35
+
+
+@pytest.mark.asyncio
+async def test_prefetch_warms_the_resolver_cache():
+    resolver_cache.clear()
+    results = [{"commonName": "great white shark", "taxonID": 105838, "scientificName": "Carcharodon carcharias"}]
+    response = MagicMock(is_success=True, status_code=200)
+    response.json.return_value = {"results": results}
+    get = AsyncMock(return_value=response)
+
+    with patch("utils.utils.obis_client.get", get):
+        utils.prefetchParam("commonname", "great white shark")
+        utils.prefetchParam("institute", "CSIRO")
+        await asyncio.gather(*utils._prefetches)
+        await utils.resolveCommonName("great white shark")
+
+    assert get.await_count == 1
@@ -18,13 +18,13 @@ async def test_statistics_basic_success():
     }
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = [{"year": 2020, "count": 10}]
 
     with patch("entrypoints.statistics.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
          patch("entrypoints.statistics.utils.generate_obis_url", return_value="http://fake-url"), \
-         patch("entrypoints.statistics.requests.get", return_value=mock_response):
+         patch("entrypoints.statistics.obis_client.get", AsyncMock(return_value=mock_response)):
 
         await statistics.run("Yearly stats for brachyura", mock_context)
 
@@ -50,13 +50,13 @@ async def test_statistics_with_extensions():
     }
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = [{"value": 1}]
 
     with patch("entrypoints.statistics.search._generate_search_parameters", AsyncMock(return_value=mock_llm_response)), \
          patch("entrypoints.statistics.utils.generate_obis_url", return_value="http://fake-url"), \
-         patch("entrypoints.statistics.requests.get", return_value=mock_response):
+         patch("entrypoints.statistics.obis_client.get", AsyncMock(return_value=mock_response)):
 
         await statistics.run("Trend analysis", mock_context)
 
@@ -119,14 +119,14 @@ async def test_statistics_resolve_institute():
     }
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.return_value = [{"value": 1}]
 
     with patch("entrypoints.statistics.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
          patch("entrypoints.statistics.utils.resolveParams", AsyncMock(return_value=True)), \
          patch("entrypoints.statistics.utils.generate_obis_url", return_value="http://fake-url"), \
-         patch("entrypoints.statistics.requests.get", return_value=mock_response):
+         patch("entrypoints.statistics.obis_client.get", AsyncMock(return_value=mock_response)):
 
         await statistics.run("Stats for Smithsonian", mock_context)
 
@@ -146,12 +146,12 @@ async def test_statistics_non_ok_response():
     }
 
     mock_response = MagicMock()
-    mock_response.ok = False
+    mock_response.is_success = False
     mock_response.status_code = 500
 
     with patch("entrypoints.statistics.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
          patch("entrypoints.statistics.utils.generate_obis_url", return_value="http://fake-url"), \
-         patch("entrypoints.statistics.requests.get", return_value=mock_response):
+         patch("entrypoints.statistics.obis_client.get", AsyncMock(return_value=mock_response)):
 
         await statistics.run("Stats request", mock_context)
 
@@ -173,9 +173,9 @@ async def test_statistics_instructor_retry_exception():
 
     with patch("entrypoints.statistics.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
          patch("entrypoints.statistics.utils.generate_obis_url", return_value="http://fake-url"), \
-         patch("entrypoints.statistics.requests.get",
-               side_effect=InstructorRetryException(messages=["retry"], n_attempts=1,
-                                                    total_usage={"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0})):
+         patch("entrypoints.statistics.obis_client.get",
+               AsyncMock(side_effect=InstructorRetryException(messages=["retry"], n_attempts=1,
+                                                    total_usage={"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}))):
 
         await statistics.run("Stats request", mock_context)
 
@@ -195,15 +195,46 @@ async def test_statistics_invalid_json():
     }
 
     mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response.is_success = True
     mock_response.status_code = 200
     mock_response.json.side_effect = ValueError("Invalid JSON")
 
     with patch("entrypoints.statistics.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
          patch("entrypoints.statistics.utils.generate_obis_url", return_value="http://fake-url"), \
-         patch("entrypoints.statistics.requests.get", return_value=mock_response), \
+         patch("entrypoints.statistics.obis_client.get", AsyncMock(return_value=mock_response)), \
          patch("entrypoints.statistics.utils.exceptionHandler", AsyncMock()) as mock_exception:
 
         await statistics.run("Stats request", mock_context)
 
     mock_exception.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_statistics_failed_extension_keeps_successful_ones():
+    """A failing extension is reported while the other extensions still produce artifacts in order."""
+    mock_context = AsyncMock(spec=ResponseContext)
+    mock_process = AsyncMock(spec=IChatBioAgentProcess)
+    mock_context.begin_process.return_value.__aenter__.return_value = mock_process
+
+    llm_response = {
+        "params": {"scientificname": "brachyura", "statistics_extensions": ["years", "taxonomy", "composition"]},
+        "clarification_needed": False
+    }
+
+    def respond(url):
+        response = MagicMock()
+        response.is_success = "taxonomy" not in url
+        response.status_code = 200 if response.is_success else 502
+        response.json.return_value = [{"value": 1}]
+        return response
+
+    with patch("entrypoints.statistics.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
+         patch("entrypoints.statistics.obis_client.get", AsyncMock(side_effect=respond)):
+
+        await statistics.run("Yearly, taxonomic and composition stats for brachyura", mock_context)
+
+    uris = [call.kwargs["uris"][0] for call in mock_process.create_artifact.call_args_list]
+    assert len(uris) == 2
+    assert "statistics/years" in uris[0]
+    assert "statistics/composition" in uris[1]
+    mock_process.log.assert_any_call("Response code: 502 Bad Gateway - something went wrong!")
@@ -19,14 +19,14 @@ async def test_taxon_scientific_name_success():
     }
 
     # Mock a fake OBIS response
-    mock_response = MagicMock(ok=True, status_code=200)
+    mock_response = MagicMock(is_success=True, status_code=200)
     mock_response.json.return_value = {
         "total": 12,
         "results": [{"id": 1, "name": "Salmo salar"}],
     }
 
     with patch("entrypoints.taxon.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
-         patch("entrypoints.taxon.requests.get", return_value=mock_response):
+         patch("entrypoints.taxon.obis_client.get", AsyncMock(return_value=mock_response)):
 
         await taxon.run("Get taxon info for Atlantic salmon", mock_context)
 
@@ -60,12 +60,12 @@ async def test_taxon_common_name_multiple_matches():
         ("Chinook salmon", 2, "Oncorhynchus tshawytscha"),
     ]
 
-    mock_response = MagicMock(ok=True, status_code=200)
+    mock_response = MagicMock(is_success=True, status_code=200)
     mock_response.json.return_value = {"total": 2, "results": [{"id": 1}, {"id": 2}]}
 
     with patch("entrypoints.taxon.search._generate_search_parameters", AsyncMock(return_value=llm_response)), \
          patch("entrypoints.taxon.utils.resolveCommonName", AsyncMock(return_value=("fake_url", mock_scientific_names))), \
-         patch("entrypoints.taxon.requests.get", return_value=mock_response):
+         patch("entrypoints.taxon.obis_client.get", AsyncMock(return_value=mock_response)):
 
         await taxon.run("Get taxon info for salmon", mock_context)
 
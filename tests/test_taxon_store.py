@@ -0,0 +1,132 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from utils import resolver_cache
+from utils import taxon_store
+from utils import utils
+from tests.test_utils import obis_response
+
+
+@pytest.fixture(autouse=True)
+def clear_resolver_cache():
+    resolver_cache.clear()
+    taxon_store.clear()
+    yield
+    taxon_store.clear()
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    path = tmp_path / "taxa" / "names.tsv"
+    with patch.dict("os.environ", {"OBIS_TAXON_STORE_PATH": str(path)}):
+        yield path
+
+
+def test_table_keeps_the_order_of_the_rows_of_a_key():
+    table = taxon_store.NameTable([
+        ("kelp", 1, "Laminaria", "kelp"),
+        ("blue whale", 137090, "Balaenoptera musculus", "blue whale"),
+        ("kelp", 2, "Macrocystis", "giant kelp"),
+    ])
+
+    assert table.get("kelp") == [(1, "Laminaria", "kelp"), (2, "Macrocystis", "giant kelp")]
+    assert table.get("blue whale") == [(137090, "Balaenoptera musculus", "blue whale")]
+    assert table.get("orca") == []
+    assert table.ids.dtype.name == "int32"
+
+
+@pytest.mark.asyncio
+async def test_answers_are_appended_and_served_after_reload(store_path):
+    store = taxon_store.TaxonStore(str(store_path))
+
+    await store.add("common", "Kelp", [(1, "Laminaria", "kelp"), ("2", "Macrocystis", "giant kelp"), (None, "unknown", "")])
+    await store.add("common", "kelp", [(3, "Ecklonia", "kelp")])
+    # a second worker appended the same answer
+    taxon_store.TaxonStore.append(str(store_path), [("common", "kelp", 1, "Laminaria", "kelp")])
+
+    # nothing is kept in memory; resolver_cache serves repeats until the next start
+    assert store.lookup("common", "kelp") == []
+    assert store.stats == {"hits": 0, "misses": 1, "added": 1}
+
+    reloaded = taxon_store.TaxonStore(str(store_path))
+    assert reloaded.lookup("common", "  KELP ") == [(1, "Laminaria", "kelp"), (2, "Macrocystis", "giant kelp")]
+    assert reloaded.lookup("scientific", "kelp") == []
+
+
+@pytest.mark.asyncio
+async def test_store_stops_growing_at_its_bound(store_path):
+    taxon_store.TaxonStore.append(str(store_path), [("scientific", "orcinus orca", 137102, "Orcinus orca", "")])
+    store = taxon_store.TaxonStore(str(store_path), max_names=2)
+
+    await store.add("common", "orca", [(137102, "Orcinus orca", "orca")])
+    await store.add("common", "killer whale", [(137102, "Orcinus orca", "killer whale")])
+
+    assert store.stats["added"] == 1
+    assert "killer whale" not in store_path.read_text()
+
+
+def test_seed_from_an_export(tmp_path):
+    export = tmp_path / "export.tsv"
+    export.write_text(
+        "taxonID\tscientificName\tacceptedNameUsage\tvernacularName\n"
+        "105838\tCarcharodon carcharias\t\tgreat white shark\n"
+        "137090\tBalaenoptera musculus\t\t\n"
+        "x\tbroken\t\t\n"
+    )
+    path = tmp_path / "names.tsv"
+
+    assert taxon_store.seed(str(path), [str(export)]) == 3
+
+    store = taxon_store.TaxonStore(str(path))
+    assert store.lookup("common", "Great White Shark") == [(105838, "Carcharodon carcharias", "great white shark")]
+    assert store.lookup("scientific", "balaenoptera musculus") == [(137090, "Balaenoptera musculus", "")]
+
+
+def test_store_is_off_without_a_file():
+    with patch.dict("os.environ", {"OBIS_TAXON_STORE_PATH": ""}):
+        assert taxon_store.get_store() is None
+
+
+@pytest.mark.asyncio
+async def test_common_names_are_learned_from_obis(store_path):
+    results = [{"commonName": "Great white shark", "taxonID": 105838, "scientificName": "Carcharodon carcharias"}]
+    get = AsyncMock(return_value=obis_response(results))
+
+    with patch("utils.utils.obis_client.get", get):
+        first = await utils.resolveCommonName("great white shark")
+        # the next start reads what was appended
+        taxon_store.clear()
+        resolver_cache.clear()
+        second = await utils.resolveCommonName("GREAT WHITE SHARK")
+
+    assert get.await_count == 1
+    # a store hit has the same shape as the OBIS answer
+    assert first[1] == second[1] == [["Great white shark", 105838, "Carcharodon carcharias"]]
+
+
+@pytest.mark.asyncio
+async def test_known_scientific_names_skip_obis(store_path):
+    taxon_store.TaxonStore.append(str(store_path), [("scientific", "carcharodon carcharias", 105838, "Carcharodon carcharias", "")])
+    get = AsyncMock()
+
+    with patch("utils.utils.obis_client.get", get):
+        ids = await utils.getTaxonIdFromScientificName("Carcharodon carcharias")
+
+    get.assert_not_awaited()
+    assert ids == [[105838, "Carcharodon carcharias"]]
+
+
+@pytest.mark.asyncio
+async def test_disabled_store_always_asks_obis(store_path):
+    results = [{"taxonID": 105838, "scientificName": "Carcharodon carcharias"}]
+    get = AsyncMock(return_value=obis_response(results))
+
+    with patch.dict("os.environ", {"OBIS_TAXON_STORE": "false"}), \
+         patch("utils.utils.obis_client.get", get):
+        await utils.getTaxonIdFromScientificName("Carcharodon carcharias")
+        taxon_store.clear()
+        resolver_cache.clear()
+        await utils.getTaxonIdFromScientificName("Carcharodon carcharias")
+
+    assert get.await_count == 2
+    assert not store_path.exists()
@@ -0,0 +1,192 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from utils import utils
+from utils import resolver_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_resolver_cache():
+    resolver_cache.clear()
+
+
+def obis_response(results, is_success=True):
+    response = MagicMock()
+    response.is_success = is_success
+    response.status_code = 200 if is_success else 500
+    response.json.return_value = {"results": results}
+    return response
+
+
+@pytest.mark.asyncio
+async def test_resolve_common_name_success():
+    """Common names resolve to [commonName, taxonID, scientificName] rows."""
+    results = [{"commonName": "great white shark", "taxonID": 105838, "scientificName": "Carcharodon carcharias"}]
+
+    with patch("utils.utils.obis_client.get", AsyncMock(return_value=obis_response(results))):
+        url, solution = await utils.resolveCommonName("great white shark")
+
+    assert "taxon/search/common" in url
+    assert solution == [["great white shark", 105838, "Carcharodon carcharias"]]
+
+
+@pytest.mark.asyncio
+async def test_resolver_times_out_instead_of_hanging():
+    """A hung OBIS lookup is abandoned after RESOLVER_TIMEOUT and treated as no match."""
+    async def hang(*args, **kwargs):
+        await asyncio.sleep(10)
+
+    with patch("utils.utils.RESOLVER_TIMEOUT", 0.01), \
+         patch("utils.utils.obis_client.get", hang):
+        url, solution = await utils.resolveCommonName("great white shark")
+
+    assert solution is None
+
+
+@pytest.mark.asyncio
+async def test_resolver_error_response_is_no_match():
+    """Non-OK responses from OBIS resolve to nothing rather than raising."""
+    with patch("utils.utils.obis_client.get", AsyncMock(return_value=obis_response([], is_success=False))):
+        url, datasets = await utils.getDatasetId("reef survey")
+
+    assert datasets is None
+
+
+@pytest.mark.asyncio
+async def test_resolver_propagates_cancellation():
+    """Cancelling the calling task cancels the in-flight lookup."""
+    started = asyncio.Event()
+
+    async def hang(*args, **kwargs):
+        started.set()
+        await asyncio.sleep(10)
+
+    with patch("utils.utils.obis_client.get", hang):
+        task = asyncio.create_task(utils.getTaxonIdFromScientificName("Carcharodon carcharias"))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+
+@pytest.mark.asyncio
+async def test_resolve_all_params_runs_concurrently_and_merges():
+    """Independent resolutions overlap and their rewrites are merged into params."""
+    running = 0
+    peak = 0
+
+    def slow(value):
+        async def resolver(query):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return value
+        return resolver
+
+    process = AsyncMock()
+    params = {"area": "Australia", "datasetname": "reef survey", "commonname": "kelp", "size": 10}
+
+    with patch("utils.utils.getAreaId", slow(("url", [{"id": "7"}]))), \
+         patch("utils.utils.getDatasetId", slow(("url", [["ds-1", "Reef survey"]]))), \
+         patch("utils.utils.resolveCommonName", slow(("url", [["kelp", 1234, "Laminaria"]]))):
+        assert await utils.resolveAllParams(params, process)
+
+    assert peak == 3
+    assert params == {"areaid": "7", "datasetid": "ds-1", "taxonid": 1234, "size": 10}
+
+
+@pytest.mark.asyncio
+async def test_resolve_all_params_institute_takes_priority_over_area():
+    """With both institute and area the area only narrows the institute lookup."""
+    process = AsyncMock()
+    params = {"institute": "Smithsonian", "area": "USA"}
+    get_area = AsyncMock()
+
+    with patch("utils.utils.getInstituteId", AsyncMock(return_value=[{"id": "42", "name": "Smithsonian", "score": 1.0}])), \
+         patch("utils.utils.getAreaId", get_area):
+        assert await utils.resolveAllParams(params, process)
+
+    get_area.assert_not_awaited()
+    assert params == {"instituteid": "42"}
+
+
+@pytest.mark.asyncio
+async def test_resolve_all_params_failure_leaves_params_untouched():
+    """If any resolution fails nothing is merged."""
+    process = AsyncMock()
+    params = {"area": "Atlantis", "commonname": "kelp"}
+
+    with patch("utils.utils.getAreaId", AsyncMock(return_value=(None, []))), \
+         patch("utils.utils.resolveCommonName", AsyncMock(return_value=("url", [["kelp", 1234, "Laminaria"]]))):
+        assert not await utils.resolveAllParams(params, process)
+
+    assert params == {"area": "Atlantis", "commonname": "kelp"}
+
+
+@pytest.mark.asyncio
+async def test_resolver_answers_are_memoized_on_normalized_name():
+    """Repeat lookups differing only in case, spacing or diacritics are served from memory."""
+    results = [{"commonName": "great white shark", "taxonID": 105838, "scientificName": "Carcharodon carcharias"}]
+    get = AsyncMock(return_value=obis_response(results))
+
+    with patch("utils.utils.obis_client.get", get):
+        first = await utils.resolveCommonName("great white shark")
+        second = await utils.resolveCommonName("  Great   WHITE shark ")
+
+    assert get.await_count == 1
+    assert second == first
+    assert resolver_cache.stats()["commonname"]["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_empty_resolver_answers_are_not_memoized():
+    """A failed lookup is retried on the next request."""
+    get = AsyncMock(return_value=obis_response([]))
+
+    with patch("utils.utils.obis_client.get", get):
+        await utils.getDatasetId("reef survey")
+        await utils.getDatasetId("reef survey")
+
+    assert get.await_count == 2
+
+
+def test_normalize_ignores_case_whitespace_and_diacritics():
+    assert resolver_cache.normalize("  Île   de  FRANCE ") == "ile de france"
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_is_shared_between_caches(tmp_path):
+    """Answers written by one worker's cache are read by another's."""
+    path = str(tmp_path / "resolutions.sqlite")
+    await resolver_cache.ResolverCache("area", path=path).put("australia", ["url", [{"id": "7"}]])
+
+    found, value = await resolver_cache.ResolverCache("area", path=path).get("australia")
+
+    assert found
+    assert value == ["url", [{"id": "7"}]]
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_runs_off_the_event_loop_and_survives_a_locked_database(tmp_path):
+    """A locked shared tier is a miss, and its queries never run on the event loop's thread."""
+    cache = resolver_cache.ResolverCache("area", path=str(tmp_path / "resolutions.sqlite"))
+    threads = []
+
+    class LockedDatabase:
+        def execute(self, sql, parameters=()):
+            threads.append(threading.current_thread())
+            raise sqlite3.OperationalError("database is locked")
+
+    cache._db = LockedDatabase()
+    await cache.put("australia", ["url", [{"id": "7"}]])
+    cache._entries.clear()
+
+    assert await cache.get("australia") == (False, None)
+    assert len(threads) == 2
+    assert all(thread is not threading.main_thread() for thread in threads)